@@ -0,0 +1,167 @@
+# art_export.py
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PyQt6.QtCore import QThread, pyqtSignal
+from mutagen import File
+from file_manager import FileManager
+from tag_definitions import TagDefinitions
+from art_utils import ArtUtils
+from config import ArtFormats
+
+class ArtTemplate:
+    """Expands output path templates such as "{album_artist}/{album}.jpg"."""
+    FIELDS = {
+        'title': 'Title',
+        'artist': 'Artist',
+        'album': 'Album',
+        'album_artist': 'Album Artist',
+        'year': 'Year',
+        'genre': 'Genre',
+        'track': 'Track',
+        'composer': 'Composer',
+        'publisher': 'Publisher'
+    }
+    FALLBACKS = {
+        'album': 'Unknown Album',
+        'artist': 'Unknown Artist',
+        'album_artist': 'Unknown Artist'
+    }
+    UNSAFE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+    @staticmethod
+    def sanitize(value):
+        value = ArtTemplate.UNSAFE.sub('_', value).strip().strip('.')
+        return value or '_'
+
+    @staticmethod
+    def fields_for(file_path, tag_values, art_hash):
+        fields = {key: tag_values.get(tag_name, '') for key, tag_name in ArtTemplate.FIELDS.items()}
+        if not fields['album_artist']:
+            fields['album_artist'] = fields['artist']
+        for key, fallback in ArtTemplate.FALLBACKS.items():
+            fields[key] = fields[key] or fallback
+        fields['filename'] = os.path.splitext(os.path.basename(file_path))[0]
+        fields['folder'] = os.path.basename(os.path.dirname(file_path))
+        fields['hash'] = art_hash
+        return {key: ArtTemplate.sanitize(str(value)) for key, value in fields.items()}
+
+    @staticmethod
+    def expand(template, fields):
+        """Expand a template into a relative path; separators in the template
+        create folders, separators in values never do"""
+        parts = [part.format_map(fields) for part in re.split(r'[\\/]', template) if part]
+        return os.path.join(*parts)
+
+
+class AlbumArtExportThread(QThread):
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, files, output_dir, template=ArtFormats.DEFAULT_TEMPLATE, max_size=0,
+                 quality=ArtFormats.DEFAULT_QUALITY, workers=None):
+        super().__init__()
+        self.files = files
+        self.output_dir = output_dir
+        self.template = template
+        self.max_size = max_size
+        self.quality = quality
+        self.workers = workers or min(8, (os.cpu_count() or 2) * 2)
+        self.cancelled = False
+        self.lock = threading.Lock()
+        self.seen_hashes = set()
+        self.claimed_paths = {}
+        self.exported = 0
+        self.duplicates = 0
+        self.missing = 0
+        self.errors = []
+
+    def cancel(self):
+        self.cancelled = True
+
+    def claim(self, art_hash, relative_path):
+        """Reserve an output path for a new image; None for duplicate art"""
+        with self.lock:
+            if art_hash in self.seen_hashes:
+                self.duplicates += 1
+                return None
+            self.seen_hashes.add(art_hash)
+            # Different art expanding to the same name gets a hash suffix
+            key = os.path.normcase(relative_path)
+            if key in self.claimed_paths:
+                base, extension = os.path.splitext(relative_path)
+                relative_path = f"{base}_{art_hash[:8]}{extension}"
+                key = os.path.normcase(relative_path)
+            self.claimed_paths[key] = art_hash
+            return relative_path
+
+    def export_file(self, file_path):
+        if self.cancelled:
+            return
+        audio = File(file_path)
+        data, mime = FileManager.get_art_data(file_path, audio)
+        if not data:
+            with self.lock:
+                self.missing += 1
+            return
+
+        art_hash = ArtUtils.content_hash(data)
+        fields = ArtTemplate.fields_for(file_path, TagDefinitions.get_all_values(audio), art_hash)
+        relative_path = ArtTemplate.expand(self.template, fields)
+        extension = os.path.splitext(relative_path)[1]
+        image_format = ArtUtils.format_for_extension(extension)
+        if not image_format:
+            # No known extension in the template keeps the original format
+            relative_path += '.' + ArtUtils.extension_for_mime(mime)
+
+        relative_path = self.claim(art_hash, relative_path)
+        if relative_path is None:
+            return
+
+        needs_conversion = image_format and (
+            self.max_size or ArtUtils.mime_for_format(image_format) != (mime or '').lower())
+        if needs_conversion:
+            data = ArtUtils.convert(data, image_format, self.max_size, self.quality)
+            if data is None:
+                raise ValueError("Could not decode embedded image")
+
+        save_path = os.path.join(self.output_dir, relative_path)
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with open(save_path, 'wb') as img_file:
+            img_file.write(data)
+        with self.lock:
+            self.exported += 1
+
+    def run(self):
+        try:
+            total = len(self.files) or 1
+            done = 0
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(self.export_file, file): file for file in self.files}
+                for future in as_completed(futures):
+                    file = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.errors.append(f"{os.path.basename(file)}: {e}")
+                    done += 1
+                    if done % 25 == 0 or done == total:
+                        self.status.emit(f"Exported {self.exported} images from {done} files")
+                    self.progress.emit(int(done * 100 / total))
+                    if self.cancelled:
+                        for pending in futures:
+                            pending.cancel()
+
+            summary = (f"Exported {self.exported} images, skipped {self.duplicates} duplicates, "
+                       f"{self.missing} files without art.")
+            if self.cancelled:
+                self.finished.emit(False, "Export cancelled. " + summary)
+            elif self.errors:
+                self.finished.emit(False, summary + "\n\nErrors:\n" + "\n".join(self.errors[:50]))
+            else:
+                self.finished.emit(True, summary)
+        except Exception as e:
+            print(f"Error in album art export: {e}")
+            self.finished.emit(False, str(e))
@@ -0,0 +1,86 @@
+# art_export_dialog.py
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QGroupBox, QFormLayout,
+    QLineEdit, QPushButton, QSpinBox, QLabel, QFileDialog, QDialogButtonBox, QMessageBox)
+from art_export import ArtTemplate
+from config import ArtFormats
+
+class ArtExportDialog(QDialog):
+    def __init__(self, file_count, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export Album Art")
+        self.setMinimumWidth(480)
+        self.file_count = file_count
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Export album art from {self.file_count} files. "
+                                "Identical images are exported once."))
+
+        output_group = QGroupBox("Output")
+        form_layout = QFormLayout(output_group)
+
+        dir_layout = QHBoxLayout()
+        self.dir_entry = QLineEdit()
+        browse_btn = QPushButton("Browse")
+        browse_btn.clicked.connect(self.browse_directory)
+        dir_layout.addWidget(self.dir_entry)
+        dir_layout.addWidget(browse_btn)
+        form_layout.addRow("Folder:", dir_layout)
+
+        self.template_entry = QLineEdit(ArtFormats.DEFAULT_TEMPLATE)
+        self.template_entry.setToolTip(
+            "Fields: " + ", ".join("{" + field + "}" for field in
+                                   list(ArtTemplate.FIELDS) + ['filename', 'folder', 'hash']) +
+            "\nEnd with .jpg, .png or .webp to convert; no extension keeps the original format."
+        )
+        form_layout.addRow("File Name Template:", self.template_entry)
+        layout.addWidget(output_group)
+
+        image_group = QGroupBox("Image")
+        image_layout = QFormLayout(image_group)
+        self.size_spin = QSpinBox()
+        self.size_spin.setRange(0, 10000)
+        self.size_spin.setSingleStep(100)
+        self.size_spin.setSpecialValueText("Keep original")
+        self.size_spin.setSuffix(" px")
+        image_layout.addRow("Max Size:", self.size_spin)
+
+        self.quality_spin = QSpinBox()
+        self.quality_spin.setRange(1, 100)
+        self.quality_spin.setValue(ArtFormats.DEFAULT_QUALITY)
+        image_layout.addRow("Quality:", self.quality_spin)
+        layout.addWidget(image_group)
+
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok |
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(self.validate_and_accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def browse_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Output Folder")
+        if directory:
+            self.dir_entry.setText(directory)
+
+    def validate_and_accept(self):
+        if not self.dir_entry.text():
+            QMessageBox.warning(self, "Warning", "Please select an output folder!")
+            return
+        try:
+            sample = ArtTemplate.fields_for("sample.mp3", {}, "0" * 40)
+            ArtTemplate.expand(self.template_entry.text(), sample)
+        except (KeyError, ValueError, IndexError, TypeError) as e:
+            QMessageBox.warning(self, "Warning", f"Invalid file name template: {e}")
+            return
+        self.accept()
+
+    def get_options(self):
+        return {
+            'output_dir': self.dir_entry.text(),
+            'template': self.template_entry.text(),
+            'max_size': self.size_spin.value(),
+            'quality': self.quality_spin.value()
+        }
@@ -0,0 +1,146 @@
+# art_optimizer.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+from PyQt6.QtCore import QThread, pyqtSignal
+from mutagen import File
+from art_utils import ArtUtils
+from tag_writer import TagWriter
+from audio_metadata import AudioMetadata
+from config import ArtFormats
+from tracing import Tracer
+
+class ArtOptimizerThread(QThread):
+    """Re-encode oversized embedded pictures to a size/quality policy. Each
+    distinct picture is encoded once and shared by every file embedding it."""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, files, max_size=ArtFormats.OPTIMIZE_MAX_SIZE,
+                 quality=ArtFormats.OPTIMIZE_QUALITY, image_format=ArtFormats.OPTIMIZE_FORMAT,
+                 min_bytes=ArtFormats.OPTIMIZE_MIN_BYTES, dry_run=False, workers=None):
+        super().__init__()
+        self.files = files
+        self.max_size = max_size
+        self.quality = quality
+        self.image_format = ArtUtils.format_for_extension(image_format) or 'JPEG'
+        self.mime = ArtUtils.mime_for_format(self.image_format)
+        self.min_bytes = min_bytes
+        self.dry_run = dry_run
+        self.workers = workers or min(8, (os.cpu_count() or 2) * 2)
+        self.cancelled = False
+        self.lock = threading.Lock()
+        # Content hash -> Future of the re-encoded picture (None if kept)
+        self.encoded = {}
+        self.files_changed = 0
+        self.pictures_replaced = 0
+        self.bytes_saved = 0
+        self.errors = []
+
+    def cancel(self):
+        self.cancelled = True
+
+    def is_oversized(self, data, mime):
+        """Larger than the max size, or heavy and not yet in the target format.
+        Pictures already produced by the policy are left alone, so repeated
+        runs don't re-encode (and degrade) them."""
+        width, height = ArtUtils.image_size(data)
+        if max(width, height) > self.max_size:
+            return True
+        return len(data) > self.min_bytes and (mime or '').lower() != self.mime
+
+    def encode(self, data, mime):
+        """Re-encoded picture bytes, or None when the original should be kept"""
+        if not self.is_oversized(data, mime):
+            return None
+        result = ArtUtils.convert(data, self.image_format, self.max_size, self.quality)
+        if result is None or len(result) >= len(data):
+            return None
+        return result
+
+    def get_encoded(self, data, mime):
+        """Encode each distinct picture once; concurrent callers with the same
+        picture wait for the first one instead of encoding it again"""
+        art_hash = ArtUtils.content_hash(data)
+        with self.lock:
+            future = self.encoded.get(art_hash)
+            owner = future is None
+            if owner:
+                future = self.encoded[art_hash] = Future()
+        if owner:
+            try:
+                future.set_result(self.encode(data, mime))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def optimize_file(self, file_path):
+        if self.cancelled:
+            return
+        with Tracer.span("tags.load"):
+            audio = File(file_path)
+        saved = []
+
+        def convert(data, mime):
+            result = self.get_encoded(data, mime)
+            if result is None:
+                return None
+            saved.append(len(data) - len(result))
+            return result, self.mime
+
+        replaced = TagWriter.replace_pictures(audio, convert)
+        if not replaced:
+            return
+
+        if self.dry_run:
+            bytes_saved = sum(saved)
+        else:
+            size_before = os.path.getsize(file_path)
+            with Tracer.span("tags.save"):
+                audio.save()
+            bytes_saved = size_before - os.path.getsize(file_path)
+
+        with self.lock:
+            self.files_changed += 1
+            self.pictures_replaced += replaced
+            self.bytes_saved += bytes_saved
+
+    def summary(self):
+        saved = AudioMetadata.format_size(max(0, self.bytes_saved))
+        if self.dry_run:
+            return (f"Dry run: {self.pictures_replaced} pictures in {self.files_changed} files "
+                    f"would be re-encoded, saving about {saved} "
+                    f"({len(self.encoded)} distinct pictures checked).")
+        return (f"Re-encoded {self.pictures_replaced} pictures in {self.files_changed} files, "
+                f"saved {saved} ({len(self.encoded)} distinct pictures checked).")
+
+    def run(self):
+        try:
+            total = len(self.files) or 1
+            done = 0
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {executor.submit(self.optimize_file, file): file for file in self.files}
+                for future in as_completed(futures):
+                    file = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.errors.append(f"{os.path.basename(file)}: {e}")
+                    done += 1
+                    if done % 25 == 0 or done == total:
+                        self.status.emit(f"Optimized {self.files_changed} of {done} files")
+                    self.progress.emit(int(done * 100 / total))
+                    if self.cancelled:
+                        for pending in futures:
+                            pending.cancel()
+
+            if self.cancelled:
+                self.finished.emit(False, "Optimization cancelled. " + self.summary())
+            elif self.errors:
+                self.finished.emit(False, self.summary() + "\n\nErrors:\n" + "\n".join(self.errors[:50]))
+            else:
+                self.finished.emit(True, self.summary())
+        except Exception as e:
+            print(f"Error in album art optimization: {e}")
+            self.finished.emit(False, str(e))
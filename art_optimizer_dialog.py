@@ -0,0 +1,70 @@
+# art_optimizer_dialog.py
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QGroupBox, QFormLayout, QSpinBox,
+    QComboBox, QCheckBox, QLabel, QDialogButtonBox)
+from config import ArtFormats
+
+class ArtOptimizerDialog(QDialog):
+    def __init__(self, file_count, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Optimize Embedded Art")
+        self.setMinimumWidth(420)
+        self.file_count = file_count
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        label = QLabel(f"Re-encode oversized album art embedded in {self.file_count} files. "
+                       "Identical covers are encoded once.")
+        label.setWordWrap(True)
+        layout.addWidget(label)
+
+        policy_group = QGroupBox("Policy")
+        form_layout = QFormLayout(policy_group)
+
+        self.size_spin = QSpinBox()
+        self.size_spin.setRange(100, 10000)
+        self.size_spin.setSingleStep(100)
+        self.size_spin.setValue(ArtFormats.OPTIMIZE_MAX_SIZE)
+        self.size_spin.setSuffix(" px")
+        form_layout.addRow("Max Size:", self.size_spin)
+
+        self.min_bytes_spin = QSpinBox()
+        self.min_bytes_spin.setRange(0, 100000)
+        self.min_bytes_spin.setSingleStep(100)
+        self.min_bytes_spin.setValue(ArtFormats.OPTIMIZE_MIN_BYTES // 1024)
+        self.min_bytes_spin.setSuffix(" KB")
+        self.min_bytes_spin.setToolTip("Pictures larger than this are re-encoded even if "
+                                       "they already fit the max size")
+        form_layout.addRow("Re-encode Above:", self.min_bytes_spin)
+
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(["jpg", "png", "webp"])
+        self.format_combo.setCurrentText(ArtFormats.OPTIMIZE_FORMAT)
+        form_layout.addRow("Format:", self.format_combo)
+
+        self.quality_spin = QSpinBox()
+        self.quality_spin.setRange(1, 100)
+        self.quality_spin.setValue(ArtFormats.OPTIMIZE_QUALITY)
+        form_layout.addRow("Quality:", self.quality_spin)
+        layout.addWidget(policy_group)
+
+        self.dry_run_check = QCheckBox("Dry run (estimate savings without writing)")
+        self.dry_run_check.setChecked(True)
+        layout.addWidget(self.dry_run_check)
+
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok |
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def get_options(self):
+        return {
+            'max_size': self.size_spin.value(),
+            'quality': self.quality_spin.value(),
+            'image_format': self.format_combo.currentText(),
+            'min_bytes': self.min_bytes_spin.value() * 1024,
+            'dry_run': self.dry_run_check.isChecked()
+        }
@@ -0,0 +1,78 @@
+# art_utils.py
+import hashlib
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PyQt6.QtGui import QImage, QImageReader
+from config import ArtFormats
+
+class ArtUtils:
+    @staticmethod
+    def content_hash(data):
+        return hashlib.sha1(data).hexdigest()
+
+    @staticmethod
+    def format_for_extension(extension):
+        """Qt image format for a file extension, or None if unknown"""
+        return ArtFormats.FORMATS.get(extension.lower().lstrip('.'), {}).get('qt')
+
+    @staticmethod
+    def extension_for_mime(mime):
+        for extension, info in ArtFormats.FORMATS.items():
+            if info['mime'] == (mime or '').lower():
+                return extension
+        return 'jpg'
+
+    @staticmethod
+    def mime_for_format(image_format):
+        for info in ArtFormats.FORMATS.values():
+            if info['qt'] == image_format:
+                return info['mime']
+        return 'image/jpeg'
+
+    @staticmethod
+    def image_size(data):
+        """(width, height) read from the image header without decoding pixels"""
+        buffer = QBuffer()
+        buffer.setData(QByteArray(data))
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        size = QImageReader(buffer).size()
+        return size.width(), size.height()
+
+    @staticmethod
+    def decode_scaled(data, max_size=0):
+        """Decode image bytes straight to fit max_size (longest side) instead of
+        decoding at full resolution and scaling afterwards. JPEG decoding is
+        scaled in the DCT domain. Returns None if decoding fails."""
+        buffer = QBuffer()
+        buffer.setData(QByteArray(data))
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        reader = QImageReader(buffer)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if max_size and size.isValid() and max(size.width(), size.height()) > max_size:
+            reader.setScaledSize(size.scaled(max_size, max_size, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            return None
+        return image
+
+    @staticmethod
+    def convert(data, image_format, max_size=0, quality=ArtFormats.DEFAULT_QUALITY):
+        """Decode image bytes, optionally downscale so the longest side fits
+        max_size, and re-encode them. Returns None if decoding fails. Safe to
+        call from worker threads (QImage only, no QPixmap)."""
+        image = QImage.fromData(data)
+        if image.isNull():
+            return None
+        if max_size and max(image.width(), image.height()) > max_size:
+            image = image.scaled(max_size, max_size, Qt.AspectRatioMode.KeepAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+        if image_format == 'JPEG' and image.hasAlphaChannel():
+            image = image.convertToFormat(QImage.Format.Format_RGB32)
+
+        output = QByteArray()
+        buffer = QBuffer(output)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        if not image.save(buffer, image_format, quality):
+            return None
+        buffer.close()
+        return bytes(output)
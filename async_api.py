@@ -0,0 +1,147 @@
+# async_api.py
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from audio_metadata import AudioMetadata
+from concurrent_scanner import ConcurrentScanner
+from file_manager import FileManager
+from playlist_writer import PlaylistWriter
+from tag_writer import TagWriter
+from config import AsyncSettings
+
+class AsyncLibrary:
+    """asyncio front end to the scanning, probing, playlist and tagging code
+    the GUI uses, for embedding in services:
+
+        async with AsyncLibrary() as library:
+            async for path, info in library.probe_many(library.scan(folder)):
+                ...
+            await library.write_playlist("all.m3u8", files, "M3U Extended (.m3u8)")
+
+    Every blocking call runs on the library's own thread pool, and no more
+    than io_workers of them are queued there at once, so the event loop
+    never blocks and a burst of requests can't pile up unbounded work.
+    Iterators only keep max_pending operations in flight ahead of the
+    consumer: a slow consumer stops new directory listings and probes rather
+    than buffering results. Cancelling a call (or breaking out of an
+    iterator) drops everything that hasn't started; a blocking call already
+    running on a thread, such as one file's tag save, still completes.
+    """
+
+    def __init__(self, io_workers=AsyncSettings.IO_WORKERS, max_pending=AsyncSettings.MAX_PENDING):
+        self.executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="AsyncLibrary")
+        self.limit = asyncio.Semaphore(io_workers)
+        self.max_pending = max_pending
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func, *args):
+        """Run a blocking call on the pool once a slot is free"""
+        async with self.limit:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    @staticmethod
+    async def iterate(items):
+        if hasattr(items, '__aiter__'):
+            async for item in items:
+                yield item
+        else:
+            for item in items:
+                yield item
+
+    async def map(self, func, items):
+        """(item, func(item)) for each item of an iterable or async iterable,
+        in input order, with at most max_pending calls in flight"""
+        window = deque()
+        try:
+            async for item in AsyncLibrary.iterate(items):
+                window.append((item, asyncio.ensure_future(self.run(func, item))))
+                if len(window) >= self.max_pending:
+                    item, task = window.popleft()
+                    yield item, await task
+            while window:
+                item, task = window.popleft()
+                yield item, await task
+        finally:
+            for _, task in window:
+                task.cancel()
+
+    async def scan(self, directory, recursive=True, sort_by=None):
+        """Audio files under directory. Without sort_by, files are yielded a
+        directory at a time (sorted within it) as listings complete; with
+        sort_by ("name", "date" or "size") the whole tree is listed first and
+        yielded in FileManager.get_audio_files order."""
+        if sort_by:
+            for path in await self.run(FileManager.get_audio_files, directory, recursive, sort_by):
+                yield path
+            return
+
+        directories = [directory]
+        pending = set()
+        try:
+            while directories or pending:
+                while directories and len(pending) < self.max_pending:
+                    pending.add(asyncio.ensure_future(self.run(ConcurrentScanner.list_dir, directories.pop())))
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    files, subdirs = task.result()
+                    if recursive:
+                        directories.extend(subdirs)
+                    for path in sorted(files):
+                        yield path
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def probe(self, file_path):
+        """AudioMetadata.probe(file_path); failures come back as {'error': ...}"""
+        return await self.run(AudioMetadata.probe, file_path)
+
+    def probe_many(self, paths):
+        """(path, probe) for each path of an iterable or async iterable, such as scan()"""
+        return self.map(AudioMetadata.probe, paths)
+
+    async def write_playlist(self, save_path, files, format_name):
+        """Write a playlist like PlaylistWriter.write_playlist, probing the
+        track durations and titles it needs concurrently first"""
+        files = [file async for file in AsyncLibrary.iterate(files)]
+        track_info = None
+        if PlaylistWriter.needs_track_info(format_name):
+            info = {}
+            async for file, probe in self.probe_many(files):
+                info[file] = PlaylistWriter.track_info_from_probe(file, probe)
+            track_info = info.__getitem__
+        await self.run(PlaylistWriter.write_playlist, save_path, files, format_name, track_info)
+
+    async def apply_tags(self, files, updates, art_path=None, replace_art=False, progress=None):
+        """Apply a batch of ID3 changes (see TagWriter.prepare_id3_changes) to
+        files, several at a time. progress(done, total) is called as files
+        finish. Returns (files updated, ["name: error", ...])."""
+        files = [file async for file in AsyncLibrary.iterate(files)]
+        frames, art_frame = await self.run(TagWriter.prepare_id3_changes, updates, art_path, replace_art)
+
+        def apply(file_path):
+            try:
+                TagWriter.apply_id3_changes(file_path, frames, replace_art, art_frame)
+                return None
+            except Exception as e:
+                return str(e)
+
+        processed = 0
+        errors = []
+        async for file_path, error in self.map(apply, files):
+            if error is None:
+                processed += 1
+            else:
+                errors.append(f"{os.path.basename(file_path)}: {error}")
+            if progress:
+                progress(processed + len(errors), len(files))
+        return processed, errors
@@ -0,0 +1,238 @@
+# audio_encoder.py
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pydub import AudioSegment
+from config import CombineSettings
+from mp3_frames import Mp3Frames
+from tracing import Tracer
+
+class Mp3StreamEncoder:
+    """Feeds 16-bit PCM into a single ffmpeg/LAME process writing an MP3 file"""
+    def __init__(self, save_path, frame_rate, channels, bitrate=CombineSettings.DEFAULT_BITRATE):
+        self.save_path = save_path
+        self.errors = tempfile.TemporaryFile()
+        command = [
+            AudioSegment.converter, '-y', '-loglevel', 'error',
+            '-f', 's16le', '-ar', str(frame_rate), '-ac', str(channels), '-i', 'pipe:0',
+            '-codec:a', 'libmp3lame', '-b:a', bitrate,
+            '-id3v2_version', '3',  # Keep ID3v2.3 for tag compatibility
+            '-f', 'mp3', save_path
+        ]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                        stdout=subprocess.DEVNULL, stderr=self.errors)
+
+    @Tracer.traced("encode.write")
+    def write(self, pcm):
+        self.process.stdin.write(pcm)
+
+    def close(self):
+        self.process.stdin.close()
+        return_code = self.process.wait()
+        self.errors.seek(0)
+        message = self.errors.read().decode('utf-8', 'replace').strip()
+        self.errors.close()
+        if return_code != 0:
+            raise RuntimeError(f"Encoder failed ({return_code}): {message}")
+
+    def abort(self):
+        try:
+            self.process.kill()
+            self.process.wait()
+        finally:
+            self.errors.close()
+
+
+class ParallelMp3Encoder:
+    """Encodes the PCM stream as overlapping chunks in concurrent LAME processes.
+
+    Every chunk starts on the same global frame grid and is encoded CBR with
+    the bit reservoir disabled, so each MP3 frame is self-contained. Chunks
+    are encoded with a few extra frames of pre- and post-roll that are
+    discarded at frame boundaries and spilled to the job directory as they
+    finish. On close the kept frames are stitched behind a Xing/Info + LAME
+    header describing the whole stream (gapless delay and padding included).
+
+    Passing the chunk records of an earlier run resumes after the last
+    completed chunk; the stream must then be fed from resume_position().
+    """
+    PREROLL_FRAMES = 8
+    POSTROLL_FRAMES = 8
+
+    def __init__(self, save_path, frame_rate, channels, bitrate=CombineSettings.DEFAULT_BITRATE,
+                 workers=None, chunk_seconds=CombineSettings.PARALLEL_CHUNK_SECONDS,
+                 job_dir=None, chunks=None, on_chunk=None):
+        self.save_path = save_path
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.bitrate = bitrate
+        self.frame_bytes = 2 * channels
+        self.frame_samples = 1152 if frame_rate >= 32000 else 576
+        self.chunk_frames = max(1, int(chunk_seconds * frame_rate / self.frame_samples))
+        self.workers = workers or os.cpu_count() or 2
+
+        self.owns_job_dir = job_dir is None
+        self.job_dir = job_dir or tempfile.mkdtemp(
+            prefix='.audiobuncher-', dir=os.path.dirname(os.path.abspath(save_path)))
+        self.chunks = list(chunks or [])
+        self.on_chunk = on_chunk
+
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = deque()
+        self.buffer = bytearray()
+        self.next_chunk = len(self.chunks)
+        # Sample index of buffer[0]; samples before it are already encoded
+        self.buffer_start = self.total_samples = self.chunk_range(self.next_chunk)[0]
+        self.discard = 0
+
+    @property
+    def complete(self):
+        """True if a previous run already encoded the whole stream"""
+        return bool(self.chunks) and self.chunks[-1]['last']
+
+    def resume_position(self):
+        return self.buffer_start
+
+    def chunk_range(self, index):
+        """Input sample range and first kept frame for a chunk"""
+        first_frame = max(0, index * self.chunk_frames - self.PREROLL_FRAMES)
+        start = first_frame * self.frame_samples
+        end = ((index + 1) * self.chunk_frames + self.POSTROLL_FRAMES) * self.frame_samples
+        return start, end, index * self.chunk_frames - first_frame
+
+    def write(self, pcm):
+        pcm = memoryview(pcm).cast('B')
+        if self.discard:
+            # Samples before the resume position were encoded by an earlier run
+            dropped = min(self.discard, len(pcm) // self.frame_bytes)
+            pcm = pcm[dropped * self.frame_bytes:]
+            self.discard -= dropped
+        self.buffer += pcm
+        self.total_samples += len(pcm) // self.frame_bytes
+        while True:
+            start, end, _ = self.chunk_range(self.next_chunk)
+            if self.total_samples < end:
+                break
+            self.submit(last=False)
+
+    def submit(self, last):
+        index = self.next_chunk
+        start, end, skip = self.chunk_range(index)
+        end = min(end, self.total_samples)
+        pcm = bytes(self.buffer[(start - self.buffer_start) * self.frame_bytes:
+                                (end - self.buffer_start) * self.frame_bytes])
+        keep = None if last else self.chunk_frames
+        self.pending.append(self.executor.submit(self.encode_chunk, index, pcm, skip, keep, last))
+        self.next_chunk += 1
+
+        # Drop PCM that no later chunk needs
+        next_start = self.chunk_range(self.next_chunk)[0]
+        if next_start > self.buffer_start:
+            del self.buffer[:(next_start - self.buffer_start) * self.frame_bytes]
+            self.buffer_start = next_start
+
+        # Checkpoint finished chunks and bound the number in flight
+        while self.pending and (self.pending[0].done() or len(self.pending) > self.workers * 2):
+            self.store(self.pending.popleft().result())
+
+    @Tracer.traced("encode.chunk")
+    def encode_chunk(self, index, pcm, skip, keep, last):
+        command = [
+            AudioSegment.converter, '-loglevel', 'error',
+            '-f', 's16le', '-ar', str(self.frame_rate), '-ac', str(self.channels), '-i', 'pipe:0',
+            '-codec:a', 'libmp3lame', '-b:a', self.bitrate, '-reservoir', '0',
+            '-write_xing', '0', '-id3v2_version', '0', '-f', 'mp3', 'pipe:1'
+        ]
+        result = subprocess.run(command, input=pcm, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise RuntimeError(f"Encoder failed ({result.returncode}): "
+                               f"{result.stderr.decode('utf-8', 'replace').strip()}")
+        frames = list(Mp3Frames.iter_frames(result.stdout))
+        end = len(frames) if keep is None else skip + keep
+        if end > len(frames):
+            raise RuntimeError("Encoder produced fewer frames than expected")
+        kept = frames[skip:end]
+        data = result.stdout[kept[0][0]:kept[-1][0] + kept[-1][1].length] if kept else b''
+
+        # Spill to disk; the rename marks the chunk file as complete
+        name = f"chunk_{index:06d}.mp3"
+        path = os.path.join(self.job_dir, name)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        return {
+            'index': index,
+            'file': name,
+            'frames': len(kept),
+            'bytes': len(data),
+            'header': kept[0][1].raw.hex() if kept else None,
+            'last': last,
+            'total_samples': self.total_samples if last else None
+        }
+
+    def store(self, record):
+        # Chunks are stored in order so completed chunks always form a prefix
+        self.chunks.append(record)
+        if self.on_chunk:
+            self.on_chunk(self.chunks)
+
+    def close(self):
+        try:
+            if not self.complete:
+                # Flush the remaining chunks; the last one keeps every frame
+                while True:
+                    kept_end = (self.next_chunk + 1) * self.chunk_frames * self.frame_samples
+                    last = kept_end >= self.total_samples
+                    self.submit(last)
+                    if last:
+                        break
+                while self.pending:
+                    self.store(self.pending.popleft().result())
+        finally:
+            self.executor.shutdown(wait=True)
+        self.assemble()
+        if self.owns_job_dir:
+            shutil.rmtree(self.job_dir, ignore_errors=True)
+
+    @Tracer.traced("encode.assemble")
+    def assemble(self):
+        """Stitch the chunk files behind an Info header into save_path"""
+        headers = [record['header'] for record in self.chunks if record['header']]
+        if not headers:
+            raise RuntimeError("Encoder produced no audio frames")
+        first_header = Mp3Frames.parse_header(bytes.fromhex(headers[0]))
+        frame_count = sum(record['frames'] for record in self.chunks)
+        total_samples = self.chunks[-1]['total_samples']
+        info_size = Mp3Frames.frame_length(first_header.version, first_header.bitrate,
+                                           first_header.sample_rate)
+
+        music_crc = 0
+        stream_bytes = info_size
+        with open(self.save_path, 'wb') as output:
+            output.write(bytes(info_size))  # Reserved for the Info frame
+            for record in self.chunks:
+                with open(os.path.join(self.job_dir, record['file']), 'rb') as f:
+                    data = f.read()
+                if len(data) != record['bytes']:
+                    raise RuntimeError(f"Chunk {record['index']} is damaged")
+                output.write(data)
+                music_crc = Mp3Frames.lame_crc16(data, music_crc)
+                stream_bytes += len(data)
+
+            padding = frame_count * self.frame_samples - Mp3Frames.ENCODER_DELAY - total_samples
+            info = Mp3Frames.build_info_frame(first_header, frame_count, stream_bytes,
+                                              Mp3Frames.ENCODER_DELAY, padding, music_crc)
+            output.seek(0)
+            output.write(info)
+
+    def abort(self):
+        for future in self.pending:
+            future.cancel()
+        self.executor.shutdown(wait=True)
+        if self.owns_job_dir:
+            shutil.rmtree(self.job_dir, ignore_errors=True)
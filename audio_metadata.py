@@ -1,6 +1,10 @@
 # audio_metadata.py
-from mutagen.mp3 import MP3
+import mutagen
+from mutagen.mp3 import MP3, MPEGInfo
 from mutagen.id3 import ID3
+from tag_reader import FastTagReader
+from tag_definitions import TagDefinitions
+from tag_writer import TagWriter
 import os
 from datetime import datetime
 
@@ -29,6 +33,93 @@ class AudioMetadata:
                 'error': str(e)
             }
 
+    @staticmethod
+    def probe(file_path):
+        """Raw facts about any supported file: size, mtime, duration in
+        seconds, bitrate in bits/s, display tags and whether it has art.
+        MP3 and FLAC are read from their headers without loading pictures;
+        other formats get one full mutagen parse."""
+        try:
+            file_stats = os.stat(file_path)
+            stream = AudioMetadata.stream_info(file_path)
+            fast = FastTagReader.read(file_path) if stream else None
+            if fast is not None:
+                duration, bitrate = stream
+                tags, has_art = fast['tags'], fast['has_art']
+            else:
+                audio = mutagen.File(file_path)
+                duration = audio.info.length if audio is not None else 0
+                bitrate = getattr(audio.info, 'bitrate', 0) if audio is not None else 0
+                tags = TagDefinitions.get_all_values(audio) if audio is not None else {}
+                has_art = bool(TagWriter.get_pictures(audio))
+            return {
+                'path': file_path,
+                'size': file_stats.st_size,
+                'mtime': file_stats.st_mtime,
+                'duration': duration,
+                'bitrate': bitrate,
+                'tags': tags,
+                'has_art': has_art
+            }
+        except Exception as e:
+            return {
+                'path': file_path,
+                'error': str(e)
+            }
+
+    @staticmethod
+    def stream_info(file_path):
+        """(duration in seconds, bitrate in bits/s) of an MP3 or FLAC file,
+        seeking over the tags in front of the audio, or None for other
+        formats and streams mutagen can't sync to"""
+        with open(file_path, 'rb') as f:
+            magic = f.read(4)
+            if magic == b'fLaC':
+                return AudioMetadata.flac_stream_info(f)
+            if magic[:3] != b'ID3' and not (len(magic) >= 2 and magic[0] == 0xFF and magic[1] & 0xE0 == 0xE0):
+                return None
+            offset = 0
+            f.seek(0)
+            header = f.read(10)
+            while len(header) == 10 and header[:3] == b'ID3':
+                footer = 10 if header[5] & 0x10 else 0
+                offset += 10 + FastTagReader.syncsafe(header[6:10]) + footer
+                f.seek(offset)
+                header = f.read(10)
+            try:
+                info = MPEGInfo(f, offset)
+            except mutagen.MutagenError:
+                return None
+            return info.length, info.bitrate
+
+    @staticmethod
+    def flac_stream_info(f):
+        """Duration and average bitrate from STREAMINFO, with f just past
+        the fLaC marker; other metadata blocks are seeked over"""
+        streaminfo = None
+        offset = 4
+        last = False
+        while not last:
+            header = f.read(4)
+            if len(header) < 4:
+                return None
+            last = bool(header[0] & 0x80)
+            size = int.from_bytes(header[1:4], 'big')
+            if header[0] & 0x7F == 0:
+                streaminfo = f.read(size)
+            else:
+                f.seek(size, os.SEEK_CUR)
+            offset += 4 + size
+        if streaminfo is None or len(streaminfo) < 18:
+            return None
+        sample_rate = int.from_bytes(streaminfo[10:13], 'big') >> 4
+        samples = int.from_bytes(streaminfo[13:18], 'big') & 0xFFFFFFFFF
+        if not sample_rate or not samples:
+            return None
+        length = samples / sample_rate
+        audio_bytes = os.fstat(f.fileno()).st_size - offset
+        return length, int(audio_bytes * 8 / length)
+
     @staticmethod
     def format_size(size_bytes):
         """Convert bytes to human readable format"""
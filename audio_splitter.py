@@ -0,0 +1,351 @@
+# audio_splitter.py
+import mmap
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import mutagen
+from pydub import AudioSegment
+from PyQt6.QtCore import QThread, pyqtSignal
+from mp3_frames import Mp3Frames
+from audio_transitions import AudioTransitions, SilenceTrimmer
+from chapter_writer import ChapterWriter
+from playlist_writer import PlaylistWriter
+from tag_transfer import TagTransfer
+from tag_writer import TagWriter
+from art_export import ArtTemplate
+from file_manager import FileManager
+from config import SplitSettings
+from tracing import Tracer
+
+class AudioSplitter:
+    """Cuts one long recording into tracks. Tracks are chapter dicts (title,
+    start_ms, end_ms and an optional performer) found from silence, a CUE
+    sheet or the file's ID3 CHAP frames.
+
+    MP3s are cut at frame boundaries without re-encoding: every frame is
+    copied to the track its middle falls in, straight from a memory map. As
+    with any lossless MP3 cut, the first frame of a track may lean on bit
+    reservoir bytes left behind in the previous track. Other formats are
+    re-encoded by ffmpeg one track at a time, seeking in the input rather
+    than decoding it whole. Either way memory stays flat however long the
+    recording is."""
+    # Output muxer and codec for formats that are re-encoded
+    ENCODERS = {
+        '.flac': ('flac', 'flac'),
+        '.ogg': ('ogg', 'libvorbis'),
+        '.wav': ('wav', None),
+        '.m4a': ('mp4', 'aac'),
+        '.wma': ('asf', 'wmav2')
+    }
+    # ffmpeg metadata keys, for formats TagWriter can't tag
+    FFMPEG_KEYS = {
+        'Title': 'title',
+        'Artist': 'artist',
+        'Album': 'album',
+        'Year': 'date',
+        'Track': 'track',
+        'Genre': 'genre',
+        'Album Artist': 'album_artist'
+    }
+    TAGGED_FORMATS = ('.mp3', '.flac', '.ogg', '.wav')
+
+    @staticmethod
+    def duration_ms(file_path):
+        try:
+            audio = mutagen.File(file_path)
+            if audio is not None and audio.info:
+                return int(audio.info.length * 1000)
+        except Exception as e:
+            print(f"Error probing {file_path}: {e}")
+        return 0
+
+    @staticmethod
+    def silence_boundaries(file_path, threshold_db=SplitSettings.THRESHOLD_DB,
+                           min_silence_ms=SplitSettings.MIN_SILENCE_MS, progress=None, is_cancelled=None):
+        """Split points (ms) in the middle of every quiet run of at least
+        min_silence_ms, found in one streaming pass over mono PCM. Silence
+        at the very start and end is not a split point."""
+        rate = SplitSettings.ANALYSIS_RATE
+        window = rate * SplitSettings.WINDOW_MS // 1000
+        chunk_bytes = window * 2 * (rate * SplitSettings.CHUNK_SECONDS // window)
+        min_windows = max(1, min_silence_ms // SplitSettings.WINDOW_MS)
+        duration_ms = AudioSplitter.duration_ms(file_path) or 1
+        boundaries = []
+        run_start = None
+        index = 0
+        for data in AudioTransitions.stream_pcm(file_path, rate, 1, chunk_bytes):
+            if is_cancelled and is_cancelled():
+                raise RuntimeError("Cancelled")
+            samples = np.frombuffer(data, dtype='<i2', count=len(data) // 2)
+            samples = samples[:len(samples) - len(samples) % window].reshape(-1, 1)
+            quiet = SilenceTrimmer.window_levels(samples, window, window) < threshold_db
+            # Windows where the level crosses the threshold, carrying the
+            # state over from the previous chunk
+            changes = np.flatnonzero(np.diff(quiet.astype(np.int8), prepend=np.int8(run_start is not None)))
+            for position in changes.tolist():
+                if quiet[position]:
+                    run_start = index + position
+                else:
+                    if run_start > 0 and index + position - run_start >= min_windows:
+                        boundaries.append((run_start + index + position) * SplitSettings.WINDOW_MS // 2)
+                    run_start = None
+            index += len(quiet)
+            if progress:
+                progress(min(1.0, index * SplitSettings.WINDOW_MS / duration_ms))
+        return boundaries
+
+    @staticmethod
+    def tracks_from_boundaries(boundaries, duration_ms, min_track_ms=SplitSettings.MIN_TRACK_SECONDS * 1000):
+        """Tracks between split points, dropping points that would leave a
+        track shorter than min_track_ms"""
+        starts = [0]
+        for boundary in boundaries:
+            if boundary - starts[-1] >= min_track_ms:
+                starts.append(boundary)
+        while len(starts) > 1 and duration_ms - starts[-1] < min_track_ms:
+            starts.pop()
+        ends = starts[1:] + [None]
+        return [{'title': f"Track {index:02d}", 'start_ms': start, 'end_ms': end}
+                for index, (start, end) in enumerate(zip(starts, ends), 1)]
+
+    @staticmethod
+    def find_tracks(file_path, mode, cue_path=None, threshold_db=SplitSettings.THRESHOLD_DB,
+                    min_silence_ms=SplitSettings.MIN_SILENCE_MS, progress=None, is_cancelled=None):
+        """(tracks, album) of a recording; album holds title, performer,
+        date and genre where the mode provides them"""
+        if mode == SplitSettings.MODE_CUE:
+            cue_path = cue_path or os.path.splitext(file_path)[0] + ".cue"
+            if not os.path.isfile(cue_path):
+                raise ValueError(f"CUE sheet not found: {cue_path}")
+            return ChapterWriter.read_cue_sheet(cue_path)
+        if mode == SplitSettings.MODE_CHAPTERS:
+            tracks = ChapterWriter.read_id3_chapters(file_path)
+            if not tracks:
+                raise ValueError("The file has no ID3 chapters")
+            return tracks, {}
+        if mode == SplitSettings.MODE_SILENCE:
+            boundaries = AudioSplitter.silence_boundaries(file_path, threshold_db, min_silence_ms,
+                                                          progress, is_cancelled)
+            tracks = AudioSplitter.tracks_from_boundaries(boundaries, AudioSplitter.duration_ms(file_path))
+            if len(tracks) < 2:
+                raise ValueError("No silence long enough to split at; try a higher threshold "
+                                 "or a shorter minimum silence")
+            return tracks, {}
+        raise ValueError(f"Unknown split mode: {mode}")
+
+    @staticmethod
+    def output_paths(file_path, tracks, output_dir, album_title):
+        """(NN - Title.ext in output_dir for each track, <Album>.m3u8 playlist
+        path); raises ValueError rather than overwrite a file"""
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext != '.mp3' and ext not in AudioSplitter.ENCODERS:
+            raise ValueError(f"Unsupported file type: {ext}")
+        paths = [os.path.join(output_dir, f"{index:02d} - {ArtTemplate.sanitize(track['title'])}{ext}")
+                 for index, track in enumerate(tracks, 1)]
+        playlist_path = os.path.join(output_dir, ArtTemplate.sanitize(album_title) + SplitSettings.PLAYLIST_EXT)
+        existing = [path for path in paths + [playlist_path] if os.path.exists(path)]
+        if existing:
+            raise ValueError(f"{os.path.basename(existing[0])} already exists in {output_dir}")
+        return paths, playlist_path
+
+    @staticmethod
+    def track_tags(tracks, index, album, source_tags, file_path):
+        """{tag_name: [value]} for a track, filling gaps from the source's tags"""
+        def source(tag_name):
+            return (source_tags.get(tag_name) or [""])[0]
+
+        track = tracks[index]
+        album_title = (album.get('title') or source('Album') or source('Title')
+                       or os.path.splitext(os.path.basename(file_path))[0])
+        album_artist = album.get('performer') or source('Album Artist') or source('Artist')
+        tags = {
+            'Title': [track['title']],
+            'Album': [album_title],
+            'Track': [f"{index + 1}/{len(tracks)}"]
+        }
+        artist = track.get('performer') or album_artist
+        if artist:
+            tags['Artist'] = [artist]
+        if album_artist:
+            tags['Album Artist'] = [album_artist]
+        year = album.get('date') or source('Year')
+        if year and TagTransfer.VALIDATORS['Year'].match(year):
+            tags['Year'] = [year]
+        genre = album.get('genre') or source('Genre')
+        if genre:
+            tags['Genre'] = [genre]
+        return tags
+
+    @staticmethod
+    def cut_mp3(file_path, tracks, temp_paths, progress=None, is_cancelled=None):
+        """Copy each track's frames to its temporary path; frames belong to
+        the track their middle falls in, and runs of frames are copied in
+        writes of up to COPY_BYTES"""
+        outputs = [None] * len(tracks)
+        frames = [0] * len(tracks)
+        try:
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                def flush(target, start, end):
+                    if outputs[target] is None:
+                        outputs[target] = open(temp_paths[target], 'wb')
+                    outputs[target].write(data[start:end])
+                    if progress:
+                        progress(end / len(data))
+                    if is_cancelled and is_cancelled():
+                        raise RuntimeError("Cancelled")
+
+                track = 0
+                position = 0
+                run = None
+                first = True
+                for offset, header in Mp3Frames.iter_frames(data):
+                    # The source's Xing/Info frame describes the whole stream
+                    if first and Mp3Frames.is_info_frame(data, offset, header):
+                        first = False
+                        continue
+                    first = False
+                    middle_ms = (position + header.samples / 2) * 1000 / header.sample_rate
+                    position += header.samples
+                    while (track < len(tracks) and tracks[track]['end_ms'] is not None
+                           and middle_ms >= tracks[track]['end_ms']):
+                        track += 1
+                    target = track if track < len(tracks) and middle_ms >= tracks[track]['start_ms'] else None
+                    if run is not None and (run[0] != target or run[2] != offset
+                                            or run[2] - run[1] >= SplitSettings.COPY_BYTES):
+                        flush(*run)
+                        run = None
+                    if track >= len(tracks):
+                        break
+                    if target is None:
+                        continue
+                    frames[target] += 1
+                    run = [target, offset, offset + header.length] if run is None else [target, run[1], offset + header.length]
+                if run is not None:
+                    flush(*run)
+        finally:
+            for output in outputs:
+                if output is not None:
+                    output.close()
+        empty = [tracks[index]['title'] for index, count in enumerate(frames) if not count]
+        if empty:
+            raise ValueError(f"No audio in track {empty[0]}")
+
+    @staticmethod
+    def encode_track(file_path, track, temp_path, ext, metadata=None, bitrate=None):
+        """Re-encode one track with ffmpeg, seeking to its start"""
+        muxer, codec = AudioSplitter.ENCODERS[ext]
+        command = [AudioSegment.converter, '-loglevel', 'error', '-y', '-ss', f"{track['start_ms'] / 1000:.3f}"]
+        if track['end_ms'] is not None:
+            command += ['-t', f"{(track['end_ms'] - track['start_ms']) / 1000:.3f}"]
+        command += ['-i', file_path, '-map', '0:a:0', '-map_metadata', '-1']
+        if codec:
+            command += ['-c:a', codec]
+        if bitrate and muxer in ('ogg', 'mp4', 'asf'):
+            command += ['-b:a', str(bitrate)]
+        for key, value in (metadata or {}).items():
+            command += ['-metadata', f"{key}={value}"]
+        command += ['-f', muxer, temp_path]
+        with tempfile.TemporaryFile() as errors:
+            result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=errors)
+            if result.returncode != 0:
+                errors.seek(0)
+                message = errors.read().decode('utf-8', 'replace').strip()
+                message = message.splitlines()[-1] if message else ""
+                raise RuntimeError(f"Encoder failed for {track['title']} ({result.returncode}): {message}")
+
+
+class SplitThread(QThread):
+    """Split a recording into tracks in output_dir (default: a folder named
+    after the recording, next to it), tag them and list them in a playlist"""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, file_path, mode=SplitSettings.MODE_SILENCE, cue_path=None, output_dir=None,
+                 threshold_db=SplitSettings.THRESHOLD_DB, min_silence_ms=SplitSettings.MIN_SILENCE_MS,
+                 workers=SplitSettings.WORKERS):
+        super().__init__()
+        self.file_path = file_path
+        self.mode = mode
+        self.cue_path = cue_path
+        self.output_dir = output_dir or os.path.splitext(file_path)[0]
+        self.threshold_db = threshold_db
+        self.min_silence_ms = min_silence_ms
+        self.workers = workers
+        self.outputs = []
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report(self, start, end):
+        """Progress callback covering start..end percent"""
+        return lambda fraction: self.progress.emit(int(start + (end - start) * fraction))
+
+    def cut(self, tracks, temp_paths, metadata, start):
+        ext = os.path.splitext(self.file_path)[1].lower()
+        if ext == '.mp3':
+            self.status.emit(f"Cutting {len(tracks)} tracks at frame boundaries...")
+            AudioSplitter.cut_mp3(self.file_path, tracks, temp_paths, self.report(start, 95),
+                                  lambda: self.cancelled)
+            return
+        self.status.emit(f"Encoding {len(tracks)} tracks...")
+        try:
+            bitrate = mutagen.File(self.file_path).info.bitrate
+        except Exception:
+            bitrate = None
+        done = 0
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+            futures = [pool.submit(AudioSplitter.encode_track, self.file_path, track, temp_path, ext,
+                                   metadata[index], bitrate)
+                       for index, (track, temp_path) in enumerate(zip(tracks, temp_paths))]
+            for future in futures:
+                if self.cancelled:
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise RuntimeError("Cancelled")
+                future.result()
+                done += 1
+                self.progress.emit(int(start + (95 - start) * done / len(tracks)))
+
+    @Tracer.traced("split")
+    def run(self):
+        temp_paths = []
+        try:
+            self.status.emit(f"Finding tracks in {os.path.basename(self.file_path)}...")
+            silence = self.mode == SplitSettings.MODE_SILENCE
+            tracks, album = AudioSplitter.find_tracks(self.file_path, self.mode, self.cue_path,
+                                                      self.threshold_db, self.min_silence_ms,
+                                                      self.report(0, 50), lambda: self.cancelled)
+            source_tags, _ = TagTransfer.read_values(self.file_path)
+            tags = [AudioSplitter.track_tags(tracks, index, album, source_tags, self.file_path)
+                    for index in range(len(tracks))]
+            os.makedirs(self.output_dir, exist_ok=True)
+            paths, playlist_path = AudioSplitter.output_paths(self.file_path, tracks, self.output_dir,
+                                                              tags[0]['Album'][0])
+            temp_paths = [FileManager.temp_path(path) for path in paths]
+            ext = os.path.splitext(self.file_path)[1].lower()
+            metadata = [{} if ext in AudioSplitter.TAGGED_FORMATS else
+                        {AudioSplitter.FFMPEG_KEYS[tag_name]: values[0] for tag_name, values in track_tags.items()}
+                        for track_tags in tags]
+            self.cut(tracks, temp_paths, metadata, 50 if silence else 0)
+
+            self.status.emit("Tagging tracks...")
+            for path, temp_path, track_tags in zip(paths, temp_paths, tags):
+                if ext in AudioSplitter.TAGGED_FORMATS:
+                    TagWriter.set_tag_values(temp_path, track_tags)
+                os.replace(temp_path, path)
+                self.outputs.append(path)
+            temp_paths = []
+
+            PlaylistWriter.write_playlist(playlist_path, self.outputs, PlaylistWriter.format_for_path(playlist_path))
+            self.progress.emit(100)
+            self.finished.emit(True, f"Split into {len(self.outputs)} tracks in {self.output_dir}")
+        except Exception as e:
+            print(f"Error splitting audio: {e}")
+            self.finished.emit(False, str(e))
+        finally:
+            for temp_path in temp_paths:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
@@ -2,54 +2,252 @@
 import os
 from PyQt6.QtCore import QThread, pyqtSignal
 from pydub import AudioSegment
+from mutagen import File
+from mutagen.id3 import ID3
+from mutagen.mp3 import MP3
 from file_manager import FileManager
+from audio_encoder import Mp3StreamEncoder, ParallelMp3Encoder
+from audio_transitions import AudioTransitions, TransitionMixer, Transition, SilenceTrimmer
+from combine_job import CombineJob
+from chapter_writer import ChapterWriter
+from playlist_writer import PlaylistWriter
+from stream_verifier import StreamVerifier
+from metadata_cache import MetadataCache
+from config import CombineSettings, WatchSettings
+from tracing import Tracer
 
 class AudioCombinerThread(QThread):
     progress = pyqtSignal(int)
     status = pyqtSignal(str)
     finished = pyqtSignal(bool, str)
 
-    def __init__(self, files, save_path, thumbnail_source=None):
+    def __init__(self, files, save_path, thumbnail_source=None, transitions=None,
+                 bitrate=CombineSettings.DEFAULT_BITRATE, encoder=CombineSettings.ENCODER_SINGLE,
+                 workers=None, resumable=False, chapters=False, cue_sheet=False,
+                 chapter_playlist=False, verify_inputs=True, trim_silence=False,
+                 trim_threshold_db=CombineSettings.TRIM_THRESHOLD_DB):
         super().__init__()
         self.files = files
         self.save_path = save_path
         self.thumbnail_source = thumbnail_source
+        # A single Transition applies to every boundary, a list sets them per boundary
+        self.transitions = transitions
+        self.bitrate = bitrate
+        self.encoder = encoder
+        self.workers = workers
+        # Resumable jobs checkpoint encoded chunks to disk, so they always
+        # use the chunked encoder (with one worker in single encoder mode)
+        self.resumable = resumable
+        # Chapter outputs, built from the exact boundaries of the mix
+        self.chapters = chapters
+        self.cue_sheet = cue_sheet
+        self.chapter_playlist = chapter_playlist
+        # Check every input's stream before decoding anything
+        self.verify_inputs = verify_inputs
+        # Drop silence at both ends of every input; trimmed records the
+        # (head, tail) milliseconds removed per file
+        self.trim_silence = trim_silence
+        self.trim_threshold_db = trim_threshold_db
+        self.trimmed = {}
+        self.boundaries = []
+        self.cancelled = False
+
+    def cancel(self):
+        """Stop before the next input; resumable jobs keep their checkpoint"""
+        self.cancelled = True
+
+    def get_transition(self, index):
+        """Transition between files[index] and files[index + 1]"""
+        if isinstance(self.transitions, (list, tuple)):
+            if index < len(self.transitions) and self.transitions[index] is not None:
+                return self.transitions[index]
+            return Transition()
+        return self.transitions or Transition()
+
+    def job_params(self):
+        """Everything that determines the encoded audio of a resumable job"""
+        params = {
+            'files': [FileManager.file_identity(file) for file in self.files],
+            'transitions': [self.get_transition(i).to_dict() for i in range(len(self.files) - 1)],
+            'bitrate': self.bitrate,
+            'chunk_seconds': CombineSettings.PARALLEL_CHUNK_SECONDS
+        }
+        if self.trim_silence:
+            params['trim_threshold_db'] = self.trim_threshold_db
+        return params
+
+    def create_encoder(self, output_path, frame_rate, channels, job=None):
+        if job is not None:
+            workers = self.workers if self.encoder == CombineSettings.ENCODER_PARALLEL else 1
+            return ParallelMp3Encoder(output_path, frame_rate, channels, self.bitrate, workers,
+                                      job_dir=job.job_dir, chunks=job.manifest['chunks'],
+                                      on_chunk=job.record_chunks)
+        if self.encoder == CombineSettings.ENCODER_PARALLEL:
+            return ParallelMp3Encoder(output_path, frame_rate, channels, self.bitrate, self.workers)
+        return Mp3StreamEncoder(output_path, frame_rate, channels, self.bitrate)
+
+    @staticmethod
+    def probe_duration(file_path):
+        """Duration in milliseconds from the file header, without decoding"""
+        try:
+            audio = File(file_path)
+            if audio is not None and audio.info:
+                return int(audio.info.length * 1000)
+        except Exception as e:
+            print(f"Error probing {file_path}: {e}")
+        return 0
+
+    def resume(self, job, encoder, mixer):
+        """Position the mixer and encoder after the last checkpoint; returns
+        the index of the first input that still has to be decoded"""
+        records = job.manifest['inputs']
+        if encoder.complete:
+            first = len(self.files)
+            position = encoder.chunks[-1]['total_samples']
+        else:
+            resume_position = encoder.resume_position()
+            first = job.resume_input(resume_position) if records else 0
+            position = records[first]['start'] if records else 0
+            encoder.discard = resume_position - position
+        mixer.restore([{'file': self.files[i], 'start': record['start'], 'end': record['end'],
+                        'settled': record['settled']} for i, record in enumerate(records[:first])],
+                      position)
+        return first
+
+    def trim(self, file, samples, frame_rate):
+        """samples without the silence at their ends, as a view"""
+        with Tracer.span("combine.trim", file=os.path.basename(file)):
+            start, end = SilenceTrimmer.trim_bounds(samples, frame_rate, self.trim_threshold_db)
+        head_ms = start * 1000 // frame_rate
+        tail_ms = (len(samples) - end) * 1000 // frame_rate
+        self.trimmed[file] = (head_ms, tail_ms)
+        if head_ms or tail_ms:
+            self.status.emit(f"Trimmed {head_ms / 1000:.1f} s + {tail_ms / 1000:.1f} s of silence "
+                             f"from {os.path.basename(file)}")
+        return samples[start:end]
+
+    def trim_report(self):
+        """Lines listing the silence trimmed from each input"""
+        lines = [f"{os.path.basename(file)}: {head_ms / 1000:.1f} s + {tail_ms / 1000:.1f} s"
+                 for file, (head_ms, tail_ms) in self.trimmed.items() if head_ms or tail_ms]
+        if not lines:
+            return ""
+        total = sum(head_ms + tail_ms for head_ms, tail_ms in self.trimmed.values())
+        return (f"\n\nTrimmed {total / 1000:.1f} s of silence (start + end):\n" + "\n".join(lines))
+
+    def verify(self):
+        """Raise if any input is damaged; unchanged files come from the cache"""
+        self.status.emit("Verifying input files...")
+        cache = MetadataCache(WatchSettings.METADATA_DB)
+        try:
+            results = StreamVerifier.verify_many(self.files, cache, is_cancelled=lambda: self.cancelled)
+        finally:
+            cache.close()
+        if self.cancelled:
+            raise RuntimeError("Cancelled")
+        damaged = StreamVerifier.summary(results)
+        if damaged:
+            raise RuntimeError(f"{len(damaged)} input files are damaged:\n" + "\n".join(damaged))
+
+    @Tracer.traced("combine.tags")
+    def write_tags(self, output_path, chapters):
+        audio = MP3(output_path)
+        if not audio.tags:
+            audio.tags = ID3()
+        if self.thumbnail_source:
+            if not FileManager.copy_thumbnail_frame(self.thumbnail_source, audio.tags):
+                print("Failed to save thumbnail")
+        if self.chapters:
+            ChapterWriter.add_id3_chapters(audio.tags, chapters)
+        audio.save()
 
     def run(self):
+        encoder = None
+        output_path = None
         try:
-            total_length = 0
-            # First pass - calculate total length
-            for file in self.files:
-                self.status.emit(f"Analyzing: {os.path.basename(file)}")
-                audio = AudioSegment.from_file(file)
-                total_length += len(audio)
-
-            combined = AudioSegment.empty()
-            processed_length = 0
-            # Second pass - combine files
-            for file in self.files:
+            if self.verify_inputs:
+                self.verify()
+            self.status.emit("Analyzing input files...")
+            with Tracer.span("combine.probe", files=len(self.files)):
+                durations = [self.probe_duration(file) for file in self.files]
+            total_length = sum(durations) or 1
+
+            # Work on a temporary file and publish it with an atomic rename
+            output_path = FileManager.temp_path(self.save_path)
+            job = CombineJob(self.save_path, self.job_params()) if self.resumable else None
+
+            mixer = None
+            first = 0
+            if job is not None and job.output_format:
+                frame_rate = job.output_format['frame_rate']
+                channels = job.output_format['channels']
+                encoder = self.create_encoder(output_path, frame_rate, channels, job)
+                mixer = TransitionMixer(encoder.write, frame_rate, channels)
+                first = self.resume(job, encoder, mixer)
+                if first:
+                    self.status.emit(f"Resuming after checkpoint ({first} of {len(self.files)} files done)")
+
+            processed_length = sum(durations[:first])
+            for index in range(first, len(self.files)):
+                if self.cancelled:
+                    raise RuntimeError("Cancelled")
+                file = self.files[index]
                 self.status.emit(f"Combining: {os.path.basename(file)}")
-                audio = AudioSegment.from_file(file)
-                combined += audio
-                processed_length += len(audio)
-                self.progress.emit(int(processed_length * 100 / total_length))
+                with Tracer.span("combine.decode", file=os.path.basename(file)):
+                    audio = AudioSegment.from_file(file)
+                if mixer is None:
+                    # The first file decides the output format
+                    frame_rate, channels = audio.frame_rate, audio.channels
+                    if job is not None:
+                        job.set_output_format(frame_rate, channels)
+                    encoder = self.create_encoder(output_path, frame_rate, channels, job)
+                    mixer = TransitionMixer(encoder.write, frame_rate, channels)
+                with Tracer.span("combine.mix", file=os.path.basename(file)):
+                    audio = AudioTransitions.normalize(audio, mixer.frame_rate, mixer.channels)
+                    outgoing = self.get_transition(index) if index < len(self.files) - 1 else None
+                    samples = AudioTransitions.to_array(audio)
+                    if self.trim_silence:
+                        samples = self.trim(file, samples, mixer.frame_rate)
+                    mixer.add(file, samples, outgoing)
+                if job is not None:
+                    job.record_input(index, mixer.boundaries[-1])
+                processed_length += durations[index] or len(audio)
+                del audio, samples
+                self.progress.emit(min(100, int(processed_length * 100 / total_length)))
 
             self.status.emit("Exporting combined audio...")
-            # Export with parameters that ensure ID3 tag compatibility
-            combined.export(
-                self.save_path,
-                format="mp3",
-                tags={},  # Initialize empty tags
-                id3v2_version='3'  # Use ID3v2.3
-            )
-
-            # Apply thumbnail if selected
-            if self.thumbnail_source:
-                self.status.emit("Applying thumbnail...")
-                if not FileManager.save_thumbnail(self.thumbnail_source, self.save_path):
-                    print("Failed to save thumbnail")
-
-            self.finished.emit(True, "Audio files combined successfully!")
+            with Tracer.span("combine.finalize"):
+                mixer.finish()
+                encoder.close()
+            encoder = None
+            self.boundaries = mixer.boundary_times_ms()
+
+            chapters = []
+            if self.chapters or self.cue_sheet or self.chapter_playlist:
+                chapters = ChapterWriter.chapters_from_boundaries(self.boundaries)
+
+            # Apply thumbnail and chapter markers in a single tag save
+            if self.thumbnail_source or self.chapters:
+                self.status.emit("Writing tags...")
+                self.write_tags(output_path, chapters)
+
+            os.replace(output_path, self.save_path)
+            output_path = None
+            if job is not None:
+                job.remove()
+
+            base_path = os.path.splitext(self.save_path)[0]
+            if self.cue_sheet:
+                ChapterWriter.write_cue_sheet(base_path + ".cue", self.save_path, chapters,
+                                              os.path.basename(base_path))
+            if self.chapter_playlist:
+                PlaylistWriter.create_chapter_m3u_playlist(base_path + ".m3u8", self.save_path, chapters)
+
+            self.finished.emit(True, "Audio files combined successfully!" + self.trim_report())
         except Exception as e:
             print(f"Error in audio combining: {e}")
+            if encoder is not None:
+                encoder.abort()
+            if output_path and os.path.exists(output_path):
+                os.remove(output_path)
             self.finished.emit(False, str(e))
@@ -0,0 +1,215 @@
+# audio_transitions.py
+import subprocess
+import tempfile
+import numpy as np
+from pydub import AudioSegment
+from config import CombineSettings
+
+class Transition:
+    """Crossfade and gap settings for one boundary between two tracks"""
+    def __init__(self, crossfade_ms=0, gap_ms=0, curve=CombineSettings.CURVE_LINEAR):
+        self.crossfade_ms = max(0, int(crossfade_ms))
+        self.gap_ms = max(0, int(gap_ms))
+        self.curve = curve
+
+    def crossfade_frames(self, frame_rate):
+        return int(self.crossfade_ms * frame_rate / 1000)
+
+    def gap_frames(self, frame_rate):
+        return int(self.gap_ms * frame_rate / 1000)
+
+    def to_dict(self):
+        return {'crossfade_ms': self.crossfade_ms, 'gap_ms': self.gap_ms, 'curve': self.curve}
+
+    @staticmethod
+    def from_dict(data):
+        return Transition(data.get('crossfade_ms', 0), data.get('gap_ms', 0),
+                          data.get('curve', CombineSettings.CURVE_LINEAR))
+
+
+class AudioTransitions:
+    @staticmethod
+    def to_array(segment):
+        """View a 16-bit AudioSegment as an (frames, channels) int16 array without copying"""
+        samples = np.frombuffer(segment.raw_data, dtype=np.int16)
+        return samples.reshape(-1, segment.channels)
+
+    @staticmethod
+    def stream_pcm(file_path, frame_rate, channels, chunk_bytes):
+        """Decode a file's first audio stream with ffmpeg as 16-bit PCM,
+        yielding chunks of chunk_bytes (the last may be shorter), so memory
+        stays flat however long the file is"""
+        command = [
+            AudioSegment.converter, '-loglevel', 'error', '-i', file_path,
+            '-map', '0:a:0', '-ac', str(channels), '-ar', str(frame_rate), '-f', 's16le', 'pipe:1'
+        ]
+        with tempfile.TemporaryFile() as errors:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+            try:
+                while True:
+                    data = process.stdout.read(chunk_bytes)
+                    if not data:
+                        break
+                    yield data
+            except GeneratorExit:
+                # The caller stopped early
+                process.kill()
+                raise
+            finally:
+                process.stdout.close()
+                process.wait()
+            if process.returncode != 0:
+                errors.seek(0)
+                message = errors.read().decode('utf-8', 'replace').strip()
+                # ffmpeg ends with the line that sums the failure up
+                message = message.splitlines()[-1] if message else ""
+                raise RuntimeError(f"Decoder failed ({process.returncode}): {message}")
+
+    @staticmethod
+    def fade_curves(curve, frame_count):
+        """Return (fade_out, fade_in) gain arrays of the given length"""
+        t = (np.arange(frame_count, dtype=np.float32) + 0.5) / max(frame_count, 1)
+        if curve == CombineSettings.CURVE_EQUAL_POWER:
+            return np.cos(t * np.pi / 2), np.sin(t * np.pi / 2)
+        return 1.0 - t, t
+
+    @staticmethod
+    def apply_gain(samples, gain):
+        mixed = samples.astype(np.float32) * gain[:, None]
+        return np.clip(mixed, -32768, 32767).astype(np.int16)
+
+    @staticmethod
+    def mix(tail, head, curve):
+        """Crossfade two equally long overlap regions"""
+        fade_out, fade_in = AudioTransitions.fade_curves(curve, len(tail))
+        mixed = tail.astype(np.float32) * fade_out[:, None] + head.astype(np.float32) * fade_in[:, None]
+        return np.clip(mixed, -32768, 32767).astype(np.int16)
+
+    @staticmethod
+    def normalize(segment, frame_rate, channels):
+        """Convert a segment to the shared output format (16-bit PCM)"""
+        if segment.frame_rate != frame_rate:
+            segment = segment.set_frame_rate(frame_rate)
+        if segment.channels != channels:
+            segment = segment.set_channels(channels)
+        if segment.sample_width != 2:
+            segment = segment.set_sample_width(2)
+        return segment
+
+
+class SilenceTrimmer:
+    """Finds silence at the ends of a track from the RMS level of short
+    windows. Only the head and tail are scanned, so the cost doesn't grow
+    with the length of the track."""
+    @staticmethod
+    def window_levels(samples, window, hop):
+        """dBFS of windows of `window` frames starting every `hop` frames"""
+        samples = samples.astype(np.float32)
+        power = np.einsum('ij,ij->i', samples, samples) / samples.shape[1]
+        # A running sum gives every window's energy without a Python loop
+        totals = np.concatenate(([0.0], np.cumsum(power, dtype=np.float64)))
+        starts = np.arange(0, len(power) - window + 1, hop)
+        energy = (totals[starts + window] - totals[starts]) / window
+        return 10 * np.log10(np.maximum(energy, 1e-10) / 32768.0 ** 2)
+
+    @staticmethod
+    def leading_silence(samples, frame_rate, threshold_db, scan_frames):
+        """Frames of silence at the start of samples, at most scan_frames"""
+        window = max(1, int(frame_rate * CombineSettings.TRIM_WINDOW_MS / 1000))
+        hop = max(1, int(frame_rate * CombineSettings.TRIM_HOP_MS / 1000))
+        region = samples[:scan_frames]
+        if len(region) < window:
+            return 0
+        loud = np.flatnonzero(SilenceTrimmer.window_levels(region, window, hop) > threshold_db)
+        return int(loud[0]) * hop if len(loud) else len(region)
+
+    @staticmethod
+    def trim_bounds(samples, frame_rate, threshold_db=CombineSettings.TRIM_THRESHOLD_DB):
+        """(start, end) frames of samples without their leading and trailing
+        silence; a track that is silent throughout is left whole"""
+        scan = int(frame_rate * CombineSettings.TRIM_SCAN_SECONDS)
+        keep = int(frame_rate * CombineSettings.TRIM_KEEP_MS / 1000)
+        head = SilenceTrimmer.leading_silence(samples, frame_rate, threshold_db, scan)
+        if head >= len(samples):
+            return 0, len(samples)
+        tail = SilenceTrimmer.leading_silence(samples[::-1], frame_rate, threshold_db, scan)
+        return max(0, head - keep), min(len(samples), len(samples) - tail + keep)
+
+
+class TransitionMixer:
+    """Joins tracks into a PCM sink, keeping only the overlap region of each
+    boundary in memory so the combined output is never materialized."""
+    def __init__(self, sink, frame_rate, channels, position=0):
+        self.sink = sink
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.position = position
+        self.boundaries = []
+        self.tail = None
+        self.tail_transition = None
+
+    def restore(self, boundaries, position):
+        """Continue a timeline whose earlier boundaries are already known"""
+        self.boundaries = [dict(boundary) for boundary in boundaries]
+        self.position = position
+
+    def write(self, samples):
+        if len(samples):
+            self.sink(np.ascontiguousarray(samples).data)
+            self.position += len(samples)
+
+    def add(self, file_path, samples, outgoing=None):
+        """Add a track; `outgoing` is the transition to the next track (None for the last)"""
+        head_start = 0
+        if self.tail is not None:
+            transition = self.tail_transition
+            tail = self.tail
+            self.tail = None
+            if transition.gap_ms:
+                # Fade out, insert silence, fade in without overlapping
+                fade_out, _ = AudioTransitions.fade_curves(transition.curve, len(tail))
+                self.write(AudioTransitions.apply_gain(tail, fade_out))
+                self.write(np.zeros((transition.gap_frames(self.frame_rate), self.channels), dtype=np.int16))
+                head_start = min(transition.crossfade_frames(self.frame_rate), len(samples))
+                start = self.position
+                if head_start:
+                    _, fade_in = AudioTransitions.fade_curves(transition.curve, head_start)
+                    self.write(AudioTransitions.apply_gain(samples[:head_start], fade_in))
+            else:
+                overlap = min(len(tail), len(samples))
+                self.write(tail[:len(tail) - overlap])
+                start = self.position
+                if overlap:
+                    self.write(AudioTransitions.mix(tail[len(tail) - overlap:], samples[:overlap],
+                                                    transition.curve))
+                head_start = overlap
+        else:
+            start = self.position
+
+        # Hold back the region that will be mixed into the next track
+        hold = 0
+        if outgoing is not None:
+            hold = min(outgoing.crossfade_frames(self.frame_rate), len(samples) - head_start)
+        self.write(samples[head_start:len(samples) - hold])
+        if outgoing is not None:
+            self.tail = samples[len(samples) - hold:]
+            self.tail_transition = outgoing
+
+        end = start + len(samples)
+        if outgoing is not None and outgoing.gap_ms:
+            end += outgoing.gap_frames(self.frame_rate)
+        # From `settled` on, the output no longer depends on the previous track
+        self.boundaries.append({'file': file_path, 'start': start, 'end': end,
+                                'settled': start + head_start})
+
+    def finish(self):
+        if self.tail is not None:
+            self.write(self.tail)
+            self.tail = None
+
+    def boundary_times_ms(self):
+        """Boundary start/end times in milliseconds, for chapter markers and cue sheets"""
+        return [{'file': b['file'],
+                 'start_ms': b['start'] * 1000 // self.frame_rate,
+                 'end_ms': min(b['end'], self.position) * 1000 // self.frame_rate}
+                for b in self.boundaries]
@@ -0,0 +1,184 @@
+# benchmarks/latency_shim.py
+"""Simulates a high-latency mount (NFS, SMB) on a local folder.
+
+While active, every metadata call (scandir, stat, listdir, DirEntry.stat)
+and every read that reaches the OS for a path under the root sleeps for the
+configured latency first. Reads served from a Python buffer are free, as
+they would be over the network. Sleeping releases the GIL, so concurrent
+requests overlap the way outstanding requests to a file server do.
+"""
+import builtins
+import io
+import os
+import threading
+import time
+
+class LatentRaw(io.RawIOBase):
+    """Unbuffered file whose reads each cost one round trip"""
+
+    def __init__(self, raw, shim):
+        super().__init__()
+        self.inner = raw
+        self.shim = shim
+        self.name = raw.name
+        self.mode = raw.mode
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        self.shim.delay()
+        return self.inner.readinto(buffer)
+
+    def read(self, size=-1):
+        self.shim.delay()
+        return self.inner.read(size)
+
+    def readall(self):
+        self.shim.delay()
+        return self.inner.readall()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.inner.seek(offset, whence)
+
+    def tell(self):
+        return self.inner.tell()
+
+    def fileno(self):
+        return self.inner.fileno()
+
+    def close(self):
+        self.inner.close()
+        super().close()
+
+
+class LatentEntry:
+    """os.DirEntry whose stat() costs a round trip (type checks are free,
+    as READDIRPLUS / SMB directory listings return file types)"""
+
+    def __init__(self, entry, shim):
+        self.entry = entry
+        self.shim = shim
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self, follow_symlinks=True):
+        return self.entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, follow_symlinks=True):
+        return self.entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_symlink(self):
+        return self.entry.is_symlink()
+
+    def inode(self):
+        return self.entry.inode()
+
+    def stat(self, follow_symlinks=True):
+        self.shim.delay()
+        return self.entry.stat(follow_symlinks=follow_symlinks)
+
+    def __fspath__(self):
+        return self.path
+
+
+class LatentScandir:
+    def __init__(self, iterator, shim):
+        self.iterator = iterator
+        self.shim = shim
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return LatentEntry(next(self.iterator), self.shim)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.iterator.close()
+
+
+class LatencyShim:
+    """Context manager that patches os and open() for paths under root"""
+
+    def __init__(self, root, latency_ms):
+        self.root = os.path.abspath(root)
+        self.latency = latency_ms / 1000
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.originals = {}
+
+    def delay(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+    def covers(self, path):
+        if isinstance(path, int):
+            return False
+        try:
+            path = os.path.abspath(os.fsdecode(path))
+        except TypeError:
+            return False
+        return path == self.root or path.startswith(self.root + os.sep)
+
+    def wrap_stat(self, original):
+        def stat(path, *args, **kwargs):
+            if self.covers(path):
+                self.delay()
+            return original(path, *args, **kwargs)
+        return stat
+
+    def scandir(self, path='.'):
+        iterator = self.originals['scandir'](path)
+        if not self.covers(path):
+            return iterator
+        self.delay()
+        return LatentScandir(iterator, self)
+
+    def listdir(self, path='.'):
+        if self.covers(path):
+            self.delay()
+        return self.originals['listdir'](path)
+
+    def open(self, file, mode='r', buffering=-1, *args, **kwargs):
+        original = self.originals['open']
+        if 'r' not in mode or '+' in mode or not self.covers(file):
+            return original(file, mode, buffering, *args, **kwargs)
+        self.delay()  # the open itself is a round trip
+        if 'b' not in mode:
+            # Text files (manifests, playlists) are small: one round trip
+            return original(file, mode, buffering, *args, **kwargs)
+        raw = LatentRaw(original(file, 'rb', buffering=0), self)
+        if buffering == 0:
+            return raw
+        size = buffering if buffering > 1 else io.DEFAULT_BUFFER_SIZE
+        return io.BufferedReader(raw, size)
+
+    def __enter__(self):
+        self.originals = {'stat': os.stat, 'lstat': os.lstat, 'scandir': os.scandir,
+                          'listdir': os.listdir, 'open': builtins.open}
+        os.stat = self.wrap_stat(self.originals['stat'])
+        os.lstat = self.wrap_stat(self.originals['lstat'])
+        os.scandir = self.scandir
+        os.listdir = self.listdir
+        builtins.open = self.open
+        io.open = self.open
+        return self
+
+    def __exit__(self, *exc):
+        os.stat = self.originals['stat']
+        os.lstat = self.originals['lstat']
+        os.scandir = self.originals['scandir']
+        os.listdir = self.originals['listdir']
+        builtins.open = self.originals['open']
+        io.open = self.originals['open']
+        return False
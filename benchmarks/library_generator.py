@@ -0,0 +1,318 @@
+# library_generator.py
+import base64
+import json
+import os
+import random
+import shutil
+import struct
+import subprocess
+import wave
+import numpy as np
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice
+from PyQt6.QtGui import QImage
+from mutagen.id3 import ID3, APIC, COMM, TALB, TCON, TDRC, TIT2, TPE1, TPE2, TRCK
+from mutagen.flac import FLAC, Picture
+from mutagen.oggvorbis import OggVorbis
+from mutagen.wave import WAVE
+from mp3_frames import Mp3Frames
+
+class LibraryGenerator:
+    """Synthesizes a reproducible music library: nested Artist/Album folders
+    of short silent or tone tracks with realistic tags and cover art. Every
+    format except OGG is written without external tools; OGG (and tone MP3
+    or FLAC) need ffmpeg and are skipped or fall back to silence without it."""
+    SAMPLE_RATE = 44100
+    CHANNELS = 2
+    FLAC_BLOCK_SIZE = 4096
+    GENRES = ["Rock", "Jazz", "Classical", "Electronic", "Hip-Hop", "Folk", "Audiobook", "Ambient"]
+    WORDS = ["Blue", "Night", "River", "Echo", "Glass", "Summer", "Static", "Golden", "Paper",
+             "Signal", "Winter", "Ghost", "Velvet", "Northern", "Machine", "Quiet", "Electric"]
+    MANIFEST = "library.json"
+
+    def __init__(self, root, tracks=200, formats=("mp3",), duration=5.0, tracks_per_album=10,
+                 albums_per_artist=3, art_size=600, art_format="jpg", art_ratio=0.9,
+                 tone=False, seed=1234):
+        self.root = root
+        self.tracks = tracks
+        self.formats = list(formats)
+        self.duration = duration
+        self.tracks_per_album = tracks_per_album
+        self.albums_per_artist = albums_per_artist
+        self.art_size = art_size
+        self.art_format = art_format
+        self.art_ratio = art_ratio
+        self.tone = tone
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.ffmpeg = LibraryGenerator.find_ffmpeg()
+        self.skipped_formats = []
+
+    @staticmethod
+    def find_ffmpeg():
+        try:
+            from pydub import AudioSegment
+            converter = AudioSegment.converter
+        except Exception:
+            converter = "ffmpeg"
+        return shutil.which(converter) or shutil.which("ffmpeg")
+
+    def params(self):
+        return {
+            'tracks': self.tracks,
+            'formats': self.formats,
+            'duration': self.duration,
+            'tracks_per_album': self.tracks_per_album,
+            'albums_per_artist': self.albums_per_artist,
+            'art_size': self.art_size,
+            'art_format': self.art_format,
+            'art_ratio': self.art_ratio,
+            'tone': self.tone,
+            'seed': self.seed
+        }
+
+    @staticmethod
+    def load_manifest(root):
+        """Manifest of an existing library, or None"""
+        try:
+            with open(os.path.join(root, LibraryGenerator.MANIFEST), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # Audio templates
+
+    def pcm(self):
+        """16-bit interleaved PCM of one track: silence or a 440 Hz tone"""
+        frames = int(self.duration * self.SAMPLE_RATE)
+        if not self.tone:
+            return np.zeros(frames * self.CHANNELS, dtype=np.int16)
+        t = np.arange(frames) / self.SAMPLE_RATE
+        wave_data = (np.sin(2 * np.pi * 440 * t) * 8000).astype(np.int16)
+        return np.repeat(wave_data, self.CHANNELS)
+
+    def write_wav(self, path):
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(self.CHANNELS)
+            wav.setsampwidth(2)
+            wav.setframerate(self.SAMPLE_RATE)
+            wav.writeframes(self.pcm().tobytes())
+
+    def write_silent_mp3(self, path):
+        """MPEG-1 Layer III, 128 kbps CBR frames with empty side info, which
+        every decoder plays as silence"""
+        bitrate = 128
+        header = bytes([0xFF, 0xFB, 0x90, 0x04])
+        frame = header + bytes(Mp3Frames.frame_length(1, bitrate, self.SAMPLE_RATE) - 4)
+        frame_count = int(self.duration * self.SAMPLE_RATE / 1152) + 1
+        with open(path, 'wb') as f:
+            f.write(frame * frame_count)
+
+    @staticmethod
+    def crc8(data):
+        crc = 0
+        for byte in data:
+            crc ^= byte
+            for _ in range(8):
+                crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        return crc
+
+    @staticmethod
+    def crc16(data):
+        crc = 0
+        for byte in data:
+            crc ^= byte << 8
+            for _ in range(8):
+                crc = ((crc << 1) ^ 0x8005) & 0xFFFF if crc & 0x8000 else (crc << 1) & 0xFFFF
+        return crc
+
+    @staticmethod
+    def utf8_number(value):
+        """FLAC's UTF-8 style coding of frame numbers"""
+        if value < 0x80:
+            return bytes([value])
+        count = 2
+        while value >= 1 << (5 * count + 1):
+            count += 1
+        payload = []
+        for _ in range(count - 1):
+            payload.insert(0, 0x80 | (value & 0x3F))
+            value >>= 6
+        return bytes([((0xFF << (8 - count)) & 0xFF) | value] + payload)
+
+    def write_silent_flac(self, path):
+        """FLAC stream of CONSTANT subframes (digital silence)"""
+        total = int(self.duration * self.SAMPLE_RATE)
+        block = self.FLAC_BLOCK_SIZE
+        info = struct.pack('>HH', block, block) + bytes(6)
+        packed = (self.SAMPLE_RATE << 44) | ((self.CHANNELS - 1) << 41) | (15 << 36) | total
+        info += packed.to_bytes(8, 'big') + bytes(16)
+        data = bytearray(b'fLaC')
+        data += bytes([0x80]) + len(info).to_bytes(3, 'big') + info
+
+        for number, start in enumerate(range(0, total, block)):
+            size = min(block, total - start)
+            # Block size code 12 = 4096 samples, 7 = 16-bit size at the end of the header
+            code = 12 if size == block else 7
+            header = bytearray([0xFF, 0xF8, (code << 4) | 0x09, (0x01 << 4) | (0x04 << 1)])
+            header += self.utf8_number(number)
+            if code == 7:
+                header += struct.pack('>H', size - 1)
+            header.append(self.crc8(header))
+            frame = header + bytes([0x00, 0x00, 0x00]) * self.CHANNELS
+            data += frame + struct.pack('>H', self.crc16(frame))
+
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def ffmpeg_encode(self, wav_path, path, codec_args):
+        if not self.ffmpeg:
+            return False
+        result = subprocess.run([self.ffmpeg, '-loglevel', 'error', '-y', '-i', wav_path]
+                                + codec_args + [path], capture_output=True)
+        return result.returncode == 0 and os.path.exists(path)
+
+    def build_templates(self, template_dir):
+        """One untagged file per format; tracks are tagged copies of these"""
+        os.makedirs(template_dir, exist_ok=True)
+        wav_path = os.path.join(template_dir, 'template.wav')
+        self.write_wav(wav_path)
+        templates = {}
+        for fmt in self.formats:
+            path = os.path.join(template_dir, 'template.' + fmt)
+            if fmt == 'wav':
+                templates[fmt] = wav_path
+                continue
+            if fmt == 'mp3':
+                if not (self.tone and self.ffmpeg_encode(wav_path, path, ['-b:a', '128k'])):
+                    self.write_silent_mp3(path)
+            elif fmt == 'flac':
+                if not (self.tone and self.ffmpeg_encode(wav_path, path, [])):
+                    self.write_silent_flac(path)
+            elif fmt == 'ogg':
+                if not self.ffmpeg_encode(wav_path, path, ['-c:a', 'libvorbis', '-q:a', '3']):
+                    self.skipped_formats.append(fmt)
+                    continue
+            else:
+                self.skipped_formats.append(fmt)
+                continue
+            templates[fmt] = path
+        return templates
+
+    # Cover art
+
+    def make_cover(self, index):
+        """Gradient with a little noise, so it compresses like a real photo
+        rather than a flat color"""
+        size = self.art_size
+        rng = np.random.default_rng(self.seed + index)
+        base = rng.integers(0, 256, 3)
+        ramp = np.linspace(0, 1, size, dtype=np.float32)
+        pixels = np.empty((size, size, 4), dtype=np.uint8)
+        for channel in range(3):
+            gradient = base[channel] * (1 - ramp[None, :] * 0.6) + 90 * ramp[:, None]
+            noise = rng.normal(0, 12, (size, size))
+            pixels[:, :, 2 - channel] = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+        pixels[:, :, 3] = 255
+        image = QImage(pixels.tobytes(), size, size, QImage.Format.Format_ARGB32).copy()
+        output = QByteArray()
+        buffer = QBuffer(output)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        image.save(buffer, 'PNG' if self.art_format == 'png' else 'JPEG', 90)
+        return bytes(output)
+
+    # Tagging
+
+    def title(self):
+        return " ".join(self.random.sample(self.WORDS, self.random.randint(1, 3)))
+
+    def tag_file(self, path, fmt, tags, cover):
+        mime = 'image/png' if self.art_format == 'png' else 'image/jpeg'
+        if fmt in ('mp3', 'wav'):
+            audio = WAVE(path) if fmt == 'wav' else None
+            id3 = ID3()
+            id3.add(TIT2(encoding=3, text=tags['title']))
+            id3.add(TPE1(encoding=3, text=tags['artist']))
+            id3.add(TPE2(encoding=3, text=tags['artist']))
+            id3.add(TALB(encoding=3, text=tags['album']))
+            id3.add(TRCK(encoding=3, text=tags['track']))
+            id3.add(TDRC(encoding=3, text=tags['year']))
+            id3.add(TCON(encoding=3, text=tags['genre']))
+            id3.add(COMM(encoding=3, lang='eng', desc='', text="Generated benchmark track"))
+            if cover:
+                id3.add(APIC(encoding=3, mime=mime, type=3, desc='Cover', data=cover))
+            if audio is not None:
+                audio.add_tags()
+                for frame in id3.values():
+                    audio.tags.add(frame)
+                audio.save()
+            else:
+                id3.save(path)
+            return
+
+        audio = FLAC(path) if fmt == 'flac' else OggVorbis(path)
+        if audio.tags is None:
+            audio.add_tags()
+        audio['title'] = tags['title']
+        audio['artist'] = tags['artist']
+        audio['albumartist'] = tags['artist']
+        audio['album'] = tags['album']
+        audio['tracknumber'] = tags['track']
+        audio['date'] = tags['year']
+        audio['genre'] = tags['genre']
+        audio['comment'] = "Generated benchmark track"
+        if cover:
+            picture = Picture()
+            picture.type = 3
+            picture.mime = mime
+            picture.desc = 'Cover'
+            picture.width = picture.height = self.art_size
+            picture.depth = 24
+            picture.data = cover
+            if fmt == 'flac':
+                audio.add_picture(picture)
+            else:
+                audio['metadata_block_picture'] = [base64.b64encode(picture.write()).decode('ascii')]
+        audio.save()
+
+    def generate(self):
+        """Write the library and its manifest; returns the manifest"""
+        os.makedirs(self.root, exist_ok=True)
+        template_dir = os.path.join(self.root, '.templates')
+        templates = self.build_templates(template_dir)
+        formats = [fmt for fmt in self.formats if fmt in templates]
+        if not formats:
+            raise RuntimeError("None of the requested formats can be generated here")
+
+        files = []
+        covers = {}
+        album_index = -1
+        tags = {}
+        for index in range(self.tracks):
+            track = index % self.tracks_per_album
+            if track == 0:
+                album_index += 1
+                artist_index = album_index // self.albums_per_artist
+                tags = {
+                    'artist': f"Artist {artist_index:03d} {self.random.choice(self.WORDS)}",
+                    'album': f"Album {album_index:04d} {self.title()}",
+                    'year': str(self.random.randint(1960, 2024)),
+                    'genre': self.random.choice(self.GENRES)
+                }
+                has_art = self.random.random() < self.art_ratio
+                covers[album_index] = self.make_cover(album_index) if has_art else None
+
+            fmt = formats[index % len(formats)]
+            title = self.title()
+            folder = os.path.join(self.root, tags['artist'], tags['album'])
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"{track + 1:02d} - {title}.{fmt}")
+            shutil.copyfile(templates[fmt], path)
+            self.tag_file(path, fmt, dict(tags, title=title, track=f"{track + 1}/{self.tracks_per_album}"),
+                          covers[album_index])
+            files.append(os.path.relpath(path, self.root))
+
+        shutil.rmtree(template_dir, ignore_errors=True)
+        manifest = {'params': self.params(), 'skipped_formats': self.skipped_formats, 'files': files}
+        with open(os.path.join(self.root, self.MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
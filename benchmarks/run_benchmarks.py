@@ -0,0 +1,468 @@
+# run_benchmarks.py
+"""Offline benchmark suite.
+
+    python -m benchmarks.run_benchmarks --tracks 200 --output results.json
+    python -m benchmarks.run_benchmarks --compare results.json
+
+Generates (or reuses) a synthetic library, times each scenario and writes
+machine-readable JSON. With --compare, each scenario's median is checked
+against a baseline file and the exit code is 1 if any regressed.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QEventLoop, QTimer
+from PyQt6.QtWidgets import QApplication
+from mutagen import File
+from mutagen.id3 import ID3
+from mutagen.mp3 import MP3
+from benchmarks.library_generator import LibraryGenerator
+from benchmarks.latency_shim import LatencyShim
+from file_manager import FileManager
+from playlist_writer import PlaylistWriter
+from tag_definitions import TagDefinitions
+from tag_reader import FastTagReader
+from concurrent_scanner import ConcurrentScanner
+from network_io import NetworkIO
+from config import CombineSettings, DiagnosticsSettings, ScanSettings
+from tracing import Tracer
+from stall_watchdog import StallWatchdog
+
+class SkipScenario(Exception):
+    """Raised by a scenario that cannot run in this environment"""
+
+
+class BenchmarkContext:
+    def __init__(self, root, scratch, combine_tracks, stall_ms=DiagnosticsSettings.STALL_MS):
+        self.root = root
+        self.scratch = scratch
+        self.combine_tracks = combine_tracks
+        self.watchdog = StallWatchdog(stall_ms)
+        # Set by GUI scenarios: time spent in the measured call and the
+        # watchdog summary of that call
+        self.elapsed = None
+        self.responsiveness = None
+        self.io_mode = NetworkIO.mode
+        self.files = FileManager.get_audio_files(root, True, "name")
+        self.mp3_files = [file for file in self.files if file.lower().endswith('.mp3')]
+
+    def output_path(self, name):
+        return os.path.join(self.scratch, name)
+
+    def run_in_event_loop(self, func, settle_ms=500):
+        """Call func from a running event loop under the stall watchdog, then
+        keep the loop going for settle_ms so queued work (background
+        thumbnail loads, repaints) is included in the responsiveness data"""
+        loop = QEventLoop()
+        result = {}
+
+        def call():
+            start = time.perf_counter()
+            try:
+                result['value'] = func()
+            except Exception as e:
+                result['error'] = e
+            self.elapsed = time.perf_counter() - start
+            QTimer.singleShot(settle_ms, loop.quit)
+
+        self.watchdog.reset()
+        self.watchdog.start()
+        QTimer.singleShot(DiagnosticsSettings.HEARTBEAT_MS * 2, call)
+        loop.exec()
+        self.watchdog.stop()
+        self.responsiveness = self.watchdog.summary()
+        if 'error' in result:
+            raise result['error']
+        return result['value']
+
+
+class Scenarios:
+    """Each scenario runs once per repeat and returns the number of items it
+    processed, so results can be compared per item as well as in total"""
+    REGISTRY = {}
+    GUI = set()
+
+    @staticmethod
+    def scenario(name, gui=False):
+        def register(func):
+            Scenarios.REGISTRY[name] = func
+            if gui:
+                Scenarios.GUI.add(name)
+            return func
+        return register
+
+
+@Scenarios.scenario("scan_recursive")
+def scan_recursive(context):
+    return len(FileManager.get_audio_files(context.root, True, "name"))
+
+@Scenarios.scenario("scan_sort_by_date")
+def scan_sort_by_date(context):
+    return len(FileManager.get_audio_files(context.root, True, "date"))
+
+@Scenarios.scenario("scan_concurrent")
+def scan_concurrent(context):
+    """The high-latency scan FileManager switches to on network mounts"""
+    return len(ConcurrentScanner.get_audio_files(context.root, True, "name"))
+
+@Scenarios.scenario("scan_concurrent_by_date")
+def scan_concurrent_by_date(context):
+    return len(ConcurrentScanner.get_audio_files(context.root, True, "date"))
+
+@Scenarios.scenario("tag_headers_concurrent")
+def tag_headers_concurrent(context):
+    """Display tags for every track, read concurrently with coalesced reads"""
+    NetworkIO.set_mode(ScanSettings.MODE_NETWORK)
+    try:
+        ConcurrentScanner.read_tags(context.files)
+    finally:
+        NetworkIO.set_mode(context.io_mode)
+    return len(context.files)
+
+@Scenarios.scenario("extract_thumbnail_full")
+def extract_thumbnail_full(context):
+    for file in context.files:
+        FileManager.extract_thumbnail(file)
+    return len(context.files)
+
+@Scenarios.scenario("extract_thumbnail_scaled")
+def extract_thumbnail_scaled(context):
+    for file in context.files:
+        FileManager.extract_thumbnail(file, 32)
+    return len(context.files)
+
+@Scenarios.scenario("playlist_m3u")
+def playlist_m3u(context):
+    PlaylistWriter.create_m3u_playlist(context.output_path("bench.m3u"), context.files)
+    return len(context.files)
+
+@Scenarios.scenario("playlist_m3u8")
+def playlist_m3u8(context):
+    PlaylistWriter.create_m3u_playlist(context.output_path("bench.m3u8"), context.files, True)
+    return len(context.files)
+
+@Scenarios.scenario("playlist_pls")
+def playlist_pls(context):
+    PlaylistWriter.create_pls_playlist(context.output_path("bench.pls"), context.files)
+    return len(context.files)
+
+@Scenarios.scenario("playlist_wpl")
+def playlist_wpl(context):
+    PlaylistWriter.create_wpl_playlist(context.output_path("bench.wpl"), context.files)
+    return len(context.files)
+
+@Scenarios.scenario("tag_load_all")
+def tag_load_all(context):
+    """What ID3BatchEditor.load_all_tags does when the editor opens"""
+    for file in context.mp3_files:
+        audio = MP3(file)
+        if not audio.tags:
+            audio.tags = ID3()
+    return len(context.mp3_files)
+
+@Scenarios.scenario("tag_display_full")
+def tag_display_full(context):
+    """Display tags for every track through a full mutagen parse"""
+    for file in context.files:
+        TagDefinitions.get_all_values(File(file))
+    return len(context.files)
+
+@Scenarios.scenario("tag_display_fast")
+def tag_display_fast(context):
+    """Display tags for every track through FastTagReader (mutagen fallback)"""
+    for file in context.files:
+        if FastTagReader.read(file) is None:
+            TagDefinitions.get_all_values(File(file))
+    return len(context.files)
+
+@Scenarios.scenario("tag_batch_apply")
+def tag_batch_apply(context):
+    """What ID3BatchEditor.apply_changes does for a multi-file selection"""
+    updates = [TagDefinitions.create_tag(tag_name, value) for tag_name, value in
+               (('Album', 'Benchmark Album'), ('Genre', 'Benchmark'), ('Year', '2024'),
+                ('Comment', 'Updated by the benchmark suite'))]
+    for file in context.mp3_files:
+        tags = MP3(file).tags or ID3()
+        for frame in updates:
+            tags.add(frame)
+        tags.save(file)
+    return len(context.mp3_files)
+
+def run_combine(context, encoder):
+    from audio_thread import AudioCombinerThread
+    if not LibraryGenerator.find_ffmpeg():
+        raise SkipScenario("ffmpeg not found")
+    files = context.mp3_files[:context.combine_tracks]
+    if not files:
+        raise SkipScenario("no MP3 tracks in the library")
+
+    result = {}
+    thread = AudioCombinerThread(files, context.output_path(f"combined_{encoder}.mp3"),
+                                 encoder=encoder)
+    thread.finished.connect(lambda success, message: result.update(success=success, message=message))
+    thread.run()
+    if not result.get('success'):
+        raise RuntimeError(result.get('message', 'combine failed'))
+    return len(files)
+
+@Scenarios.scenario("combine_single")
+def combine_single(context):
+    return run_combine(context, CombineSettings.ENCODER_SINGLE)
+
+@Scenarios.scenario("combine_parallel")
+def combine_parallel(context):
+    return run_combine(context, CombineSettings.ENCODER_PARALLEL)
+
+
+@Scenarios.scenario("gui_show_library", gui=True)
+def gui_show_library(context):
+    """Open the main window on the library folder: scan, list and thumbnails"""
+    from main import PlaylistCreator
+
+    def show():
+        window = PlaylistCreator()
+        window.show()
+        window.dir_entry.setText(context.root)
+        context.window = window
+        return window.available_list.count()
+
+    try:
+        return context.run_in_event_loop(show)
+    finally:
+        context.window.close()
+        context.window.deleteLater()
+
+@Scenarios.scenario("gui_open_tag_editor", gui=True)
+def gui_open_tag_editor(context):
+    """Open the batch tag editor on every MP3 and show the first file"""
+    from id3_editor import ID3BatchEditor
+
+    def open_editor():
+        editor = ID3BatchEditor(context.mp3_files)
+        editor.show()
+        editor.file_list.setCurrentRow(0)
+        context.editor = editor
+        return len(context.mp3_files)
+
+    try:
+        return context.run_in_event_loop(open_editor)
+    finally:
+        context.editor.close()
+        context.editor.deleteLater()
+
+
+class BenchmarkRunner:
+    def __init__(self, context, repeat=3, warmup=1):
+        self.context = context
+        self.repeat = repeat
+        self.warmup = warmup
+
+    def run_scenario(self, name):
+        func = Scenarios.REGISTRY[name]
+        try:
+            for _ in range(self.warmup):
+                func(self.context)
+            runs = []
+            responsiveness = []
+            items = 0
+            for _ in range(self.repeat):
+                self.context.elapsed = None
+                start = time.perf_counter()
+                items = func(self.context)
+                elapsed = time.perf_counter() - start
+                if name in Scenarios.GUI:
+                    elapsed = self.context.elapsed
+                    responsiveness.append(self.context.responsiveness)
+                runs.append(elapsed)
+        except SkipScenario as e:
+            return {'skipped': str(e)}
+        except Exception as e:
+            return {'error': f"{type(e).__name__}: {e}"}
+
+        median = statistics.median(runs)
+        result = {
+            'runs': runs,
+            'min': min(runs),
+            'median': median,
+            'mean': statistics.mean(runs),
+            'items': items,
+            'per_item_ms': median * 1000 / items if items else None
+        }
+        if responsiveness:
+            result['responsiveness'] = {
+                'runs': responsiveness,
+                'stall_count': statistics.median(run['stall_count'] for run in responsiveness),
+                'stall_total_ms': statistics.median(run['stall_total_ms'] for run in responsiveness),
+                'stall_max_ms': max(run['stall_max_ms'] for run in responsiveness)
+            }
+        return result
+
+    def run(self, names):
+        results = {}
+        for name in names:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = self.run_scenario(name)
+            outcome = results[name]
+            if 'median' in outcome:
+                print(f"  median {outcome['median'] * 1000:.1f} ms over {outcome['items']} items",
+                      file=sys.stderr)
+                if 'responsiveness' in outcome:
+                    stalls = outcome['responsiveness']
+                    print(f"  {stalls['stall_count']:g} stalls, {stalls['stall_total_ms']:.0f} ms stalled, "
+                          f"longest {stalls['stall_max_ms']:.0f} ms", file=sys.stderr)
+            else:
+                print(f"  {outcome}", file=sys.stderr)
+        return results
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    }
+
+def compare_results(current, baseline, threshold, min_delta):
+    """Print a comparison table; returns the names of regressed scenarios"""
+    regressions = []
+    print(f"{'scenario':<28}{'baseline ms':>14}{'current ms':>14}{'change':>10}")
+    for name, outcome in current['results'].items():
+        previous = baseline.get('results', {}).get(name, {})
+        if 'median' not in outcome or 'median' not in previous:
+            status = outcome.get('skipped') or outcome.get('error') or "no baseline"
+            print(f"{name:<28}{'-':>14}{'-':>14}  {status}")
+            continue
+        # Compare per item so baselines from differently sized libraries still line up
+        ratio = (outcome['per_item_ms'] / previous['per_item_ms']
+                 if outcome.get('per_item_ms') and previous.get('per_item_ms')
+                 else outcome['median'] / previous['median'])
+        flag = ""
+        # Sub-millisecond scenarios are mostly timer noise
+        if ratio > 1 + threshold and outcome['median'] - previous['median'] > min_delta:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<28}{previous['median'] * 1000:>14.1f}{outcome['median'] * 1000:>14.1f}"
+              f"{(ratio - 1) * 100:>+9.1f}%{flag}")
+
+        # Responsiveness: time the event loop spent stalled
+        stalled = outcome.get('responsiveness', {}).get('stall_total_ms')
+        stalled_before = previous.get('responsiveness', {}).get('stall_total_ms')
+        if stalled is not None and stalled_before is not None:
+            flag = ""
+            if stalled > stalled_before * (1 + threshold) and stalled - stalled_before > min_delta * 1000:
+                flag = "  REGRESSION"
+                regressions.append(name + " (stalls)")
+            print(f"{'  stalled':<28}{stalled_before:>14.1f}{stalled:>14.1f}{'':>10}{flag}")
+    return regressions
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="AudioBuncher benchmark suite")
+    parser.add_argument("--library", help="Library folder to generate or reuse (default: temporary)")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild --library even if it exists")
+    parser.add_argument("--tracks", type=int, default=200, help="Tracks to generate")
+    parser.add_argument("--formats", default="mp3,flac,ogg,wav", help="Comma separated formats")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per track")
+    parser.add_argument("--art-size", type=int, default=600, help="Cover art size in pixels")
+    parser.add_argument("--art-format", choices=["jpg", "png"], default="jpg")
+    parser.add_argument("--tone", action="store_true", help="Generate a tone instead of silence")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--combine-tracks", type=int, default=20, help="Tracks in the combine scenarios")
+    parser.add_argument("--scenarios", help="Comma separated scenarios (default: all)")
+    parser.add_argument("--list", action="store_true", help="List scenarios and exit")
+    parser.add_argument("--stall-ms", type=int, default=DiagnosticsSettings.STALL_MS,
+                        help="Event loop gap counted as a stall in GUI scenarios")
+    parser.add_argument("--latency-ms", type=float, default=0,
+                        help="Add this much latency to every file system round trip under the library, "
+                             "to simulate a network mount")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="Trace every run, warmups included (adds overhead); writes PATH and PATH.summary.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a results JSON")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown that counts as a regression (default 0.10)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="Ignore slowdowns smaller than this many milliseconds")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.list:
+        print("\n".join(Scenarios.REGISTRY))
+        return 0
+    names = args.scenarios.split(",") if args.scenarios else list(Scenarios.REGISTRY)
+    unknown = [name for name in names if name not in Scenarios.REGISTRY]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    work_dir = tempfile.mkdtemp(prefix="audiobuncher-bench-")
+    try:
+        root = args.library or os.path.join(work_dir, "library")
+        generator = LibraryGenerator(root, args.tracks, args.formats.split(","), args.duration,
+                                     art_size=args.art_size, art_format=args.art_format,
+                                     tone=args.tone, seed=args.seed)
+        manifest = LibraryGenerator.load_manifest(root)
+        if args.regenerate or manifest is None or manifest['params'] != generator.params():
+            if os.path.exists(root) and manifest is not None:
+                shutil.rmtree(root)
+            print(f"Generating {args.tracks} tracks in {root}...", file=sys.stderr)
+            manifest = generator.generate()
+
+        scratch = os.path.join(work_dir, "scratch")
+        os.makedirs(scratch, exist_ok=True)
+        shim = LatencyShim(root, args.latency_ms) if args.latency_ms else None
+        if shim:
+            shim.__enter__()
+        try:
+            context = BenchmarkContext(root, scratch, args.combine_tracks, args.stall_ms)
+            if args.trace:
+                Tracer.enable()
+            results = BenchmarkRunner(context, args.repeat, args.warmup).run(names)
+            if args.trace:
+                Tracer.save(args.trace)
+        finally:
+            if shim:
+                shim.__exit__(None, None, None)
+        report = {
+            'environment': environment_info(),
+            'library': manifest['params'],
+            'skipped_formats': manifest.get('skipped_formats', []),
+            'latency_ms': args.latency_ms,
+            'results': results
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    elif not args.compare:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.threshold, args.min_delta_ms / 1000)
+        if regressions:
+            print(f"\n{len(regressions)} scenario(s) regressed: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
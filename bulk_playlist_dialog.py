@@ -0,0 +1,67 @@
+# bulk_playlist_dialog.py
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QGroupBox, QFormLayout, QComboBox,
+    QLineEdit, QPushButton, QLabel, QFileDialog, QDialogButtonBox)
+from config import BulkSettings, PlaylistFormats
+
+class BulkPlaylistDialog(QDialog):
+    def __init__(self, library, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Bulk Playlists")
+        self.setMinimumWidth(460)
+        self.library = library
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        label = QLabel(f"Write one playlist per group of tracks under {self.library}. "
+                       "Tracks are listed in disc and track order.")
+        label.setWordWrap(True)
+        layout.addWidget(label)
+
+        options_group = QGroupBox("Options")
+        form_layout = QFormLayout(options_group)
+
+        self.grouping_combo = QComboBox()
+        self.grouping_combo.addItems(BulkSettings.GROUPINGS.keys())
+        self.grouping_combo.currentTextChanged.connect(self.update_output_hint)
+        form_layout.addRow("One Playlist Per:", self.grouping_combo)
+
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(PlaylistFormats.FORMATS.keys())
+        form_layout.addRow("Format:", self.format_combo)
+
+        output_layout = QHBoxLayout()
+        self.output_edit = QLineEdit()
+        browse_button = QPushButton("Browse")
+        browse_button.clicked.connect(self.browse_output)
+        output_layout.addWidget(self.output_edit)
+        output_layout.addWidget(browse_button)
+        form_layout.addRow("Save To:", output_layout)
+        layout.addWidget(options_group)
+        self.update_output_hint()
+
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok |
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def update_output_hint(self):
+        if BulkSettings.GROUPINGS[self.grouping_combo.currentText()] == "folder":
+            self.output_edit.setPlaceholderText("Inside each folder")
+        else:
+            self.output_edit.setPlaceholderText(self.library)
+
+    def browse_output(self):
+        directory = QFileDialog.getExistingDirectory(self, "Save Playlists To", self.library)
+        if directory:
+            self.output_edit.setText(directory)
+
+    def get_options(self):
+        return {
+            'grouping': BulkSettings.GROUPINGS[self.grouping_combo.currentText()],
+            'format_name': self.format_combo.currentText(),
+            'output_dir': self.output_edit.text().strip() or None
+        }
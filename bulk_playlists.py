@@ -0,0 +1,186 @@
+# bulk_playlists.py
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QThread, pyqtSignal
+from file_manager import FileManager
+from metadata_cache import MetadataCache
+from playlist_writer import PlaylistWriter
+from smart_playlist import LibraryIndex
+from config import BulkSettings, PlaylistFormats, WatchSettings
+from tracing import Tracer
+
+class BulkPlaylists:
+    """Plans one playlist per folder, album or album artist of a library"""
+    UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+    MAX_NAME = 200
+
+    @staticmethod
+    def group_key(file_path, tags, grouping):
+        """Group of a track, or None if it has no tag to group by. Multi-value
+        tags group by their first value."""
+        if grouping == "folder":
+            return os.path.dirname(file_path)
+        artist = (tags.get('Album Artist') or tags.get('Artist') or '').split('\0')[0]
+        if grouping == "album_artist":
+            return artist or None
+        album = tags.get('Album', '').split('\0')[0]
+        return (artist, album) if album else None
+
+    @staticmethod
+    def playlist_name(key, grouping):
+        if grouping == "folder":
+            name = os.path.basename(key)
+        elif grouping == "album":
+            name = f"{key[0]} - {key[1]}" if key[0] else key[1]
+        else:
+            name = key
+        name = BulkPlaylists.UNSAFE_CHARS.sub('_', name).strip(' .')
+        return name[:BulkPlaylists.MAX_NAME] or "Playlist"
+
+    @staticmethod
+    def track_order(file_path, tags):
+        """Sort key: disc, then track number, then path"""
+        disc = LibraryIndex.to_number(tags.get('Disc'))
+        track = LibraryIndex.to_number(tags.get('Track'))
+        return (1 if disc != disc else disc, float('inf') if track != track else track, file_path)
+
+    @staticmethod
+    def plan(records, grouping, format_name, output_dir=None):
+        """{playlist path: [files in disc and track order]} for records
+        ({file: MetadataCache.library_record}). Folder playlists go inside
+        their folder unless output_dir is given; album and artist playlists
+        always need output_dir."""
+        ext = PlaylistFormats.FORMATS[format_name]["ext"]
+        groups = {}
+        for file_path, record in records.items():
+            key = BulkPlaylists.group_key(file_path, record['tags'], grouping)
+            if key is not None:
+                groups.setdefault(key, []).append(file_path)
+
+        plans = {}
+        for key in sorted(groups):
+            files = sorted(groups[key], key=lambda file: BulkPlaylists.track_order(file, records[file]['tags']))
+            directory = key if grouping == "folder" and output_dir is None else output_dir
+            name = BulkPlaylists.playlist_name(key, grouping)
+            save_path = os.path.join(directory, name + ext)
+            # Different groups can share a name once sanitized
+            copy = 2
+            while save_path in plans:
+                save_path = os.path.join(directory, f"{name} ({copy}){ext}")
+                copy += 1
+            plans[save_path] = files
+        return plans
+
+
+class BulkPlaylistThread(QThread):
+    """Write a playlist for every group of tracks under a library folder.
+
+    The library is scanned once and every track probed once (in parallel,
+    through the MetadataCache, so unchanged tracks aren't even re-read on the
+    next run); all playlists are then written in parallel from those records.
+    """
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, library, grouping, format_name, output_dir=None,
+                 workers=BulkSettings.WORKERS, db_path=WatchSettings.METADATA_DB):
+        super().__init__()
+        self.library = library
+        self.grouping = grouping
+        self.format_name = format_name
+        self.output_dir = output_dir or None
+        self.workers = workers
+        self.db_path = db_path
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            if self.grouping not in BulkSettings.GROUPINGS.values():
+                raise ValueError(f"Unknown grouping: {self.grouping}")
+            if self.format_name not in PlaylistFormats.FORMATS:
+                raise ValueError(f"Unknown playlist format: {self.format_name}")
+            self.status.emit(f"Scanning {self.library}...")
+            files = FileManager.get_audio_files(self.library, True, "name")
+            if not files:
+                raise ValueError("No audio files found")
+            cache = MetadataCache(self.db_path)
+            try:
+                records = self.probe(cache, files)
+            finally:
+                cache.close()
+            if self.cancelled:
+                self.finished.emit(False, "Cancelled")
+                return
+
+            output_dir = self.output_dir
+            if output_dir is None and self.grouping != "folder":
+                output_dir = self.library
+            plans = BulkPlaylists.plan(records, self.grouping, self.format_name, output_dir)
+            errors = self.write(plans, records)
+        except Exception as e:
+            print(f"Error creating playlists: {e}")
+            self.finished.emit(False, str(e))
+            return
+
+        if self.cancelled:
+            self.finished.emit(False, "Cancelled")
+        elif errors:
+            self.finished.emit(False, f"Wrote {len(plans) - len(errors)} of {len(plans)} playlists.\n\n"
+                               "Errors:\n" + "\n".join(errors))
+        else:
+            self.finished.emit(True, f"Wrote {len(plans)} playlists for {len(records)} tracks")
+
+    @Tracer.traced("bulk.probe")
+    def probe(self, cache, files):
+        """{file: record} for every readable file, probing each once"""
+        def record(file_path):
+            if self.cancelled:
+                return None
+            try:
+                return cache.library_record(file_path)
+            except OSError:
+                return None
+
+        records = {}
+        self.status.emit(f"Reading {len(files)} tracks...")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for i, (file_path, result) in enumerate(zip(files, pool.map(record, files))):
+                if result is not None:
+                    records[file_path] = result
+                # Reading is most of the work
+                self.progress.emit(int((i + 1) / len(files) * 90))
+        cache.commit()
+        return records
+
+    @Tracer.traced("bulk.write")
+    def write(self, plans, records):
+        """Write every planned playlist; returns a list of errors"""
+        def track_info(file_path):
+            record = records[file_path]
+            title = record['tags'].get('Title', os.path.basename(file_path))
+            return int(record['duration']), title.replace('\0', ' / ')
+
+        def write_one(item):
+            save_path, files = item
+            if self.cancelled:
+                return None
+            try:
+                os.makedirs(os.path.dirname(save_path), exist_ok=True)
+                PlaylistWriter.write_playlist(save_path, files, self.format_name, track_info)
+                return None
+            except Exception as e:
+                return f"{os.path.basename(save_path)}: {e}"
+
+        self.status.emit(f"Writing {len(plans)} playlists...")
+        errors = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for i, error in enumerate(pool.map(write_one, plans.items())):
+                if error:
+                    errors.append(error)
+                self.progress.emit(90 + int((i + 1) / len(plans) * 10))
+        return errors
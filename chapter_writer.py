@@ -0,0 +1,147 @@
+# chapter_writer.py
+import os
+import re
+import shlex
+from mutagen import File
+from mutagen.id3 import ID3, CHAP, CTOC, CTOCFlags, TIT2, ID3NoHeaderError
+
+class ChapterWriter:
+    @staticmethod
+    def get_title(file_path):
+        """Chapter title from the source TIT2 (or title tag), else the file name"""
+        try:
+            audio = File(file_path, easy=True)
+            if audio is not None and audio.tags and audio.tags.get('title'):
+                return str(audio.tags['title'][0])
+        except Exception as e:
+            print(f"Error reading title for {file_path}: {e}")
+        return os.path.splitext(os.path.basename(file_path))[0]
+
+    @staticmethod
+    def chapters_from_boundaries(boundaries):
+        """Build chapters from the combiner's boundary times; overlapping
+        crossfades end a chapter where the next one starts"""
+        chapters = []
+        for i, boundary in enumerate(boundaries):
+            end_ms = boundary['end_ms']
+            if i + 1 < len(boundaries):
+                end_ms = min(end_ms, boundaries[i + 1]['start_ms'])
+            chapters.append({
+                'title': ChapterWriter.get_title(boundary['file']),
+                'start_ms': boundary['start_ms'],
+                'end_ms': end_ms
+            })
+        return chapters
+
+    @staticmethod
+    def add_id3_chapters(tags, chapters):
+        """Add CHAP frames and a top level CTOC to an ID3 tag without saving it"""
+        tags.delall('CHAP')
+        tags.delall('CTOC')
+        element_ids = []
+        for index, chapter in enumerate(chapters):
+            element_id = f"chp{index}"
+            element_ids.append(element_id)
+            tags.add(CHAP(
+                element_id=element_id,
+                start_time=int(chapter['start_ms']),
+                end_time=int(chapter['end_ms']),
+                start_offset=0xFFFFFFFF,
+                end_offset=0xFFFFFFFF,
+                sub_frames=[TIT2(encoding=3, text=[chapter['title']])]
+            ))
+        tags.add(CTOC(
+            element_id="toc",
+            flags=CTOCFlags.TOP_LEVEL | CTOCFlags.ORDERED,
+            child_element_ids=element_ids,
+            sub_frames=[TIT2(encoding=3, text=["Chapters"])]
+        ))
+
+    @staticmethod
+    def format_cue_time(milliseconds):
+        """MM:SS:FF with 75 frames per second"""
+        frames = int(milliseconds) * 75 // 1000
+        return f"{frames // 4500:02d}:{frames // 75 % 60:02d}:{frames % 75:02d}"
+
+    @staticmethod
+    def write_cue_sheet(save_path, audio_path, chapters, title=None):
+        def quote(text):
+            return text.replace('"', "'")
+
+        with open(save_path, 'w', encoding='utf-8') as f:
+            if title:
+                f.write(f'TITLE "{quote(title)}"\n')
+            audio_name = os.path.relpath(audio_path, os.path.dirname(os.path.abspath(save_path)))
+            f.write(f'FILE "{quote(audio_name)}" MP3\n')
+            for index, chapter in enumerate(chapters, 1):
+                f.write(f"  TRACK {index:02d} AUDIO\n")
+                f.write(f'    TITLE "{quote(chapter["title"])}"\n')
+                f.write(f"    INDEX 01 {ChapterWriter.format_cue_time(chapter['start_ms'])}\n")
+
+    @staticmethod
+    def parse_cue_time(value):
+        """Milliseconds of an MM:SS:FF time"""
+        match = re.fullmatch(r'(\d+):(\d{1,2}):(\d{1,2})', value)
+        if not match:
+            raise ValueError(f"Invalid CUE time: {value}")
+        minutes, seconds, frames = (int(group) for group in match.groups())
+        return (minutes * 60 + seconds) * 1000 + frames * 1000 // 75
+
+    @staticmethod
+    def read_cue_sheet(cue_path):
+        """(chapters, album) of a single-file CUE sheet. Chapters carry title,
+        performer and start_ms, end_ms is the next track's start (None for
+        the last); album holds the sheet's TITLE, PERFORMER and REM DATE and
+        GENRE."""
+        album = {}
+        chapters = []
+        files = 0
+        with open(cue_path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    words = shlex.split(line.strip(), posix=True)
+                except ValueError:
+                    words = line.split()
+                if not words:
+                    continue
+                command = words[0].upper()
+                target = chapters[-1] if chapters else album
+                if command == "FILE":
+                    files += 1
+                    if files > 1:
+                        raise ValueError("CUE sheets that list several files aren't supported")
+                elif command == "TRACK":
+                    chapters.append({'title': f"Track {len(chapters) + 1:02d}", 'performer': None,
+                                     'start_ms': None, 'end_ms': None})
+                elif command in ("TITLE", "PERFORMER") and len(words) > 1:
+                    target['title' if command == "TITLE" else 'performer'] = words[1]
+                elif command == "REM" and len(words) > 2 and words[1].upper() in ("DATE", "GENRE"):
+                    album[words[1].lower()] = words[2]
+                elif command == "INDEX" and len(words) > 2 and chapters and int(words[1]) == 1:
+                    try:
+                        chapters[-1]['start_ms'] = ChapterWriter.parse_cue_time(words[2])
+                    except ValueError as e:
+                        raise ValueError(f"Line {line_number}: {e}")
+        chapters = [chapter for chapter in chapters if chapter['start_ms'] is not None]
+        if not chapters:
+            raise ValueError("No tracks in the CUE sheet")
+        for chapter, following in zip(chapters, chapters[1:]):
+            chapter['end_ms'] = following['start_ms']
+        return chapters, album
+
+    @staticmethod
+    def read_id3_chapters(file_path):
+        """Chapters of the CHAP frames in a file's ID3 tag, in time order"""
+        try:
+            tags = ID3(file_path)
+        except ID3NoHeaderError:
+            return []
+        chapters = []
+        for frame in sorted(tags.getall('CHAP'), key=lambda frame: frame.start_time):
+            title = frame.sub_frames.get('TIT2')
+            chapters.append({
+                'title': str(title) if title else f"Chapter {len(chapters) + 1:02d}",
+                'start_ms': frame.start_time,
+                'end_ms': frame.end_time
+            })
+        return chapters
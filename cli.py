@@ -0,0 +1,324 @@
+# cli.py
+import argparse
+import os
+import sys
+from PyQt6.QtCore import QCoreApplication
+from config import (CombineSettings, ArtFormats, TraceSettings, WatchSettings, ScanSettings,
+                    BulkSettings, PlaylistFormats, TransferSettings, RenameSettings, IntegritySettings,
+                    SplitSettings)
+from tracing import Tracer
+
+COMMANDS = ["combine", "optimize-art", "playlist", "bulk-playlists", "export-tags", "import-tags", "rename", "verify", "split", "watch"]
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="audiobuncher", description="AudioBuncher command line tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # Options shared by every command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--trace", metavar="PATH",
+                        help=f"Write a Chrome trace and PATH.summary.json (or set {TraceSettings.ENV_VAR})")
+    common.add_argument("--io-mode", choices=list(ScanSettings.MODES.values()),
+                        help=f"Treat the library as local or high-latency network storage "
+                             f"(default: auto-detect, or set {ScanSettings.ENV_VAR})")
+
+    combine = subparsers.add_parser("combine", parents=[common], help="Combine audio files into one MP3")
+    combine.add_argument("files", nargs="+", help="Input audio files, in order")
+    combine.add_argument("-o", "--output", required=True, help="Output MP3 file")
+    combine.add_argument("--thumbnail", help="File to copy album art from")
+    combine.add_argument("--crossfade", type=int, default=0, metavar="MS",
+                         help="Crossfade between tracks in milliseconds")
+    combine.add_argument("--gap", type=int, default=0, metavar="MS",
+                         help="Silence between tracks in milliseconds")
+    combine.add_argument("--curve", choices=list(CombineSettings.CURVES.values()),
+                         default=CombineSettings.CURVE_LINEAR, help="Fade curve")
+    combine.add_argument("--bitrate", default=CombineSettings.DEFAULT_BITRATE, help="MP3 bitrate, e.g. 192k")
+    combine.add_argument("--encoder", choices=list(CombineSettings.ENCODERS.values()),
+                         default=CombineSettings.ENCODER_SINGLE, help="Encoding mode")
+    combine.add_argument("--workers", type=int, help="Encoder processes for parallel mode")
+    combine.add_argument("--resumable", action="store_true",
+                         help="Checkpoint to OUTPUT.partial and resume an interrupted run")
+    combine.add_argument("--chapters", action="store_true", help="Embed ID3 CHAP/CTOC chapter markers")
+    combine.add_argument("--cue", action="store_true", help="Write a CUE sheet next to the output")
+    combine.add_argument("--chapter-playlist", action="store_true",
+                         help="Write an M3U8 with chapter offsets next to the output")
+    combine.add_argument("--trim-silence", action="store_true",
+                         help="Drop silence at the start and end of each input")
+    combine.add_argument("--trim-threshold", type=int, default=CombineSettings.TRIM_THRESHOLD_DB,
+                         metavar="DB", help="Level (dBFS) below which audio counts as silence")
+    combine.add_argument("--skip-verify", action="store_true",
+                         help="Don't check the inputs for damaged streams first")
+
+    optimize = subparsers.add_parser("optimize-art", parents=[common], help="Shrink oversized embedded album art")
+    optimize.add_argument("paths", nargs="+", help="Audio files or folders (searched recursively)")
+    optimize.add_argument("--max-size", type=int, default=ArtFormats.OPTIMIZE_MAX_SIZE, metavar="PX",
+                          help="Longest side of re-encoded pictures")
+    optimize.add_argument("--quality", type=int, default=ArtFormats.OPTIMIZE_QUALITY, help="Encoder quality")
+    optimize.add_argument("--format", choices=["jpg", "png", "webp"], default=ArtFormats.OPTIMIZE_FORMAT,
+                          help="Format of re-encoded pictures")
+    optimize.add_argument("--min-kb", type=int, default=ArtFormats.OPTIMIZE_MIN_BYTES // 1024,
+                          help="Re-encode pictures above this size even if they fit --max-size")
+    optimize.add_argument("--workers", type=int, help="Worker threads")
+    optimize.add_argument("--dry-run", action="store_true", help="Estimate savings without writing")
+
+    playlist = subparsers.add_parser("playlist", parents=[common],
+                                     help="Write a playlist of audio files and folders")
+    playlist.add_argument("paths", nargs="+", help="Audio files or folders (searched recursively)")
+    playlist.add_argument("-o", "--output", required=True,
+                          help="Playlist file; the format follows its extension")
+    playlist.add_argument("--sort", choices=["name", "date", "size"], default="name",
+                          help="Order of the tracks found in folders")
+    playlist.add_argument("--sync", action="store_true",
+                          help="Update an existing playlist in place, reading only tracks it doesn't list yet")
+
+    bulk = subparsers.add_parser("bulk-playlists", parents=[common],
+                                 help="Write one playlist per folder, album or album artist")
+    bulk.add_argument("library", help="Library folder (searched recursively)")
+    bulk.add_argument("--by", choices=list(BulkSettings.GROUPINGS.values()), default="album",
+                      help="How tracks are grouped into playlists")
+    bulk.add_argument("--ext", choices=[info["ext"] for info in PlaylistFormats.FORMATS.values()],
+                      default=".m3u8", help="Playlist type")
+    bulk.add_argument("-o", "--output-dir",
+                      help="Where playlists go (default: each folder for --by folder, else the library)")
+    bulk.add_argument("--workers", type=int, default=BulkSettings.WORKERS, help="Worker threads")
+    bulk.add_argument("--db", default=WatchSettings.METADATA_DB, help="Track metadata cache")
+
+    export_tags = subparsers.add_parser("export-tags", parents=[common],
+                                        help="Write the tags of files to a CSV or JSON Lines file")
+    export_tags.add_argument("paths", nargs="+", help="Audio files or folders (searched recursively)")
+    export_tags.add_argument("-o", "--output", required=True, help="Tag file (.csv or .jsonl)")
+    export_tags.add_argument("--workers", type=int, default=TransferSettings.WORKERS, help="Worker threads")
+
+    import_tags = subparsers.add_parser("import-tags", parents=[common],
+                                        help="Apply the changed tags of an edited tag file")
+    import_tags.add_argument("file", help="Tag file (.csv or .jsonl) written by export-tags")
+    import_tags.add_argument("--dry-run", action="store_true", help="Count the files that would change")
+    import_tags.add_argument("--report", metavar="PATH",
+                             help="CSV of rows that failed (default: <file>.errors.csv)")
+    import_tags.add_argument("--workers", type=int, default=TransferSettings.WORKERS, help="Worker threads")
+
+    rename = subparsers.add_parser("rename", parents=[common],
+                                   help="Rename files from their tags, or tag them from their names")
+    rename.add_argument("paths", nargs="*", help="Audio files or folders (searched recursively)")
+    rename.add_argument("-p", "--pattern", default=RenameSettings.DEFAULT_PATTERN,
+                        help="Pattern of %%field%% names, e.g. \"%%artist%%/%%album%%/%%track%% - %%title%%\"")
+    rename.add_argument("--to", choices=list(RenameSettings.MODES.values()), default="names",
+                        help="names: rename files from their tags; tags: tag files from their names")
+    rename.add_argument("--dry-run", action="store_true", help="Report what would change")
+    rename.add_argument("--undo", nargs="?", const="latest", metavar="MANIFEST",
+                        help="Undo a rename (default: the latest) instead")
+    rename.add_argument("--workers", type=int, default=RenameSettings.WORKERS, help="Worker threads")
+
+    verify = subparsers.add_parser("verify", parents=[common],
+                                   help="Check audio streams for corruption and truncation")
+    verify.add_argument("paths", nargs="+", help="Audio files or folders (searched recursively)")
+    verify.add_argument("--md5", action="store_true",
+                        help="Also decode FLAC files and compare the STREAMINFO MD5")
+    verify.add_argument("--workers", type=int, default=IntegritySettings.WORKERS,
+                        help="Verifier processes (default: one per CPU)")
+    verify.add_argument("--db", default=WatchSettings.METADATA_DB, help="Cache of earlier results")
+
+    split = subparsers.add_parser("split", parents=[common],
+                                  help="Split a long recording into tracks, with tags and a playlist")
+    split.add_argument("file", help="Recording to split")
+    split.add_argument("--by", choices=list(SplitSettings.MODES.values()), default=SplitSettings.MODE_SILENCE,
+                       help="Find tracks from silence, a CUE sheet or the file's ID3 chapters")
+    split.add_argument("--cue", metavar="PATH", help="CUE sheet (default: next to the file, implies --by cue)")
+    split.add_argument("-o", "--output-dir", help="Folder for the tracks (default: named after the file)")
+    split.add_argument("--threshold", type=int, default=SplitSettings.THRESHOLD_DB, metavar="DB",
+                       help="Level (dBFS) below which audio counts as silence")
+    split.add_argument("--min-silence", type=int, default=SplitSettings.MIN_SILENCE_MS, metavar="MS",
+                       help="Shortest silence that separates two tracks")
+    split.add_argument("--workers", type=int, default=SplitSettings.WORKERS,
+                       help="Concurrent encodes for formats other than MP3")
+
+    watch = subparsers.add_parser("watch", parents=[common],
+                                  help="Keep playlists in sync with the folders they list")
+    watch.add_argument("rules", help="JSON file of rules: folder, playlist, optional format, "
+                                     "recursive and sort_by (name, date or size)")
+    watch.add_argument("--db", default=WatchSettings.METADATA_DB, help="Track metadata cache")
+    watch.add_argument("--debounce", type=int, default=WatchSettings.DEBOUNCE_MS, metavar="MS",
+                       help="Quiet period after a change before a folder is rescanned")
+    watch.add_argument("--once", action="store_true", help="Update the playlists once and exit")
+    return parser
+
+def run_thread(thread):
+    """Run a worker thread in the calling thread and return an exit code"""
+    result = {}
+    thread.status.connect(lambda message: print(message, file=sys.stderr))
+    thread.finished.connect(lambda success, message: result.update(success=success, message=message))
+    # Signals are delivered directly when run() is called synchronously
+    thread.run()
+    print(result.get("message", ""), file=sys.stderr)
+    return 0 if result.get("success") else 1
+
+def run_combine(args):
+    from audio_thread import AudioCombinerThread
+    from audio_transitions import Transition
+
+    thread = AudioCombinerThread(
+        args.files, args.output, args.thumbnail,
+        Transition(args.crossfade, args.gap, args.curve),
+        args.bitrate, args.encoder, args.workers, args.resumable,
+        args.chapters, args.cue, args.chapter_playlist, not args.skip_verify,
+        args.trim_silence, args.trim_threshold
+    )
+    return run_thread(thread)
+
+def run_optimize_art(args):
+    from art_optimizer import ArtOptimizerThread
+    from file_manager import FileManager
+
+    files = []
+    for path in args.paths:
+        files.extend(FileManager.get_audio_files(path) if os.path.isdir(path) else [path])
+    thread = ArtOptimizerThread(files, args.max_size, args.quality, args.format,
+                                args.min_kb * 1024, args.dry_run, args.workers)
+    return run_thread(thread)
+
+def run_playlist(args):
+    from file_manager import FileManager
+    from playlist_writer import PlaylistWriter
+
+    format_name = PlaylistWriter.format_for_path(args.output)
+    if format_name is None:
+        print(f"Error: unknown playlist type for {args.output}", file=sys.stderr)
+        return 1
+    files = []
+    for path in args.paths:
+        files.extend(FileManager.get_audio_files(path, True, args.sort) if os.path.isdir(path)
+                     else [os.path.abspath(path)])
+    try:
+        if args.sync:
+            added, removed = PlaylistWriter.sync_playlist(args.output, files, format_name)
+            print(f"{added} tracks added, {removed} removed", file=sys.stderr)
+        else:
+            PlaylistWriter.write_playlist(args.output, files, format_name)
+            print(f"Wrote {len(files)} tracks", file=sys.stderr)
+    except Exception as e:
+        print(f"Error writing playlist: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def run_bulk_playlists(args):
+    from bulk_playlists import BulkPlaylistThread
+    from playlist_writer import PlaylistWriter
+
+    format_name = PlaylistWriter.format_for_path("playlist" + args.ext)
+    thread = BulkPlaylistThread(args.library, args.by, format_name, args.output_dir, args.workers, args.db)
+    return run_thread(thread)
+
+def run_export_tags(args):
+    from file_manager import FileManager
+    from tag_transfer import TagExportThread
+
+    files = []
+    for path in args.paths:
+        files.extend(FileManager.get_audio_files(path) if os.path.isdir(path) else [os.path.abspath(path)])
+    return run_thread(TagExportThread(files, args.output, args.workers))
+
+def run_import_tags(args):
+    from tag_transfer import TagImportThread
+
+    return run_thread(TagImportThread(args.file, args.dry_run, args.report, args.workers))
+
+def run_rename(args):
+    from file_manager import FileManager
+    from rename_engine import RenameEngine, RenameThread, RenameUndoThread
+
+    if args.undo:
+        manifest_path = RenameEngine.latest_manifest() if args.undo == "latest" else args.undo
+        if manifest_path is None:
+            print("No rename to undo", file=sys.stderr)
+            return 1
+        return run_thread(RenameUndoThread(manifest_path, args.workers))
+    if not args.paths:
+        print("Error: no files to rename", file=sys.stderr)
+        return 1
+    files = []
+    for path in args.paths:
+        files.extend(FileManager.get_audio_files(path) if os.path.isdir(path) else [os.path.abspath(path)])
+    thread = RenameThread(files, args.pattern, args.to, args.dry_run, workers=args.workers)
+    code = run_thread(thread)
+    if thread.renamed or thread.retagged:
+        print(f"Undo with: rename --undo {thread.manifest_path}", file=sys.stderr)
+    return code
+
+def run_verify(args):
+    from file_manager import FileManager
+    from integrity import VerifyThread
+
+    files = []
+    for path in args.paths:
+        files.extend(FileManager.get_audio_files(path) if os.path.isdir(path) else [os.path.abspath(path)])
+    return run_thread(VerifyThread(files, args.md5, args.workers, args.db))
+
+def run_split(args):
+    from audio_splitter import SplitThread
+
+    mode = SplitSettings.MODE_CUE if args.cue else args.by
+    thread = SplitThread(args.file, mode, args.cue, args.output_dir, args.threshold, args.min_silence, args.workers)
+    code = run_thread(thread)
+    for output in thread.outputs:
+        print(output)
+    return code
+
+def run_watch(args, app):
+    import signal
+    from PyQt6.QtCore import QTimer
+    from metadata_cache import MetadataCache
+    from watch_daemon import WatchDaemon, WatchRule
+
+    try:
+        rules = WatchRule.load(args.rules)
+    except Exception as e:
+        print(f"Error loading rules: {e}", file=sys.stderr)
+        return 1
+    cache = MetadataCache(args.db)
+    daemon = WatchDaemon(rules, cache, args.debounce)
+    daemon.status.connect(lambda message: print(message, file=sys.stderr))
+    daemon.start()
+    if not args.once:
+        signal.signal(signal.SIGINT, lambda *_: app.quit())
+        signal.signal(signal.SIGTERM, lambda *_: app.quit())
+        # Give the interpreter a chance to run the signal handlers
+        timer = QTimer()
+        timer.timeout.connect(lambda: None)
+        timer.start(250)
+        app.exec()
+        daemon.stop()
+    print(f"{cache.probes} files probed, {cache.hits} from cache", file=sys.stderr)
+    cache.close()
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    if args.trace:
+        Tracer.enable(args.trace)
+    else:
+        Tracer.enable_from_environment()
+    if args.io_mode:
+        from network_io import NetworkIO
+        NetworkIO.set_mode(args.io_mode)
+    if args.command == "combine":
+        return run_combine(args)
+    if args.command == "optimize-art":
+        return run_optimize_art(args)
+    if args.command == "playlist":
+        return run_playlist(args)
+    if args.command == "bulk-playlists":
+        return run_bulk_playlists(args)
+    if args.command == "export-tags":
+        return run_export_tags(args)
+    if args.command == "import-tags":
+        return run_import_tags(args)
+    if args.command == "rename":
+        return run_rename(args)
+    if args.command == "verify":
+        return run_verify(args)
+    if args.command == "split":
+        return run_split(args)
+    if args.command == "watch":
+        return run_watch(args, app)
+    return 2
@@ -0,0 +1,116 @@
+# combine_dialog.py
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QGroupBox, QFormLayout,
+    QSpinBox, QComboBox, QCheckBox, QDialogButtonBox)
+from config import CombineSettings
+from audio_transitions import Transition
+
+class CombineOptionsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Combine Options")
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        # Transitions between tracks
+        transition_group = QGroupBox("Transitions")
+        form_layout = QFormLayout(transition_group)
+
+        self.crossfade_spin = QSpinBox()
+        self.crossfade_spin.setRange(0, 30000)
+        self.crossfade_spin.setSingleStep(250)
+        self.crossfade_spin.setSuffix(" ms")
+        form_layout.addRow("Crossfade:", self.crossfade_spin)
+
+        self.gap_spin = QSpinBox()
+        self.gap_spin.setRange(0, 30000)
+        self.gap_spin.setSingleStep(250)
+        self.gap_spin.setSuffix(" ms")
+        form_layout.addRow("Gap:", self.gap_spin)
+
+        self.curve_combo = QComboBox()
+        self.curve_combo.addItems(CombineSettings.CURVES.keys())
+        form_layout.addRow("Fade Curve:", self.curve_combo)
+
+        self.trim_check = QCheckBox("Trim silence at the start and end of each file")
+        form_layout.addRow(self.trim_check)
+
+        self.trim_threshold_spin = QSpinBox()
+        self.trim_threshold_spin.setRange(-90, -10)
+        self.trim_threshold_spin.setValue(CombineSettings.TRIM_THRESHOLD_DB)
+        self.trim_threshold_spin.setSuffix(" dBFS")
+        self.trim_threshold_spin.setEnabled(False)
+        self.trim_check.toggled.connect(self.trim_threshold_spin.setEnabled)
+        form_layout.addRow("Silence Below:", self.trim_threshold_spin)
+
+        layout.addWidget(transition_group)
+
+        # Output encoding
+        encoding_group = QGroupBox("Encoding")
+        encoding_layout = QFormLayout(encoding_group)
+
+        self.bitrate_combo = QComboBox()
+        self.bitrate_combo.addItems(["96k", "128k", "160k", "192k", "256k", "320k"])
+        self.bitrate_combo.setCurrentText(CombineSettings.DEFAULT_BITRATE)
+        encoding_layout.addRow("Bitrate:", self.bitrate_combo)
+
+        self.encoder_combo = QComboBox()
+        self.encoder_combo.addItems(CombineSettings.ENCODERS.keys())
+        encoding_layout.addRow("Encoder:", self.encoder_combo)
+
+        self.resumable_check = QCheckBox("Checkpoint to disk so an interrupted combine can resume")
+        encoding_layout.addRow(self.resumable_check)
+
+        layout.addWidget(encoding_group)
+
+        # Chapters from the source files
+        chapter_group = QGroupBox("Chapters")
+        chapter_layout = QVBoxLayout(chapter_group)
+        self.chapters_check = QCheckBox("Embed chapter markers (ID3 CHAP/CTOC)")
+        self.cue_check = QCheckBox("Write CUE sheet")
+        self.chapter_playlist_check = QCheckBox("Write M3U8 with chapter offsets")
+        chapter_layout.addWidget(self.chapters_check)
+        chapter_layout.addWidget(self.cue_check)
+        chapter_layout.addWidget(self.chapter_playlist_check)
+        layout.addWidget(chapter_group)
+
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok |
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def get_transition(self):
+        return Transition(
+            self.crossfade_spin.value(),
+            self.gap_spin.value(),
+            CombineSettings.CURVES[self.curve_combo.currentText()]
+        )
+
+    def get_trim_options(self):
+        return {
+            'trim_silence': self.trim_check.isChecked(),
+            'trim_threshold_db': self.trim_threshold_spin.value()
+        }
+
+    def get_bitrate(self):
+        return self.bitrate_combo.currentText()
+
+    def get_encoder(self):
+        return CombineSettings.ENCODERS[self.encoder_combo.currentText()]
+
+    def is_resumable(self):
+        return self.resumable_check.isChecked()
+
+    def set_resumable(self, resumable):
+        self.resumable_check.setChecked(resumable)
+
+    def get_chapter_options(self):
+        return {
+            'chapters': self.chapters_check.isChecked(),
+            'cue_sheet': self.cue_check.isChecked(),
+            'chapter_playlist': self.chapter_playlist_check.isChecked()
+        }
@@ -0,0 +1,86 @@
+# combine_job.py
+import json
+import os
+import shutil
+
+class CombineJob:
+    """Job directory and manifest of a resumable combine.
+
+    The manifest records the job parameters (including the identity of every
+    input), the output format, the timeline position of each completed input
+    and the encoded chunks spilled so far. A manifest whose parameters no
+    longer match the requested job is discarded.
+    """
+    MANIFEST = "manifest.json"
+    VERSION = 1
+
+    def __init__(self, save_path, params):
+        self.job_dir = CombineJob.job_dir_for(save_path)
+        self.manifest_path = os.path.join(self.job_dir, CombineJob.MANIFEST)
+        self.params = params
+        self.manifest = self.load()
+
+    @staticmethod
+    def job_dir_for(save_path):
+        return save_path + ".partial"
+
+    @staticmethod
+    def exists(save_path):
+        return os.path.exists(os.path.join(CombineJob.job_dir_for(save_path), CombineJob.MANIFEST))
+
+    def load(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == CombineJob.VERSION and manifest.get('params') == self.params:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        # Nothing usable, start over
+        shutil.rmtree(self.job_dir, ignore_errors=True)
+        os.makedirs(self.job_dir)
+        manifest = {'version': CombineJob.VERSION, 'params': self.params,
+                    'format': None, 'inputs': [], 'chunks': []}
+        self.manifest = manifest
+        self.save()
+        return manifest
+
+    def save(self):
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.manifest_path)
+
+    @property
+    def output_format(self):
+        return self.manifest['format']
+
+    def set_output_format(self, frame_rate, channels):
+        self.manifest['format'] = {'frame_rate': frame_rate, 'channels': channels}
+        self.save()
+
+    def record_input(self, index, boundary):
+        """Record where a completed input landed on the output timeline"""
+        inputs = self.manifest['inputs']
+        del inputs[index:]
+        inputs.append({'identity': self.params['files'][index], 'start': boundary['start'],
+                       'end': boundary['end'], 'settled': boundary['settled']})
+        self.save()
+
+    def record_chunks(self, chunks):
+        self.manifest['chunks'] = chunks
+        self.save()
+
+    def resume_input(self, position):
+        """Index of the input to restart decoding from so that every sample
+        from `position` onwards is reproduced exactly"""
+        index = 0
+        for i, record in enumerate(self.manifest['inputs']):
+            if record['settled'] <= position:
+                index = i
+        return index
+
+    def remove(self):
+        shutil.rmtree(self.job_dir, ignore_errors=True)
@@ -0,0 +1,88 @@
+# concurrent_scanner.py
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from tag_reader import FastTagReader
+from config import AudioFormats, ScanSettings
+from tracing import Tracer
+
+class ConcurrentScanner:
+    """Library scanning for high-latency mounts (NFS, SMB). Every directory
+    listing, stat and header read is a round trip there, so instead of
+    walking the tree one call at a time this keeps many requests in flight:
+    subdirectory listings are queued as soon as their parent is listed (so
+    the next directories are already loading while the current one is
+    processed), sort keys are fetched in concurrent batches, and tag headers
+    are read concurrently with FastTagReader's block-coalesced reads."""
+
+    @staticmethod
+    def is_audio(name):
+        return any(name.lower().endswith(ext) for ext in AudioFormats.SUPPORTED_FORMATS)
+
+    @staticmethod
+    def list_dir(directory):
+        """(audio file paths, subdirectory paths) of one directory; symlinked
+        directories are not followed, as with os.walk"""
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink():
+                                subdirs.append(entry.path)
+                        elif ConcurrentScanner.is_audio(entry.name):
+                            files.append(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return files, subdirs
+
+    @staticmethod
+    def stat_batch(files, sort_by):
+        keys = []
+        for file in files:
+            try:
+                stats = os.stat(file)
+                keys.append(stats.st_mtime if sort_by == "date" else stats.st_size)
+            except OSError:
+                keys.append(0)
+        return keys
+
+    @staticmethod
+    @Tracer.traced("scan.concurrent")
+    def get_audio_files(directory, recursive=True, sort_by="name", workers=ScanSettings.WORKERS):
+        """Same result as FileManager.get_audio_files, with the round trips overlapped"""
+        files = []
+        if not directory or not os.path.exists(directory):
+            return files
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {pool.submit(ConcurrentScanner.list_dir, directory)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    found, subdirs = future.result()
+                    files.extend(found)
+                    if recursive:
+                        pending.update(pool.submit(ConcurrentScanner.list_dir, subdir) for subdir in subdirs)
+            Tracer.count("scan.files", len(files))
+
+            with Tracer.span("scan.sort", sort_by=sort_by):
+                files.sort()
+                if sort_by in ("date", "size"):
+                    batch = ScanSettings.STAT_BATCH
+                    futures = [pool.submit(ConcurrentScanner.stat_batch, files[i:i + batch], sort_by)
+                               for i in range(0, len(files), batch)]
+                    keys = [key for future in futures for key in future.result()]
+                    order = sorted(range(len(files)), key=keys.__getitem__)
+                    files = [files[i] for i in order]
+        return files
+
+    @staticmethod
+    @Tracer.traced("scan.tags")
+    def read_tags(files, workers=ScanSettings.WORKERS):
+        """{file: FastTagReader.read(file)} read concurrently, in input order"""
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(files, pool.map(FastTagReader.read, files)))
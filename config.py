@@ -1,4 +1,6 @@
 # config.py
+import os
+
 class PlaylistFormats:
     FORMATS = {
         "M3U (.m3u)": {
@@ -27,3 +29,214 @@ class PlaylistFormats:
 
 class AudioFormats:
     SUPPORTED_FORMATS = [".mp3", ".wav", ".ogg", ".flac", ".m4a", ".wma"]
+
+class CombineSettings:
+    CURVE_LINEAR = "linear"
+    CURVE_EQUAL_POWER = "equal_power"
+    CURVES = {
+        "Linear": CURVE_LINEAR,
+        "Equal Power": CURVE_EQUAL_POWER
+    }
+    DEFAULT_BITRATE = "128k"
+    ENCODER_SINGLE = "single"
+    ENCODER_PARALLEL = "parallel"
+    ENCODERS = {
+        "Single Encoder": ENCODER_SINGLE,
+        "Parallel (Frame-Aligned Chunks)": ENCODER_PARALLEL
+    }
+    PARALLEL_CHUNK_SECONDS = 30
+    # Silence trimming: RMS windows quieter than the threshold (dBFS) at
+    # either end of an input are dropped, looking no further than
+    # TRIM_SCAN_SECONDS in and keeping TRIM_KEEP_MS next to the audio
+    TRIM_THRESHOLD_DB = -50
+    TRIM_WINDOW_MS = 20
+    TRIM_HOP_MS = 10
+    TRIM_SCAN_SECONDS = 30
+    TRIM_KEEP_MS = 150
+
+class ArtFormats:
+    FORMATS = {
+        "jpg": {"qt": "JPEG", "mime": "image/jpeg"},
+        "jpeg": {"qt": "JPEG", "mime": "image/jpeg"},
+        "png": {"qt": "PNG", "mime": "image/png"},
+        "webp": {"qt": "WEBP", "mime": "image/webp"}
+    }
+    DEFAULT_QUALITY = 90
+    DEFAULT_TEMPLATE = "{album_artist}/{album}.jpg"
+    # Embedded art optimizer policy
+    OPTIMIZE_MAX_SIZE = 1000
+    OPTIMIZE_QUALITY = 85
+    OPTIMIZE_FORMAT = "jpg"
+    OPTIMIZE_MIN_BYTES = 300 * 1024
+
+class ThumbnailSettings:
+    LIST_ICON_SIZE = 32
+    PREVIEW_SIZE = 150
+    # Concurrent decodes in the background loader (newest requests first)
+    LOADER_WORKERS = 4
+    # Memory budget for decoded art pixmaps, shared by every view
+    PIXMAP_BUDGET_MB = 32
+
+class WaveformSettings:
+    # Min/max pairs stored per track
+    BUCKETS = 1000
+    # Tracks are decoded to mono at this rate, plenty for an overview
+    SAMPLE_RATE = 8000
+    # Blocks reduced per bucket while the length is still an estimate
+    BLOCKS_PER_BUCKET = 4
+    # Decoded PCM handed to NumPy at a time
+    CHUNK_BYTES = 1024 * 1024
+    # Concurrent decodes in the background loader (newest requests first)
+    LOADER_WORKERS = 4
+    # Peak arrays kept in memory, about 2 KB each
+    MEMORY_ENTRIES = 10000
+    # Tracks of a newly opened folder queued before they are scrolled to
+    PREFETCH_LIMIT = 500
+    SHOW_IN_LISTS = True
+    LIST_WIDTH = 120
+    EDITOR_HEIGHT = 64
+    COLOR = "#3d7ab8"
+
+class TraceSettings:
+    # Set to an output path to trace the GUI, e.g. AUDIOBUNCHER_TRACE=trace.json
+    ENV_VAR = "AUDIOBUNCHER_TRACE"
+    MAX_EVENTS = 1000000
+
+class DiagnosticsSettings:
+    HEARTBEAT_MS = 50
+    # Event loop gaps longer than this are recorded as stalls
+    STALL_MS = 250
+    POLL_MS = 20
+    STACK_SAMPLE_MS = 100
+    MAX_STACK_SAMPLES = 50
+    MAX_STALLS = 200
+    LATENCY_SAMPLES = 5000
+
+class AsyncSettings:
+    # Threads shared by one AsyncLibrary; also the number of blocking calls
+    # it lets run at once
+    IO_WORKERS = 8
+    # Scan listings and probes in flight ahead of the consumer
+    MAX_PENDING = 32
+
+class BulkSettings:
+    GROUPINGS = {
+        "Folder": "folder",
+        "Album": "album",
+        "Album Artist": "album_artist"
+    }
+    # Threads probing tracks and writing playlists
+    WORKERS = 8
+
+class TransferSettings:
+    FORMATS = {
+        "CSV (.csv)": ".csv",
+        "JSON Lines (.jsonl)": ".jsonl"
+    }
+    # Multiple values of one tag share a CSV cell; JSON uses lists
+    CSV_SEPARATOR = "; "
+    # Rows read, diffed or written per batch of concurrent work
+    CHUNK_SIZE = 256
+    WORKERS = 8
+
+class RenameSettings:
+    MODES = {
+        "Tags → File Names": "names",
+        "File Names → Tags": "tags"
+    }
+    DEFAULT_PATTERN = "%track% - %artist% - %title%"
+    # Undo manifests, newest last
+    UNDO_DIR = os.path.join(os.path.expanduser("~"), ".audiobuncher", "renames")
+    WORKERS = 8
+    # Folder change notifications caused by our own renames are ignored for
+    # this long, since the file lists are updated directly
+    WATCH_GRACE_MS = 2000
+
+class SplitSettings:
+    MODE_SILENCE = "silence"
+    MODE_CUE = "cue"
+    MODE_CHAPTERS = "chapters"
+    MODES = {
+        "Silence": MODE_SILENCE,
+        "CUE Sheet": MODE_CUE,
+        "ID3 Chapters": MODE_CHAPTERS
+    }
+    # Silence detection runs on mono PCM at this rate, in windows of
+    # WINDOW_MS; a quiet run of at least MIN_SILENCE_MS becomes a boundary
+    ANALYSIS_RATE = 8000
+    WINDOW_MS = 50
+    CHUNK_SECONDS = 60
+    THRESHOLD_DB = -45
+    MIN_SILENCE_MS = 2000
+    # Boundaries that would leave a shorter track are dropped
+    MIN_TRACK_SECONDS = 30
+    # MP3 frames are copied in writes of up to this size
+    COPY_BYTES = 1024 * 1024
+    # Concurrent re-encodes for formats that can't be cut losslessly
+    WORKERS = 2
+    PLAYLIST_EXT = ".m3u8"
+
+class IntegritySettings:
+    # Verifier processes; None uses every CPU
+    WORKERS = None
+    # Longest a FLAC may take to decode for its MD5 check
+    MD5_TIMEOUT = 600
+    # Batches smaller than this are checked in-process, without a pool
+    POOL_MIN_BYTES = 64 * 1024 * 1024
+
+class JobSettings:
+    KIND_COMBINE = "combine"
+    KIND_PLAYLIST = "playlist"
+    KIND_TAGS = "tags"
+    KIND_BULK = "bulk"
+    KIND_VERIFY = "verify"
+    KIND_SPLIT = "split"
+    # Encodes are CPU bound (and the parallel encoder fans out further),
+    # playlist and tag jobs are I/O bound
+    KIND_POOLS = {
+        KIND_COMBINE: "cpu",
+        KIND_PLAYLIST: "io",
+        KIND_TAGS: "io",
+        KIND_BULK: "io",
+        KIND_VERIFY: "cpu",
+        KIND_SPLIT: "cpu"
+    }
+    POOL_LIMITS = {
+        "cpu": 2,
+        "io": 3
+    }
+    # Higher runs first, equal priorities run in submission order
+    DEFAULT_PRIORITY = 0
+    QUEUE_FILE = os.path.join(os.path.expanduser("~"), ".audiobuncher", "jobs.json")
+    HISTORY_LIMIT = 50
+
+class WatchSettings:
+    # Quiet period after the last change in a folder before it is rescanned
+    DEBOUNCE_MS = 1000
+    # Files modified more recently than this may still be being copied in
+    SETTLE_SECONDS = 2
+    DEFAULT_FORMAT = "M3U Extended (.m3u8)"
+    METADATA_DB = os.path.join(os.path.expanduser("~"), ".audiobuncher", "metadata.db")
+    # Smart playlists with age conditions ("added within 30d") are re-run this often
+    SMART_REFRESH_MS = 3600000
+
+class ScanSettings:
+    # "auto" treats network filesystems (NETWORK_FILESYSTEMS) as high latency
+    ENV_VAR = "AUDIOBUNCHER_IO_MODE"
+    MODE_AUTO = "auto"
+    MODE_LOCAL = "local"
+    MODE_NETWORK = "network"
+    MODES = {
+        "Automatic": MODE_AUTO,
+        "Local Disk": MODE_LOCAL,
+        "Network (High Latency)": MODE_NETWORK
+    }
+    NETWORK_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph",
+                           "glusterfs", "fuse.sshfs", "fuse.rclone", "davfs")
+    # Requests kept in flight against a high-latency mount
+    WORKERS = 32
+    # Header reads are rounded up to whole blocks of this size, so the many
+    # small reads of a tag parse usually cost one round trip
+    READ_BLOCK = 64 * 1024
+    # Files per stat task when sorting by date or size
+    STAT_BATCH = 16
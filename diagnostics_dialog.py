@@ -0,0 +1,107 @@
+# diagnostics_dialog.py
+import os
+import time
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QGroupBox, QFormLayout, QLabel,
+    QTableWidget, QTableWidgetItem, QTextEdit, QPushButton, QAbstractItemView, QHeaderView)
+from PyQt6.QtCore import Qt, QTimer
+from stall_watchdog import StallWatchdog
+
+class DiagnosticsDialog(QDialog):
+    """Live view of GUI responsiveness: event loop latency and recorded
+    stalls with the main thread stack sampled while each stall lasted"""
+    FIELDS = [
+        ('stall_count', "Stalls"),
+        ('stall_total_ms', "Total Stall Time (ms)"),
+        ('stall_max_ms', "Longest Stall (ms)"),
+        ('latency_p50_ms', "Latency p50 (ms)"),
+        ('latency_p95_ms', "Latency p95 (ms)"),
+        ('latency_p99_ms', "Latency p99 (ms)"),
+        ('latency_max_ms', "Latency max (ms)")
+    ]
+
+    def __init__(self, watchdog=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostics")
+        self.setMinimumSize(760, 520)
+        self.watchdog = watchdog or StallWatchdog.instance()
+        self.stalls = []
+        self.stall_count = 0
+        self.setup_ui()
+        self.refresh()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(1000)
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        stats_group = QGroupBox(f"Event Loop (stalls over {self.watchdog.stall_ms} ms)")
+        stats_layout = QFormLayout(stats_group)
+        self.stat_labels = {}
+        for key, label in self.FIELDS:
+            self.stat_labels[key] = QLabel("-")
+            stats_layout.addRow(f"{label}:", self.stat_labels[key])
+        layout.addWidget(stats_group)
+
+        self.stall_table = QTableWidget(0, 3)
+        self.stall_table.setHorizontalHeaderLabels(["Time", "Duration (ms)", "Location"])
+        self.stall_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.stall_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.stall_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.stall_table.currentCellChanged.connect(self.show_stack)
+        layout.addWidget(self.stall_table)
+
+        self.stack_view = QTextEdit()
+        self.stack_view.setReadOnly(True)
+        self.stack_view.setPlaceholderText("Select a stall to see the main thread stack")
+        layout.addWidget(self.stack_view)
+
+        button_layout = QHBoxLayout()
+        reset_btn = QPushButton("Reset")
+        reset_btn.clicked.connect(self.reset)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        button_layout.addStretch()
+        button_layout.addWidget(reset_btn)
+        button_layout.addWidget(close_btn)
+        layout.addLayout(button_layout)
+
+    def refresh(self):
+        summary = self.watchdog.summary()
+        for key, label in self.stat_labels.items():
+            label.setText(str(summary.get(key, "-")))
+
+        if summary['stall_count'] == self.stall_count:
+            return
+        self.stall_count = summary['stall_count']
+        stalls = self.stalls = self.watchdog.get_stalls()
+        self.stall_table.setRowCount(len(stalls))
+        # Newest first
+        for row, stall in enumerate(reversed(stalls)):
+            location = stall['location']
+            if ':' in location:
+                location = os.path.basename(location)
+            self.stall_table.setItem(row, 0, QTableWidgetItem(
+                time.strftime('%H:%M:%S', time.localtime(stall['time']))))
+            duration = QTableWidgetItem(f"{stall['duration_ms']:.0f}")
+            duration.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            self.stall_table.setItem(row, 1, duration)
+            self.stall_table.setItem(row, 2, QTableWidgetItem(location))
+
+    def show_stack(self, row, column, previous_row, previous_column):
+        if row < 0 or row >= len(self.stalls):
+            self.stack_view.clear()
+            return
+        stall = self.stalls[len(self.stalls) - 1 - row]
+        self.stack_view.setPlainText(
+            f"{stall['duration_ms']:.0f} ms, {stall['samples']} stack samples "
+            f"(most frequent shown, innermost last):\n\n" + "\n".join(stall['stack']))
+
+    def reset(self):
+        self.watchdog.reset()
+        self.stalls = []
+        self.stall_count = 0
+        self.stall_table.setRowCount(0)
+        self.stack_view.clear()
+        self.refresh()
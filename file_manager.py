@@ -1,17 +1,25 @@
 # file_manager.py
 import os
-from PyQt6.QtGui import QImage
+import uuid
 from mutagen import File
 from mutagen.id3 import ID3, APIC
 from mutagen.mp3 import MP3
 from config import AudioFormats
+from art_utils import ArtUtils
+from tag_reader import FastTagReader
+from network_io import NetworkIO
+from concurrent_scanner import ConcurrentScanner
+from tracing import Tracer
 
 class FileManager:
     @staticmethod
+    @Tracer.traced("scan.list")
     def get_audio_files(directory, recursive=True, sort_by="name"):
         files = []
         if not directory or not os.path.exists(directory):
             return files
+        if NetworkIO.is_high_latency(directory):
+            return ConcurrentScanner.get_audio_files(directory, recursive, sort_by)
 
         if recursive:
             for root, _, filenames in os.walk(directory):
@@ -23,41 +31,76 @@ class FileManager:
                     if os.path.isfile(os.path.join(directory, f)) and 
                     any(f.lower().endswith(ext) for ext in AudioFormats.SUPPORTED_FORMATS)]
 
-        if sort_by == "name":
-            files.sort()
-        elif sort_by == "date":
-            files.sort(key=lambda x: os.path.getmtime(x))
-        elif sort_by == "size":
-            files.sort(key=lambda x: os.path.getsize(x))
+        Tracer.count("scan.files", len(files))
+        with Tracer.span("scan.sort", sort_by=sort_by):
+            if sort_by == "name":
+                files.sort()
+            elif sort_by == "date":
+                files.sort(key=lambda x: os.path.getmtime(x))
+            elif sort_by == "size":
+                files.sort(key=lambda x: os.path.getsize(x))
 
         return files
 
     @staticmethod
-    def extract_thumbnail(file_path):
+    def file_identity(file_path):
+        """Identify a file version by path, size and modification time"""
+        stats = os.stat(file_path)
+        return [os.path.abspath(file_path), stats.st_size, stats.st_mtime_ns]
+
+    @staticmethod
+    def temp_path(save_path):
+        """Unique temporary path next to save_path, for publishing with os.replace"""
+        directory = os.path.dirname(os.path.abspath(save_path))
+        return os.path.join(directory, f".{os.path.basename(save_path)}.{uuid.uuid4().hex[:8]}.tmp")
+
+    @staticmethod
+    def get_art_data(file_path, audio=None):
+        """Return (data, mime) of the first embedded picture, or (None, None).
+        Pass an already loaded mutagen file as `audio` to avoid parsing twice."""
         try:
-            audio = File(file_path)
             if audio is None:
-                return None
-                
+                # Read the picture in place when the tag layout allows it
+                fast = FastTagReader.read(file_path)
+                if fast is not None and (fast['art_offset'] is not None or not fast['has_art']):
+                    data = FastTagReader.read_art(file_path, fast)
+                    return (data, fast['art_mime']) if data else (None, None)
+                with Tracer.span("tags.load"):
+                    audio = File(file_path)
+            if audio is None:
+                return None, None
+
             # Handle MP3
             if isinstance(audio.tags, ID3):
                 for tag in audio.tags.values():
                     if tag.FrameID in ('APIC', 'PIC'):
-                        return QImage.fromData(tag.data)
-                
+                        return tag.data, getattr(tag, 'mime', None)
+
             # Handle FLAC
             if hasattr(audio, 'pictures'):
                 if audio.pictures:
-                    return QImage.fromData(audio.pictures[0].data)
-                
+                    return audio.pictures[0].data, audio.pictures[0].mime
+
             # Handle other formats with embedded images
             if hasattr(audio.tags, 'images'):
                 images = audio.tags.images
                 if images:
-                    return QImage.fromData(images[0].data)
-                    
+                    return images[0].data, f'image/{images[0].mime_type}'
+
         except Exception as e:
-            print(f"Error extracting thumbnail: {e}")
+            print(f"Error reading album art: {e}")
+        return None, None
+
+    @staticmethod
+    def extract_thumbnail(file_path, size=0):
+        """Decode the embedded art, scaled during decoding to fit `size` pixels
+        (0 keeps the full resolution)"""
+        with Tracer.span("art.extract", size=size):
+            data, _ = FileManager.get_art_data(file_path)
+            if data:
+                with Tracer.span("art.decode", size=size) as span:
+                    span.add('bytes', len(data))
+                    return ArtUtils.decode_scaled(data, size)
         return None
 
     @staticmethod
@@ -67,95 +110,93 @@ class FileManager:
             audio = MP3(target_file)
             if not audio.tags:
                 audio.tags = ID3()
-            
-            # Extract thumbnail from source
-            source_audio = File(source_file)
-            if source_audio is None:
-                return False
 
-            # Handle MP3 source
-            if isinstance(source_audio.tags, ID3):
-                for tag in source_audio.tags.values():
-                    if tag.FrameID == 'APIC':
-                        # Remove existing art
-                        audio.tags.delall('APIC')
-                        # Add new art
-                        audio.tags.add(
-                            APIC(
-                                encoding=tag.encoding,
-                                mime=tag.mime,
-                                type=tag.type,
-                                desc=tag.desc,
-                                data=tag.data
-                            )
-                        )
-                        audio.save()
-                        return True
-
-            # Handle FLAC source
-            if hasattr(source_audio, 'pictures') and source_audio.pictures:
-                pic = source_audio.pictures[0]
-                audio.tags.delall('APIC')
-                audio.tags.add(
-                    APIC(
-                        encoding=3,
-                        mime=pic.mime,
-                        type=3,
-                        desc='Cover',
-                        data=pic.data
-                    )
-                )
+            if FileManager.copy_thumbnail_frame(source_file, audio.tags):
                 audio.save()
                 return True
 
-            # Handle other formats
-            if hasattr(source_audio.tags, 'images') and source_audio.tags.images:
-                img = source_audio.tags.images[0]
-                audio.tags.delall('APIC')
-                audio.tags.add(
-                    APIC(
-                        encoding=3,
-                        mime=f'image/{img.mime_type}',
-                        type=3,
-                        desc='Cover',
-                        data=img.data
-                    )
-                )
-                audio.save()
-                return True
-                
         except Exception as e:
             print(f"Error saving thumbnail: {e}")
         return False
 
+    @staticmethod
+    def copy_thumbnail_frame(source_file, tags):
+        """Replace the APIC frame in `tags` with the art of source_file without
+        saving, so callers can batch it with other changes in one tag write"""
+        # Extract thumbnail from source
+        source_audio = File(source_file)
+        if source_audio is None:
+            return False
+
+        # Handle MP3 source
+        if isinstance(source_audio.tags, ID3):
+            for tag in source_audio.tags.values():
+                if tag.FrameID == 'APIC':
+                    # Remove existing art
+                    tags.delall('APIC')
+                    # Add new art
+                    tags.add(
+                        APIC(
+                            encoding=tag.encoding,
+                            mime=tag.mime,
+                            type=tag.type,
+                            desc=tag.desc,
+                            data=tag.data
+                        )
+                    )
+                    return True
+
+        # Handle FLAC source
+        if hasattr(source_audio, 'pictures') and source_audio.pictures:
+            pic = source_audio.pictures[0]
+            tags.delall('APIC')
+            tags.add(
+                APIC(
+                    encoding=3,
+                    mime=pic.mime,
+                    type=3,
+                    desc='Cover',
+                    data=pic.data
+                )
+            )
+            return True
+
+        # Handle other formats
+        if hasattr(source_audio.tags, 'images') and source_audio.tags.images:
+            img = source_audio.tags.images[0]
+            tags.delall('APIC')
+            tags.add(
+                APIC(
+                    encoding=3,
+                    mime=f'image/{img.mime_type}',
+                    type=3,
+                    desc='Cover',
+                    data=img.data
+                )
+            )
+            return True
+
+        return False
+
     @staticmethod
     def export_thumbnail(file_path, save_path):
-        """Extract and save album art to a file"""
+        """Extract and save album art to a file, converting it to the format
+        implied by the extension of save_path"""
         try:
-            audio = File(file_path)
-            if audio is None:
+            data, mime = FileManager.get_art_data(file_path)
+            if not data:
                 return False
 
-            # Handle MP3
-            if isinstance(audio.tags, ID3):
-                for tag in audio.tags.values():
-                    if tag.FrameID in ('APIC', 'PIC'):
-                        with open(save_path, 'wb') as img_file:
-                            img_file.write(tag.data)
-                        return True
-
-            # Handle FLAC
-            if hasattr(audio, 'pictures') and audio.pictures:
-                with open(save_path, 'wb') as img_file:
-                    img_file.write(audio.pictures[0].data)
-                return True
+            image_format = ArtUtils.format_for_extension(os.path.splitext(save_path)[1])
+            if image_format and ArtUtils.mime_for_format(image_format) != (mime or '').lower():
+                data = ArtUtils.convert(data, image_format)
+                if data is None:
+                    return False
 
-            # Handle other formats
-            if hasattr(audio.tags, 'images') and audio.tags.images:
-                with open(save_path, 'wb') as img_file:
-                    img_file.write(audio.tags.images[0].data)
-                return True
+            with open(save_path, 'wb') as img_file:
+                img_file.write(data)
+            return True
 
         except Exception as e:
             print(f"Error exporting thumbnail: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -5,13 +5,18 @@ from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
     QMenu, QTextEdit)
 from PyQt6.QtCore import Qt, QSize
 from PyQt6.QtGui import QPixmap, QAction
-from mutagen.id3 import ID3, APIC
+from mutagen.id3 import ID3
 from mutagen.mp3 import MP3
 import os
 from tag_definitions import TagDefinitions
 from audio_metadata import AudioMetadata
 from id3_tag_copy import TagCopyDialog
 from file_manager import FileManager
+from art_utils import ArtUtils
+from config import ThumbnailSettings, JobSettings
+from job_scheduler import JobScheduler, Job
+from waveform import WaveformView
+from tracing import Tracer
 
 class ID3BatchEditor(QDialog):
     def __init__(self, file_paths, parent=None):
@@ -35,10 +40,15 @@ class ID3BatchEditor(QDialog):
         self.new_art_path = None
         self.clear_art_flag = False
 
+        # Tag jobs submitted from this dialog
+        self.pending_jobs = set()
+        JobScheduler.instance().job_finished.connect(self.handle_job_finished)
+
     def load_all_tags(self):
         for file_path in self.file_paths:
             try:
-                audio = MP3(file_path)
+                with Tracer.span("tags.load"):
+                    audio = MP3(file_path)
                 if not audio.tags:
                     audio.tags = ID3()
                 self.file_tags[file_path] = audio.tags
@@ -86,6 +96,8 @@ class ID3BatchEditor(QDialog):
         self.info_label = QTextEdit()
         self.info_label.setReadOnly(True)
         info_layout.addWidget(self.info_label)
+        self.waveform_view = WaveformView()
+        info_layout.addWidget(self.waveform_view)
         left_layout.addWidget(info_group)
         
         splitter.addWidget(left_widget)
@@ -127,7 +139,7 @@ class ID3BatchEditor(QDialog):
         art_layout = QHBoxLayout(art_group)
         
         self.art_label = QLabel()
-        self.art_label.setFixedSize(150, 150)
+        self.art_label.setFixedSize(ThumbnailSettings.PREVIEW_SIZE, ThumbnailSettings.PREVIEW_SIZE)
         self.art_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.art_label.setText("No Album Art")
         art_layout.addWidget(self.art_label)
@@ -176,6 +188,7 @@ class ID3BatchEditor(QDialog):
         selected_items = self.file_list.selectedItems()
         if len(selected_items) > 1:
             self.info_label.setText(f"{len(selected_items)} files selected")
+            self.waveform_view.set_file(None)
             self.clear_tag_inputs()
         elif len(selected_items) == 1:
             self.update_file_info(selected_items[0], None)
@@ -215,7 +228,7 @@ class ID3BatchEditor(QDialog):
             self,
             "Save Album Art",
             "",
-            "Images (*.jpg *.jpeg *.png)"
+            "Images (*.jpg *.jpeg *.png *.webp)"
         )
         
         if save_path:
@@ -295,9 +308,11 @@ class ID3BatchEditor(QDialog):
     def update_file_info(self, current, previous):
         if not current:
             self.info_label.setText("")
+            self.waveform_view.set_file(None)
             return
             
         file_path = self.file_paths[self.file_list.row(current)]
+        self.waveform_view.set_file(file_path)
         tags = self.file_tags[file_path]
         
         # Get file and audio metadata
@@ -321,13 +336,7 @@ class ID3BatchEditor(QDialog):
         if has_art:
             for tag in tags.values():
                 if tag.FrameID == 'APIC':
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(tag.data)
-                    self.art_label.setPixmap(pixmap.scaled(
-                        self.art_label.size(), 
-                        Qt.AspectRatioMode.KeepAspectRatio, 
-                        Qt.TransformationMode.SmoothTransformation
-                    ))
+                    self.show_art_preview(tag.data)
                     break
         else:
             self.art_label.setText("No Album Art")
@@ -341,14 +350,18 @@ class ID3BatchEditor(QDialog):
         )
         if file_path:
             self.new_art_path = file_path
-            pixmap = QPixmap(file_path)
-            self.art_label.setPixmap(pixmap.scaled(
-                self.art_label.size(), 
-                Qt.AspectRatioMode.KeepAspectRatio, 
-                Qt.TransformationMode.SmoothTransformation
-            ))
+            with open(file_path, 'rb') as img_file:
+                self.show_art_preview(img_file.read())
             self.clear_art_flag = False
 
+    def show_art_preview(self, data):
+        # Decode at the preview size rather than the full cover resolution
+        image = ArtUtils.decode_scaled(data, max(self.art_label.width(), self.art_label.height()))
+        if image is None:
+            self.art_label.setText("Invalid Album Art")
+            return
+        self.art_label.setPixmap(QPixmap.fromImage(image))
+
     def clear_art(self):
         self.art_label.setText("No Album Art")
         self.new_art_path = None
@@ -382,59 +395,39 @@ class ID3BatchEditor(QDialog):
                     value = self.tag_inputs[tag_name].toPlainText()
                     
                 if value:
-                    tag = TagDefinitions.create_tag(tag_name, value)
-                    if tag:
-                        updates[TagDefinitions.TAG_FRAMES[tag_name][0]] = tag
-        
-        # Process each selected file
-        errors = []
-        processed = 0
-        
-        for item in selected_items:
-            file_path = self.file_paths[self.file_list.row(item)]
+                    updates[tag_name] = value
+
+        # Saving runs as a background job so large batches don't block the UI
+        files = [self.file_paths[self.file_list.row(item)] for item in selected_items]
+        job = JobScheduler.instance().submit(
+            JobSettings.KIND_TAGS,
+            f"Tags for {len(files)} files" if len(files) > 1 else f"Tags for {os.path.basename(files[0])}",
+            {'files': files, 'updates': updates, 'art_path': self.new_art_path,
+             'replace_art': self.tag_checkboxes['Album Art'].isChecked()},
+            reads=files, writes=files
+        )
+        self.pending_jobs.add(job.id)
+
+    def handle_job_finished(self, job):
+        if job.id not in self.pending_jobs:
+            return
+        self.pending_jobs.discard(job.id)
+        # Pick up what was written
+        for file_path in job.params['files']:
             try:
-                tags = self.file_tags[file_path]
-                
-                # Update text tags
-                for frame_id, frame in updates.items():
-                    tags.add(frame)
-                
-                # Handle album art
-                if self.tag_checkboxes['Album Art'].isChecked():
-                    tags.delall("APIC")  # Remove existing art
-                    if self.new_art_path:  # Add new art if provided
-                        with open(self.new_art_path, 'rb') as art:
-                            tags.add(
-                                APIC(
-                                    encoding=3,
-                                    mime=f'image/{os.path.splitext(self.new_art_path)[1][1:]}',
-                                    type=3,
-                                    desc='Cover',
-                                    data=art.read()
-                                )
-                            )
-                
-                # Save changes
-                tags.save(file_path)
-                processed += 1
-                
+                audio = MP3(file_path)
+                self.file_tags[file_path] = audio.tags or ID3()
             except Exception as e:
-                errors.append(f"{os.path.basename(file_path)}: {str(e)}")
-        
-        # Show results
-        if errors:
-            QMessageBox.warning(
-                self,
-                "Errors Occurred",
-                f"Processed {processed} files successfully.\n\nErrors:\n" + "\n".join(errors)
-            )
-        else:
-            QMessageBox.information(
-                self,
-                "Success",
-                f"Successfully updated {processed} files!"
-            )
-            
+                print(f"Error loading tags for {file_path}: {e}")
+
+        if not self.isVisible():
+            # Closed meanwhile; the main window and Jobs panel report the result
+            return
+        if job.state == Job.FAILED:
+            QMessageBox.warning(self, "Errors Occurred", job.message)
+        elif job.state == Job.DONE:
+            QMessageBox.information(self, "Success", job.message)
+
         # Refresh the file info display
         self.update_file_info(self.file_list.currentItem(), None)
 
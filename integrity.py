@@ -0,0 +1,49 @@
+# integrity.py
+from PyQt6.QtCore import QThread, pyqtSignal
+from metadata_cache import MetadataCache
+from stream_verifier import StreamVerifier
+from config import IntegritySettings, WatchSettings
+
+class VerifyThread(QThread):
+    """Verify files and report the damaged ones"""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, files, check_md5=True, workers=IntegritySettings.WORKERS, db_path=WatchSettings.METADATA_DB):
+        super().__init__()
+        self.files = files
+        self.check_md5 = check_md5
+        self.workers = workers
+        self.db_path = db_path
+        self.results = {}
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report(self, done, total):
+        self.progress.emit(int(done / max(1, total) * 100))
+
+    def run(self):
+        try:
+            self.status.emit(f"Verifying {len(self.files)} files...")
+            cache = MetadataCache(self.db_path)
+            try:
+                self.results = StreamVerifier.verify_many(self.files, cache, self.check_md5, self.workers,
+                                                          self.report, lambda: self.cancelled)
+            finally:
+                cache.close()
+        except Exception as e:
+            print(f"Error verifying files: {e}")
+            self.finished.emit(False, str(e))
+            return
+
+        if self.cancelled:
+            self.finished.emit(False, "Cancelled")
+            return
+        damaged = StreamVerifier.summary(self.results)
+        if damaged:
+            self.finished.emit(False, f"{len(damaged)} of {len(self.results)} files are damaged:\n" + "\n".join(damaged))
+        else:
+            self.finished.emit(True, f"All {len(self.results)} files are intact")
@@ -0,0 +1,314 @@
+# job_scheduler.py
+import json
+import os
+import time
+import uuid
+from PyQt6.QtCore import QObject, pyqtSignal
+from file_manager import FileManager
+from job_threads import create_worker
+from config import JobSettings
+from tracing import Tracer
+
+class Job:
+    """One queued unit of work. params are JSON so the queue can be saved;
+    reads and writes are the paths the job touches, used to keep jobs that
+    would clobber each other from running at the same time."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    FINISHED_STATES = (DONE, FAILED, CANCELLED)
+    FIELDS = ('id', 'kind', 'title', 'params', 'priority', 'state', 'progress', 'status',
+              'message', 'created', 'started', 'finished', 'reads', 'writes', 'total_bytes')
+
+    def __init__(self, kind, title, params, priority=JobSettings.DEFAULT_PRIORITY,
+                 reads=(), writes=()):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.title = title
+        self.params = params
+        self.priority = priority
+        self.state = Job.QUEUED
+        self.progress = 0
+        self.status = ""
+        self.message = ""
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.reads = [os.path.abspath(path) for path in reads]
+        self.writes = [os.path.abspath(path) for path in writes]
+        self.total_bytes = 0
+        for path in self.reads:
+            try:
+                self.total_bytes += os.path.getsize(path)
+            except OSError:
+                pass
+        self.cancel_requested = False
+
+    @property
+    def pool(self):
+        return JobSettings.KIND_POOLS[self.kind]
+
+    @property
+    def is_finished(self):
+        return self.state in Job.FINISHED_STATES
+
+    def conflicts_with(self, other):
+        """True if either job writes a path the other reads or writes"""
+        ours = set(self.writes)
+        theirs = set(other.writes)
+        return bool(ours & (theirs | set(other.reads)) or theirs & set(self.reads))
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def eta(self):
+        """Seconds left, extrapolated from progress so far, or None"""
+        if self.state != Job.RUNNING or self.progress <= 0:
+            return None
+        return self.elapsed() * (100 - self.progress) / self.progress
+
+    def throughput(self):
+        """(files per second, input bytes per second) processed so far"""
+        elapsed = self.elapsed()
+        if elapsed <= 0:
+            return 0.0, 0.0
+        done = self.progress / 100
+        return len(self.reads) * done / elapsed, self.total_bytes * done / elapsed
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in Job.FIELDS}
+
+    @staticmethod
+    def from_dict(data):
+        job = Job.__new__(Job)
+        for field in Job.FIELDS:
+            setattr(job, field, data.get(field))
+        job.cancel_requested = False
+        return job
+
+
+class JobScheduler(QObject):
+    """Runs queued jobs on worker threads, highest priority first, with a
+    concurrency limit per pool (JobSettings.POOL_LIMITS). The queue is saved
+    to JobSettings.QUEUE_FILE on every state change; jobs interrupted by a
+    quit go back to the queue and the scheduler starts paused if any are
+    restored."""
+    job_added = pyqtSignal(object)
+    job_changed = pyqtSignal(object)
+    job_removed = pyqtSignal(str)
+    job_finished = pyqtSignal(object)
+    paused_changed = pyqtSignal(bool)
+    _instance = None
+
+    def __init__(self, queue_file=JobSettings.QUEUE_FILE, pool_limits=None, parent=None):
+        super().__init__(parent)
+        self.queue_file = queue_file
+        self.pool_limits = dict(pool_limits or JobSettings.POOL_LIMITS)
+        self.jobs = {}
+        self.workers = {}
+        self.paused = False
+        self.shutting_down = False
+        self.load()
+
+    @staticmethod
+    def instance():
+        if JobScheduler._instance is None:
+            JobScheduler._instance = JobScheduler()
+        return JobScheduler._instance
+
+    def submit(self, kind, title, params, priority=JobSettings.DEFAULT_PRIORITY,
+               reads=(), writes=()):
+        job = Job(kind, title, params, priority, reads, writes)
+        self.jobs[job.id] = job
+        self.job_added.emit(job)
+        self.save()
+        self.schedule()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def pending_jobs(self):
+        return [job for job in self.jobs.values() if not job.is_finished]
+
+    def running_jobs(self):
+        return [job for job in self.jobs.values() if job.state == Job.RUNNING]
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.is_finished:
+            return
+        if job.state == Job.RUNNING:
+            # The worker stops at its next checkpoint and reports back
+            job.cancel_requested = True
+            job.status = "Cancelling..."
+            self.workers[job_id].cancel()
+            self.job_changed.emit(job)
+        else:
+            self.finish(job, Job.CANCELLED, "Cancelled")
+            self.schedule()
+
+    def set_priority(self, job_id, priority):
+        job = self.jobs.get(job_id)
+        if job is None or job.is_finished:
+            return
+        job.priority = priority
+        self.job_changed.emit(job)
+        self.save()
+        self.schedule()
+
+    def pause(self):
+        """Stop starting new jobs; running ones carry on"""
+        if not self.paused:
+            self.paused = True
+            self.paused_changed.emit(True)
+
+    def resume(self):
+        if self.paused:
+            self.paused = False
+            self.paused_changed.emit(False)
+            self.schedule()
+
+    def clear_finished(self):
+        for job in [job for job in self.jobs.values() if job.is_finished]:
+            del self.jobs[job.id]
+            self.job_removed.emit(job.id)
+        self.save()
+
+    def can_start(self, job, running):
+        if sum(1 for other in running if other.pool == job.pool) >= self.pool_limits.get(job.pool, 1):
+            return False
+        return not any(job.conflicts_with(other) for other in running)
+
+    def schedule(self):
+        if self.paused or self.shutting_down:
+            return
+        running = self.running_jobs()
+        queued = sorted((job for job in self.jobs.values() if job.state == Job.QUEUED),
+                        key=lambda job: (-job.priority, job.created))
+        for job in queued:
+            # A job that cannot start yet does not hold back lower priority
+            # jobs in other pools or on other files
+            if self.can_start(job, running):
+                self.start_job(job)
+                running.append(job)
+
+    def start_job(self, job):
+        try:
+            worker = create_worker(job.kind, job.params)
+        except Exception as e:
+            print(f"Error starting job {job.title}: {e}")
+            self.finish(job, Job.FAILED, str(e))
+            return
+        job.state = Job.RUNNING
+        job.started = time.time()
+        job.progress = 0
+        job.status = "Starting..."
+        self.workers[job.id] = worker
+        worker.progress.connect(lambda value, job=job: self.update_progress(job, value))
+        worker.status.connect(lambda message, job=job: self.update_status(job, message))
+        worker.finished.connect(lambda success, message, job=job:
+                                self.worker_finished(job, success, message))
+        Tracer.count("jobs.started")
+        self.job_changed.emit(job)
+        self.save()
+        worker.start()
+
+    def update_progress(self, job, value):
+        if job.state == Job.RUNNING and value != job.progress:
+            job.progress = value
+            self.job_changed.emit(job)
+
+    def update_status(self, job, message):
+        if job.state == Job.RUNNING and not job.cancel_requested:
+            job.status = message
+            self.job_changed.emit(job)
+
+    def worker_finished(self, job, success, message):
+        worker = self.workers.pop(job.id, None)
+        if worker is not None:
+            # The custom finished signal is emitted from inside run()
+            worker.wait()
+        if self.shutting_down:
+            # Interrupted by quit: run again next session
+            job.state = Job.QUEUED
+            job.progress = 0
+            job.status = "Interrupted"
+            job.started = None
+            return
+        if job.cancel_requested:
+            state = Job.CANCELLED
+        else:
+            state = Job.DONE if success else Job.FAILED
+        self.finish(job, state, message)
+        self.schedule()
+
+    def finish(self, job, state, message):
+        job.state = state
+        job.message = message
+        job.status = message.splitlines()[0] if message else state.capitalize()
+        job.finished = time.time()
+        if state == Job.DONE:
+            job.progress = 100
+        Tracer.count(f"jobs.{state}")
+        self.job_changed.emit(job)
+        self.job_finished.emit(job)
+        self.trim_history()
+        self.save()
+
+    def trim_history(self):
+        finished = [job for job in self.jobs.values() if job.is_finished]
+        for job in finished[:max(0, len(finished) - JobSettings.HISTORY_LIMIT)]:
+            del self.jobs[job.id]
+            self.job_removed.emit(job.id)
+
+    def shutdown(self):
+        """Stop running workers and save them as queued for the next session"""
+        self.shutting_down = True
+        for job_id, worker in list(self.workers.items()):
+            worker.cancel()
+        for job_id, worker in list(self.workers.items()):
+            worker.wait()
+            job = self.jobs[job_id]
+            job.state = Job.QUEUED
+            job.progress = 0
+            job.status = "Interrupted"
+            job.started = None
+        self.workers.clear()
+        self.save()
+
+    def load(self):
+        if not self.queue_file or not os.path.exists(self.queue_file):
+            return
+        try:
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for entry in data.get('jobs', []):
+                job = Job.from_dict(entry)
+                if job.state == Job.RUNNING:
+                    job.state = Job.QUEUED
+                    job.progress = 0
+                    job.started = None
+                    job.status = "Interrupted"
+                self.jobs[job.id] = job
+        except Exception as e:
+            print(f"Error loading job queue: {e}")
+        # Don't start restored work behind the user's back
+        if self.pending_jobs():
+            self.paused = True
+
+    def save(self):
+        if not self.queue_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.queue_file), exist_ok=True)
+            temp_path = FileManager.temp_path(self.queue_file)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'jobs': [job.to_dict() for job in self.jobs.values()]}, f, indent=2)
+            os.replace(temp_path, self.queue_file)
+        except Exception as e:
+            print(f"Error saving job queue: {e}")
@@ -0,0 +1,105 @@
+# job_threads.py
+import os
+from PyQt6.QtCore import QThread, pyqtSignal
+from playlist_writer import PlaylistWriter
+from tag_writer import TagWriter
+from audio_transitions import Transition
+from config import JobSettings
+
+class PlaylistThread(QThread):
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, files, save_path, format_name):
+        super().__init__()
+        self.files = files
+        self.save_path = save_path
+        self.format_name = format_name
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            if self.cancelled:
+                raise RuntimeError("Cancelled")
+            self.status.emit(f"Writing {os.path.basename(self.save_path)}...")
+            PlaylistWriter.write_playlist(self.save_path, self.files, self.format_name)
+            self.progress.emit(100)
+            self.finished.emit(True, "Playlist created successfully!")
+        except Exception as e:
+            print(f"Error creating playlist: {e}")
+            self.finished.emit(False, str(e))
+
+
+class TagApplyThread(QThread):
+    """Apply the batch editor's changes to every file. updates maps tag names
+    from TagDefinitions to their new text; with replace_art set, existing art
+    is removed and art_path (if any) embedded instead."""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, files, updates, art_path=None, replace_art=False):
+        super().__init__()
+        self.files = files
+        self.updates = updates
+        self.art_path = art_path
+        self.replace_art = replace_art
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            frames, art_frame = TagWriter.prepare_id3_changes(self.updates, self.art_path, self.replace_art)
+        except Exception as e:
+            print(f"Error preparing tag changes: {e}")
+            self.finished.emit(False, str(e))
+            return
+
+        errors = []
+        processed = 0
+        for i, file_path in enumerate(self.files):
+            if self.cancelled:
+                self.finished.emit(False, "Cancelled")
+                return
+            self.status.emit(f"Updating {os.path.basename(file_path)}...")
+            try:
+                TagWriter.apply_id3_changes(file_path, frames, self.replace_art, art_frame)
+                processed += 1
+            except Exception as e:
+                errors.append(f"{os.path.basename(file_path)}: {str(e)}")
+            self.progress.emit(int((i + 1) / len(self.files) * 100))
+
+        if errors:
+            self.finished.emit(False, f"Processed {processed} files successfully.\n\nErrors:\n"
+                               + "\n".join(errors))
+        else:
+            self.finished.emit(True, f"Successfully updated {processed} files!")
+
+
+def create_worker(kind, params):
+    """Worker thread for a job; params are the job's JSON parameters"""
+    if kind == JobSettings.KIND_COMBINE:
+        from audio_thread import AudioCombinerThread
+        params = dict(params)
+        params['transitions'] = Transition.from_dict(params['transitions'])
+        return AudioCombinerThread(**params)
+    if kind == JobSettings.KIND_PLAYLIST:
+        return PlaylistThread(**params)
+    if kind == JobSettings.KIND_TAGS:
+        return TagApplyThread(**params)
+    if kind == JobSettings.KIND_BULK:
+        from bulk_playlists import BulkPlaylistThread
+        return BulkPlaylistThread(**params)
+    if kind == JobSettings.KIND_VERIFY:
+        from integrity import VerifyThread
+        return VerifyThread(**params)
+    if kind == JobSettings.KIND_SPLIT:
+        from audio_splitter import SplitThread
+        return SplitThread(**params)
+    raise ValueError(f"Unknown job kind: {kind}")
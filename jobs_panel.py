@@ -0,0 +1,164 @@
+# jobs_panel.py
+from PyQt6.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget,
+    QTableWidgetItem, QPushButton, QProgressBar, QAbstractItemView, QHeaderView, QLabel)
+from PyQt6.QtCore import QTimer
+from job_scheduler import JobScheduler, Job
+
+class JobsPanel(QDockWidget):
+    """Dockable list of queued, running and finished jobs with live
+    progress, ETA and throughput"""
+    COLUMNS = ["Job", "Kind", "Priority", "State", "Progress", "ETA", "Throughput", "Status"]
+    PROGRESS_COLUMN = 4
+
+    def __init__(self, scheduler=None, parent=None):
+        super().__init__("Jobs", parent)
+        self.setObjectName("JobsPanel")
+        self.scheduler = scheduler or JobScheduler.instance()
+        self.rows = []
+        self.setup_ui()
+        self.rebuild()
+
+        self.scheduler.job_added.connect(self.rebuild)
+        self.scheduler.job_removed.connect(self.rebuild)
+        self.scheduler.job_changed.connect(self.update_job)
+        self.scheduler.paused_changed.connect(self.update_pause_button)
+
+        # ETA and throughput change with time, not only on progress
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh_running)
+        self.timer.start(1000)
+
+    def setup_ui(self):
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(len(self.COLUMNS) - 1, QHeaderView.ResizeMode.Stretch)
+        self.table.itemSelectionChanged.connect(self.update_buttons)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        self.summary_label = QLabel()
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_selected)
+        self.raise_btn = QPushButton("Raise Priority")
+        self.raise_btn.clicked.connect(lambda: self.change_priority(1))
+        self.lower_btn = QPushButton("Lower Priority")
+        self.lower_btn.clicked.connect(lambda: self.change_priority(-1))
+        self.pause_btn = QPushButton()
+        self.pause_btn.clicked.connect(self.toggle_paused)
+        clear_btn = QPushButton("Clear Finished")
+        clear_btn.clicked.connect(self.scheduler.clear_finished)
+
+        button_layout.addWidget(self.summary_label)
+        button_layout.addStretch()
+        button_layout.addWidget(self.cancel_btn)
+        button_layout.addWidget(self.raise_btn)
+        button_layout.addWidget(self.lower_btn)
+        button_layout.addWidget(self.pause_btn)
+        button_layout.addWidget(clear_btn)
+        layout.addLayout(button_layout)
+
+        self.setWidget(widget)
+        self.update_pause_button(self.scheduler.paused)
+        self.update_buttons()
+
+    @staticmethod
+    def format_duration(seconds):
+        if seconds is None:
+            return ""
+        seconds = int(seconds)
+        if seconds >= 3600:
+            return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+        return f"{seconds // 60}:{seconds % 60:02d}"
+
+    @staticmethod
+    def format_throughput(job):
+        if job.started is None:
+            return ""
+        files_per_second, bytes_per_second = job.throughput()
+        if job.total_bytes:
+            return f"{files_per_second:.1f} files/s, {bytes_per_second / (1024 * 1024):.1f} MB/s"
+        return f"{files_per_second:.1f} files/s"
+
+    def rebuild(self, *args):
+        selected = self.selected_job_ids()
+        self.rows = list(self.scheduler.jobs.keys())
+        self.table.setRowCount(len(self.rows))
+        for row, job_id in enumerate(self.rows):
+            progress = QProgressBar()
+            progress.setRange(0, 100)
+            self.table.setCellWidget(row, self.PROGRESS_COLUMN, progress)
+            for column in range(len(self.COLUMNS)):
+                if column != self.PROGRESS_COLUMN:
+                    self.table.setItem(row, column, QTableWidgetItem())
+            self.update_row(row, self.scheduler.get(job_id))
+            if job_id in selected:
+                self.table.selectRow(row)
+        self.update_summary()
+
+    def update_row(self, row, job):
+        values = [job.title, job.kind, str(job.priority), job.state.capitalize(), None,
+                  self.format_duration(job.eta()), self.format_throughput(job), job.status]
+        for column, value in enumerate(values):
+            if value is not None:
+                self.table.item(row, column).setText(value)
+        self.table.item(row, 0).setToolTip(job.message or job.title)
+        self.table.item(row, len(values) - 1).setToolTip(job.message or job.status)
+        self.table.cellWidget(row, self.PROGRESS_COLUMN).setValue(job.progress)
+
+    def update_job(self, job):
+        if job.id in self.rows:
+            self.update_row(self.rows.index(job.id), job)
+        self.update_summary()
+        self.update_buttons()
+
+    def refresh_running(self):
+        for row, job_id in enumerate(self.rows):
+            job = self.scheduler.get(job_id)
+            if job is not None and job.state == Job.RUNNING:
+                self.update_row(row, job)
+
+    def update_summary(self):
+        running = len(self.scheduler.running_jobs())
+        queued = len(self.scheduler.pending_jobs()) - running
+        self.summary_label.setText(f"{running} running, {queued} queued")
+
+    def selected_job_ids(self):
+        rows = sorted({index.row() for index in self.table.selectedIndexes()})
+        return [self.rows[row] for row in rows if row < len(self.rows)]
+
+    def selected_jobs(self):
+        jobs = [self.scheduler.get(job_id) for job_id in self.selected_job_ids()]
+        return [job for job in jobs if job is not None and not job.is_finished]
+
+    def update_buttons(self):
+        jobs = self.selected_jobs()
+        self.cancel_btn.setEnabled(bool(jobs))
+        queued = any(job.state == Job.QUEUED for job in jobs)
+        self.raise_btn.setEnabled(queued)
+        self.lower_btn.setEnabled(queued)
+
+    def update_pause_button(self, paused):
+        self.pause_btn.setText("Resume Queue" if paused else "Pause Queue")
+
+    def cancel_selected(self):
+        for job in self.selected_jobs():
+            self.scheduler.cancel(job.id)
+
+    def change_priority(self, step):
+        for job in self.selected_jobs():
+            if job.state == Job.QUEUED:
+                self.scheduler.set_priority(job.id, job.priority + step)
+
+    def toggle_paused(self):
+        if self.scheduler.paused:
+            self.scheduler.resume()
+        else:
+            self.scheduler.pause()
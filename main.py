@@ -2,40 +2,116 @@
 # main.py
 import os
 import sys
+import time
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
     QHBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QCheckBox, 
     QListWidget, QProgressBar, QFileDialog, QMessageBox, QFrame, QListWidgetItem,
-    QAbstractItemView, QDialog, QDialogButtonBox, QRadioButton, QStyle, QMenuBar, QMenu)
+    QAbstractItemView, QDialog, QStyle, QMenuBar, QMenu,
+    QProgressDialog, QStyledItemDelegate)
 from PyQt6.QtCore import Qt, QFileSystemWatcher, QSize
-from PyQt6.QtGui import QIcon, QPixmap, QAction
-from audio_thread import AudioCombinerThread
-from playlist_writer import PlaylistWriter
+from PyQt6.QtGui import QIcon, QAction, QActionGroup
 from file_manager import FileManager
-from config import PlaylistFormats
+from tag_reader import FastTagReader
+from network_io import NetworkIO
+from config import (PlaylistFormats, ThumbnailSettings, JobSettings, ScanSettings, TransferSettings,
+                    RenameSettings, WaveformSettings)
 from AboutDialog import AboutDialog
 from id3_editor import edit_id3_tags
+from combine_dialog import CombineOptionsDialog
+from combine_job import CombineJob
+from art_export import AlbumArtExportThread
+from art_export_dialog import ArtExportDialog
+from art_optimizer import ArtOptimizerThread
+from art_optimizer_dialog import ArtOptimizerDialog
+from smart_playlist_dialog import SmartPlaylistDialog
+from bulk_playlist_dialog import BulkPlaylistDialog
+from split_dialog import SplitDialog
+from tag_transfer import TagExportThread, TagImportThread
+from rename_engine import RenameEngine, RenameThread, RenameUndoThread
+from rename_dialog import RenameDialog
+from thumbnail_cache import ThumbnailCache, ThumbnailLoader
+from thumbnail_picker import ThumbnailPickerDialog
+from waveform import WaveformCache, WaveformLoader, WaveformDelegate
+from tracing import Tracer
+from stall_watchdog import StallWatchdog
+from diagnostics_dialog import DiagnosticsDialog
+from job_scheduler import JobScheduler, Job
+from jobs_panel import JobsPanel
+import cli
+
+class ThumbnailListItem(QListWidgetItem):
+    """List item that fetches its icon from ThumbnailCache when painted, so
+    only rows on screen ever hold decoded art, and reads its tag tooltip
+    from the file header the first time it is hovered"""
+    tooltip = None
+
+    def data(self, role):
+        if role == Qt.ItemDataRole.DecorationRole and self.listWidget() is not None:
+            return self.listWidget().thumbnail_icon(super().data(Qt.ItemDataRole.UserRole))
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if self.tooltip is None:
+                self.tooltip = self.tag_tooltip(super().data(Qt.ItemDataRole.UserRole))
+            return self.tooltip
+        return super().data(role)
+
+    @staticmethod
+    def tag_tooltip(file_path):
+        fast = FastTagReader.read(file_path)
+        tags = fast['tags'] if fast is not None else {}
+        # Multiple values are NUL-separated
+        lines = [f"{tag_name}: {tags[tag_name].replace(chr(0), ' / ')}"
+                 for tag_name in ('Title', 'Artist', 'Album') if tag_name in tags]
+        return "\n".join([file_path] + lines)
 
 class ThumbnailListWidget(QListWidget):
+    loader = None
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setIconSize(QSize(32, 32))
+        self.setIconSize(QSize(ThumbnailSettings.LIST_ICON_SIZE, ThumbnailSettings.LIST_ICON_SIZE))
         self.setSpacing(2)
+        # Uniform rows let the view lay out long lists without asking every item
+        self.setUniformItemSizes(True)
+        self.default_icon = self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay)
+        if ThumbnailListWidget.loader is None:
+            ThumbnailListWidget.loader = ThumbnailLoader()
+            QApplication.instance().aboutToQuit.connect(ThumbnailListWidget.loader.stop)
+        ThumbnailListWidget.loader.loaded.connect(self.thumbnail_loaded)
+        WaveformLoader.instance().loaded.connect(self.waveform_loaded)
+        self.set_waveforms_visible(WaveformSettings.SHOW_IN_LISTS)
+
+    def set_waveforms_visible(self, visible):
+        self.show_waveforms = visible
+        self.setItemDelegate(WaveformDelegate(self) if visible else QStyledItemDelegate(self))
+        self.viewport().update()
+
+    def waveform_loaded(self, file_path, peaks):
+        if self.show_waveforms:
+            self.viewport().update()
+
+    def thumbnail_size(self):
+        # Decode at device pixels so icons stay sharp on high-DPI screens
+        return int(self.iconSize().width() * self.devicePixelRatioF())
+
+    def thumbnail_icon(self, file_path):
+        pixmap = ThumbnailCache.get(file_path, self.thumbnail_size())
+        if pixmap is None:
+            ThumbnailListWidget.loader.request(file_path, self.thumbnail_size())
+        if pixmap is None or pixmap is ThumbnailCache.MISSING:
+            # Use default music icon from system theme
+            return self.default_icon
+        return QIcon(pixmap)
+
+    def thumbnail_loaded(self, file_path, size, image):
+        if size == self.thumbnail_size():
+            self.viewport().update()
 
     def add_audio_item(self, file_path, text=None):
         if text is None:
             text = os.path.basename(file_path)
             
-        item = QListWidgetItem(text)
+        item = ThumbnailListItem(text)
         item.setData(Qt.ItemDataRole.UserRole, file_path)
-        
-        # Try to get thumbnail
-        thumbnail = FileManager.extract_thumbnail(file_path)
-        if thumbnail:
-            item.setIcon(QIcon(QPixmap.fromImage(thumbnail)))
-        else:
-            # Use default music icon from system theme
-            item.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
-            
         self.addItem(item)
         return item
 
@@ -51,7 +127,17 @@ class PlaylistCreator(QMainWindow):
             self.setWindowIcon(QIcon(icon_path))
 
         self.fs_watcher = QFileSystemWatcher()
-        self.fs_watcher.directoryChanged.connect(self.update_available_files)
+        self.fs_watcher.directoryChanged.connect(self.directory_changed)
+        # Folders whose next change notifications we caused ourselves
+        self.own_changes = {}
+        self.scheduler = JobScheduler.instance()
+        self.scheduler.job_added.connect(self.update_job_status)
+        self.scheduler.job_changed.connect(self.update_job_status)
+        self.scheduler.job_finished.connect(self.handle_job_finished)
+        self.scheduler.paused_changed.connect(self.update_job_status)
+        self.jobs_panel = JobsPanel(self.scheduler, self)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.jobs_panel)
+        self.jobs_panel.hide()
         self.create_menu()
         self.setup_ui()
 
@@ -72,6 +158,16 @@ class PlaylistCreator(QMainWindow):
         export_art_action.setShortcut('Ctrl+E')
         export_art_action.triggered.connect(self.export_album_art)
         file_menu.addAction(export_art_action)
+
+        file_menu.addSeparator()
+
+        export_tags_action = QAction('Export Tags...', self)
+        export_tags_action.triggered.connect(self.export_tags)
+        file_menu.addAction(export_tags_action)
+
+        import_tags_action = QAction('Import Tags...', self)
+        import_tags_action.triggered.connect(self.import_tags)
+        file_menu.addAction(import_tags_action)
         
         file_menu.addSeparator()
         
@@ -81,6 +177,60 @@ class PlaylistCreator(QMainWindow):
         quit_action.triggered.connect(self.close)
         file_menu.addAction(quit_action)
         
+        # View menu
+        view_menu = menubar.addMenu('View')
+        jobs_action = self.jobs_panel.toggleViewAction()
+        jobs_action.setShortcut('Ctrl+J')
+        view_menu.addAction(jobs_action)
+
+        waveforms_action = QAction('Show Waveforms', self, checkable=True)
+        waveforms_action.setChecked(WaveformSettings.SHOW_IN_LISTS)
+        waveforms_action.toggled.connect(self.set_waveforms_visible)
+        view_menu.addAction(waveforms_action)
+
+        # Tools menu
+        tools_menu = menubar.addMenu('Tools')
+
+        optimize_art_action = QAction('Optimize Embedded Art...', self)
+        optimize_art_action.triggered.connect(self.optimize_album_art)
+        tools_menu.addAction(optimize_art_action)
+
+        smart_playlist_action = QAction('Smart Playlist...', self)
+        smart_playlist_action.setShortcut('Ctrl+Shift+P')
+        smart_playlist_action.triggered.connect(self.create_smart_playlist)
+        tools_menu.addAction(smart_playlist_action)
+
+        bulk_playlists_action = QAction('Bulk Playlists...', self)
+        bulk_playlists_action.triggered.connect(self.create_bulk_playlists)
+        tools_menu.addAction(bulk_playlists_action)
+
+        rename_action = QAction('Rename from Pattern...', self)
+        rename_action.setShortcut('Ctrl+R')
+        rename_action.triggered.connect(self.rename_files)
+        tools_menu.addAction(rename_action)
+
+        undo_rename_action = QAction('Undo Last Rename', self)
+        undo_rename_action.triggered.connect(self.undo_rename)
+        tools_menu.addAction(undo_rename_action)
+
+        verify_action = QAction('Verify Files...', self)
+        verify_action.triggered.connect(self.verify_files)
+        tools_menu.addAction(verify_action)
+
+        split_action = QAction('Split Recording...', self)
+        split_action.triggered.connect(self.split_recording)
+        tools_menu.addAction(split_action)
+
+        # How the library is read: network mounts need many requests in flight
+        io_menu = tools_menu.addMenu('Library I/O Mode')
+        io_group = QActionGroup(self)
+        for label, mode in ScanSettings.MODES.items():
+            mode_action = QAction(label, self, checkable=True)
+            mode_action.setChecked(NetworkIO.mode == mode)
+            mode_action.triggered.connect(lambda checked, mode=mode: self.set_io_mode(mode))
+            io_group.addAction(mode_action)
+            io_menu.addAction(mode_action)
+
         # Help menu
         help_menu = menubar.addMenu('Help')
         
@@ -89,6 +239,10 @@ class PlaylistCreator(QMainWindow):
         about_action.triggered.connect(self.show_about)
         help_menu.addAction(about_action)
 
+        diagnostics_action = QAction('Diagnostics', self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        help_menu.addAction(diagnostics_action)
+
     def edit_id3_tags(self):
         # Get the selected files
         selected_files = self.get_selected_files_paths()
@@ -96,23 +250,26 @@ class PlaylistCreator(QMainWindow):
             QMessageBox.warning(self, "Warning", "Please select files to edit tags!")
             return
             
-        if edit_id3_tags(selected_files, self):
-            # Refresh the displays
-            self.update_available_files()
+        # Tag changes are applied by queued jobs; the displays refresh
+        # when each one finishes (see handle_job_finished)
+        edit_id3_tags(selected_files, self)
 
     def export_album_art(self):
-        selected_files = self.get_selected_files_paths()
+        selected_files = self.get_highlighted_files()
         if not selected_files:
             QMessageBox.warning(self, "Warning", "Please select a file to export album art from!")
             return
-        
-        # For now, just handle the first selected file
+
+        if len(selected_files) > 1:
+            self.export_album_art_bulk(selected_files)
+            return
+
         file_path = selected_files[0]
         save_path, _ = QFileDialog.getSaveFileName(
             self,
             "Save Album Art",
             "",
-            "Images (*.jpg *.jpeg *.png)"
+            "Images (*.jpg *.jpeg *.png *.webp)"
         )
         
         if save_path:
@@ -121,6 +278,193 @@ class PlaylistCreator(QMainWindow):
             else:
                 QMessageBox.warning(self, "Error", "No album art found or error saving!")
 
+    def get_highlighted_files(self):
+        """Highlighted files in either list, or every selected file"""
+        highlighted = [item.data(Qt.ItemDataRole.UserRole)
+                       for item in self.available_list.selectedItems() + self.selected_list.selectedItems()]
+        return highlighted or self.get_selected_files_paths()
+
+    def export_album_art_bulk(self, files):
+        dialog = ArtExportDialog(len(files), self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        self.run_batch_thread(AlbumArtExportThread(files, **dialog.get_options()),
+                              "Export Album Art", "Exporting album art...")
+
+    def optimize_album_art(self):
+        files = self.get_highlighted_files()
+        if not files:
+            QMessageBox.warning(self, "Warning", "Please select files to optimize!")
+            return
+
+        dialog = ArtOptimizerDialog(len(files), self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        self.run_batch_thread(ArtOptimizerThread(files, **dialog.get_options()),
+                              "Optimize Embedded Art", "Optimizing album art...")
+
+    def export_tags(self):
+        files = self.get_highlighted_files()
+        if not files:
+            QMessageBox.warning(self, "Warning", "Please select files to export tags from!")
+            return
+
+        save_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export Tags",
+            "",
+            ";;".join(f"{label.split(' (')[0]} (*{ext})" for label, ext in TransferSettings.FORMATS.items())
+        )
+        if not save_path:
+            return
+        if not os.path.splitext(save_path)[1]:
+            save_path += ".csv"
+        self.run_batch_thread(TagExportThread(files, save_path), "Export Tags", "Exporting tags...")
+
+    def import_tags(self):
+        import_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Import Tags",
+            "",
+            "Tag files (" + " ".join(f"*{ext}" for ext in TransferSettings.FORMATS.values()) + ")"
+        )
+        if not import_path:
+            return
+
+        box = QMessageBox(self)
+        box.setWindowTitle("Import Tags")
+        box.setText(f"Apply the tags in {os.path.basename(import_path)}?\n\n"
+                    "Only tags that differ from the files are written. Preview counts "
+                    "the files that would change without writing anything.")
+        apply_button = box.addButton("Apply", QMessageBox.ButtonRole.AcceptRole)
+        preview_button = box.addButton("Preview", QMessageBox.ButtonRole.ActionRole)
+        box.addButton(QMessageBox.StandardButton.Cancel)
+        box.exec()
+        if box.clickedButton() not in (apply_button, preview_button):
+            return
+        dry_run = box.clickedButton() is preview_button
+        # Imports never touch art, so only the tag tooltips need refreshing
+        self.run_batch_thread(TagImportThread(import_path, dry_run), "Import Tags", "Importing tags...",
+                              None if dry_run else self.update_available_files)
+
+    def rename_files(self):
+        files = self.get_highlighted_files()
+        if not files:
+            QMessageBox.warning(self, "Warning", "Please select files to rename or tag!")
+            return
+
+        dialog = RenameDialog(files, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        thread = RenameThread(files, **dialog.get_options())
+        self.expect_changes(files)
+        self.run_batch_thread(thread, "Rename from Pattern", "Reading tags...",
+                              lambda: self.apply_renames(thread.renamed, thread.retagged))
+
+    def undo_rename(self):
+        manifest_path = RenameEngine.latest_manifest()
+        if manifest_path is None:
+            QMessageBox.information(self, "Undo Rename", "There is no rename to undo.")
+            return
+        try:
+            manifest = RenameEngine.load_manifest(manifest_path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Undo Rename", str(e))
+            return
+        result = QMessageBox.question(
+            self,
+            "Undo Rename",
+            f"Undo '{manifest['pattern']}' from {time.strftime('%Y-%m-%d %H:%M', time.localtime(manifest['created']))}? "
+            f"{len(manifest['renames'])} files get their old names back and "
+            f"{len(manifest['tags'])} their old tags. Files changed since are left as they are."
+        )
+        if result != QMessageBox.StandardButton.Yes:
+            return
+        thread = RenameUndoThread(manifest_path)
+        self.expect_changes([new for _, new in manifest['renames']] + list(manifest['tags']))
+        self.run_batch_thread(thread, "Undo Rename", "Undoing...",
+                              lambda: self.apply_renames(thread.renamed, thread.retagged))
+
+    def expect_changes(self, files):
+        """Ignore change notifications for the folders of files we are about
+        to rename or retag, since apply_renames updates the lists itself"""
+        deadline = time.monotonic() + 3600
+        for file_path in files:
+            self.own_changes[os.path.dirname(file_path)] = deadline
+
+    def apply_renames(self, renamed, retagged):
+        """Update list items, thumbnails and watched folders in place after
+        files were renamed ({old: new}) or retagged"""
+        retagged = set(retagged)
+        for list_widget in (self.available_list, self.selected_list):
+            for row in range(list_widget.count()):
+                item = list_widget.item(row)
+                file_path = item.data(Qt.ItemDataRole.UserRole)
+                if file_path in renamed:
+                    item.setData(Qt.ItemDataRole.UserRole, renamed[file_path])
+                    item.setText(os.path.basename(renamed[file_path]))
+                    item.tooltip = None
+                elif file_path in retagged:
+                    item.tooltip = None
+        for old, new in renamed.items():
+            ThumbnailCache.rename(old, new)
+            WaveformCache.rename(old, new)
+        new_dirs = {os.path.dirname(new) for new in renamed.values()} - set(self.fs_watcher.directories())
+        watched_root = self.dir_entry.text()
+        if self.recursive_check.isChecked() and watched_root:
+            prefix = os.path.join(os.path.abspath(watched_root), '')
+            new_dirs = [directory for directory in new_dirs if directory.startswith(prefix)]
+            # Folders a pattern created need watching like the rest of the tree
+            for directory in new_dirs:
+                while directory.startswith(prefix) and directory not in self.fs_watcher.directories():
+                    self.fs_watcher.addPath(directory)
+                    directory = os.path.dirname(directory)
+        # Notifications for our own changes may still be queued
+        deadline = time.monotonic() + RenameSettings.WATCH_GRACE_MS / 1000
+        for directory in self.own_changes:
+            self.own_changes[directory] = min(self.own_changes[directory], deadline)
+        self.selected_list.viewport().update()
+        self.available_list.viewport().update()
+
+    def directory_changed(self, directory):
+        deadline = self.own_changes.get(directory)
+        if deadline is not None:
+            if time.monotonic() < deadline:
+                return
+            del self.own_changes[directory]
+        self.update_available_files()
+
+    def run_batch_thread(self, thread, title, label, on_finished=None):
+        """Run a batch worker thread behind a cancellable progress dialog;
+        on_finished is called once it ends, whatever the outcome"""
+        self.batch_thread = thread
+        progress = QProgressDialog(label, "Cancel", 0, 100, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        thread.progress.connect(progress.setValue)
+        thread.status.connect(progress.setLabelText)
+        progress.canceled.connect(thread.cancel)
+        thread.finished.connect(
+            lambda success, message: self.handle_batch_thread_finished(progress, title, success, message, on_finished))
+        thread.start()
+
+    def handle_batch_thread_finished(self, progress, title, success, message, on_finished):
+        progress.close()
+        if on_finished:
+            on_finished()
+        if success:
+            QMessageBox.information(self, title, message)
+        else:
+            QMessageBox.warning(self, title, message)
+
+    def set_io_mode(self, mode):
+        NetworkIO.set_mode(mode)
+        self.update_available_files()
+
+    def show_diagnostics(self):
+        dialog = DiagnosticsDialog(StallWatchdog.instance(), self)
+        dialog.exec()
+
     def show_about(self):
         about = AboutDialog(self)
         about.exec()
@@ -268,6 +612,18 @@ class PlaylistCreator(QMainWindow):
         ):
             if file not in current_files:
                 self.available_list.add_audio_item(file)
+        self.prefetch_waveforms()
+
+    def prefetch_waveforms(self):
+        """Work through a newly opened folder's waveforms before it is scrolled"""
+        if self.available_list.show_waveforms:
+            WaveformLoader.instance().prefetch([self.available_list.item(i).data(Qt.ItemDataRole.UserRole)
+                                                for i in range(self.available_list.count())])
+
+    def set_waveforms_visible(self, visible):
+        self.available_list.set_waveforms_visible(visible)
+        self.selected_list.set_waveforms_visible(visible)
+        self.prefetch_waveforms()
 
     def get_selected_files_paths(self):
         return [self.selected_list.item(i).data(Qt.ItemDataRole.UserRole)
@@ -314,17 +670,94 @@ class PlaylistCreator(QMainWindow):
         if not save_path:
             return
 
-        try:
-            if playlist_info["ext"] in [".m3u", ".m3u8"]:
-                PlaylistWriter.create_m3u_playlist(save_path, files, playlist_info["extended"])
-            elif playlist_info["ext"] == ".pls":
-                PlaylistWriter.create_pls_playlist(save_path, files)
-            elif playlist_info["ext"] == ".wpl":
-                PlaylistWriter.create_wpl_playlist(save_path, files)
+        self.scheduler.submit(
+            JobSettings.KIND_PLAYLIST,
+            f"Playlist {os.path.basename(save_path)}",
+            {'files': files, 'save_path': save_path, 'format_name': self.playlist_combo.currentText()},
+            reads=files, writes=[save_path]
+        )
+
+    def create_smart_playlist(self):
+        files = FileManager.get_audio_files(
+            self.dir_entry.text(),
+            self.recursive_check.isChecked(),
+            self.sort_combo.currentText()
+        )
+        if not files:
+            QMessageBox.warning(self, "Warning", "No audio files in the current directory!")
+            return
+
+        dialog = SmartPlaylistDialog(files, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        matches, format_name = dialog.get_playlist()
+        playlist_info = PlaylistFormats.FORMATS[format_name]
+        save_path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Save Smart Playlist",
+            "",
+            f"{format_name} (*{playlist_info['ext']})"
+        )
+
+        if not save_path:
+            return
 
-            QMessageBox.information(self, "Success", "Playlist created successfully!")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to create playlist: {str(e)}")
+        self.scheduler.submit(
+            JobSettings.KIND_PLAYLIST,
+            f"Playlist {os.path.basename(save_path)}",
+            {'files': matches, 'save_path': save_path, 'format_name': format_name},
+            reads=matches, writes=[save_path]
+        )
+
+    def create_bulk_playlists(self):
+        library = self.dir_entry.text()
+        if not library or not os.path.isdir(library):
+            QMessageBox.warning(self, "Warning", "Please choose a library directory first!")
+            return
+
+        dialog = BulkPlaylistDialog(library, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        options = dialog.get_options()
+        self.scheduler.submit(
+            JobSettings.KIND_BULK,
+            f"Playlists per {options['grouping'].replace('_', ' ')} of {os.path.basename(library)}",
+            dict(options, library=library),
+            reads=[library], writes=[options['output_dir'] or library]
+        )
+        self.jobs_panel.show()
+
+    def verify_files(self):
+        """Check the highlighted files' streams, including FLAC MD5s"""
+        files = self.get_highlighted_files()
+        if not files:
+            QMessageBox.warning(self, "Warning", "No files selected for verifying!")
+            return
+        self.scheduler.submit(JobSettings.KIND_VERIFY, f"Verify {len(files)} files",
+                              {'files': files, 'check_md5': True}, reads=files)
+        self.jobs_panel.show()
+
+    def split_recording(self):
+        """Split the highlighted recording (or a chosen one) into tracks"""
+        files = self.get_highlighted_files()
+        if len(files) == 1:
+            file_path = files[0]
+        else:
+            file_path, _ = QFileDialog.getOpenFileName(
+                self, "Split Recording", "",
+                "Audio Files (*.mp3 *.flac *.ogg *.m4a *.wav *.wma)")
+            if not file_path:
+                return
+        dialog = SplitDialog(file_path, self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        params = dialog.get_options()
+        params['file_path'] = file_path
+        output_dir = params['output_dir'] or os.path.splitext(file_path)[0]
+        reads = [file_path] + ([params['cue_path']] if params['cue_path'] else [])
+        self.scheduler.submit(JobSettings.KIND_SPLIT, f"Split {os.path.basename(file_path)}",
+                              params, reads=reads, writes=[output_dir])
+        self.jobs_panel.show()
 
     def combine_audio(self):
         files = self.get_selected_files_paths()
@@ -342,63 +775,121 @@ class PlaylistCreator(QMainWindow):
         if not save_path:
             return
 
+        options = CombineOptionsDialog(self)
+        if CombineJob.exists(save_path):
+            result = QMessageBox.question(
+                self,
+                "Resume Combine",
+                "An interrupted combine was found for this file. Resume it?\n\n"
+                "It resumes only if the same files and options are used.",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.Yes
+            )
+            options.set_resumable(result == QMessageBox.StandardButton.Yes)
+
+        if options.exec() != QDialog.DialogCode.Accepted:
+            return
+
         # Select thumbnail source
         thumbnail_source = self.select_thumbnail_source(files)
 
-        self.progress_bar.setVisible(True)
-        self.combiner_thread = AudioCombinerThread(files, save_path, thumbnail_source)
-        self.combiner_thread.progress.connect(self.progress_bar.setValue)
-        self.combiner_thread.status.connect(self.status_label.setText)
-        self.combiner_thread.finished.connect(self.handle_combine_finished)
-        self.combiner_thread.start()
-
-    def handle_combine_finished(self, success, message):
-        self.progress_bar.setVisible(False)
-        self.progress_bar.setValue(0)
-        self.status_label.clear()
-        
-        if success:
-            QMessageBox.information(self, "Success", message)
+        params = {
+            'files': files,
+            'save_path': save_path,
+            'thumbnail_source': thumbnail_source,
+            'transitions': options.get_transition().to_dict(),
+            'bitrate': options.get_bitrate(),
+            'encoder': options.get_encoder(),
+            'resumable': options.is_resumable()
+        }
+        params.update(options.get_chapter_options())
+        params.update(options.get_trim_options())
+        # Chapter sidecars are written next to the output
+        base_path = os.path.splitext(save_path)[0]
+        writes = [save_path]
+        if params['cue_sheet']:
+            writes.append(base_path + ".cue")
+        if params['chapter_playlist']:
+            writes.append(base_path + ".m3u8")
+        self.scheduler.submit(JobSettings.KIND_COMBINE, f"Combine {os.path.basename(save_path)}",
+                              params, reads=files, writes=writes)
+        self.jobs_panel.show()
+
+    def update_job_status(self, job=None):
+        """Aggregate progress of all running jobs under the file lists"""
+        running = self.scheduler.running_jobs()
+        queued = len(self.scheduler.pending_jobs()) - len(running)
+        if not running and not queued:
+            self.progress_bar.setVisible(False)
+            self.progress_bar.setValue(0)
+            self.status_label.clear()
+            return
+        self.progress_bar.setVisible(bool(running))
+        if running:
+            self.progress_bar.setValue(sum(job.progress for job in running) // len(running))
+        if len(running) == 1:
+            status = running[0].status
+        elif running:
+            status = f"{len(running)} jobs running"
         else:
-            QMessageBox.critical(self, "Error", f"Failed to combine audio: {message}")
+            status = "Queue paused"
+        if queued:
+            status += f" ({queued} queued)"
+        self.status_label.setText(status)
+
+    def handle_job_finished(self, job):
+        self.update_job_status()
+        if job.kind == JobSettings.KIND_TAGS and job.state != Job.CANCELLED:
+            for file_path in job.params['files']:
+                ThumbnailCache.invalidate(file_path)
+            self.selected_list.viewport().update()
+            self.update_available_files()
+        if job.kind == JobSettings.KIND_COMBINE and job.state == Job.DONE:
+            # The output may have replaced a listed file; splits never overwrite
+            save_path = job.params['save_path']
+            WaveformCache.invalidate(save_path)
+            ThumbnailCache.invalidate(save_path)
+            self.selected_list.viewport().update()
+            self.update_available_files()
+        if job.state == Job.FAILED:
+            # Failures stay listed with their message; make sure they are seen
+            self.jobs_panel.show()
+        self.statusBar().showMessage(f"{job.title}: {job.status}", 10000)
+
+    def restore_jobs(self):
+        """Offer to continue jobs left queued by the previous session"""
+        pending = self.scheduler.pending_jobs()
+        if not pending:
+            return
+        self.jobs_panel.show()
+        result = QMessageBox.question(
+            self,
+            "Resume Jobs",
+            f"{len(pending)} jobs from the last session did not finish. Resume them now?\n\n"
+            "Otherwise they stay paused in the Jobs panel.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.Yes
+        )
+        if result == QMessageBox.StandardButton.Yes:
+            self.scheduler.resume()
+        self.update_job_status()
 
     def select_thumbnail_source(self, files):
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Select Thumbnail Source")
-        layout = QVBoxLayout(dialog)
-        
-        layout.addWidget(QLabel("Choose thumbnail source for combined file:"))
-        
-        buttons = []
-        for file in files:
-            rb = QRadioButton(os.path.basename(file))
-            rb.setProperty("file_path", file)
-            thumbnail = FileManager.extract_thumbnail(file)
-            if thumbnail:
-                rb.setIcon(QIcon(QPixmap.fromImage(thumbnail)))
-            buttons.append(rb)
-            layout.addWidget(rb)
-        
-        if buttons:
-            buttons[0].setChecked(True)
-        
-        button_box = QDialogButtonBox(
-            QDialogButtonBox.StandardButton.Ok | 
-            QDialogButtonBox.StandardButton.Cancel
-        )
-        button_box.accepted.connect(dialog.accept)
-        button_box.rejected.connect(dialog.reject)
-        layout.addWidget(button_box)
-        
+        dialog = ThumbnailPickerDialog(files, self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
-            for button in buttons:
-                if button.isChecked():
-                    return button.property("file_path")
+            return dialog.get_thumbnail_source()
         return None
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in cli.COMMANDS:
+        sys.exit(cli.main(sys.argv[1:]))
+
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
+    Tracer.enable_from_environment()
+    StallWatchdog.instance().start()
+    app.aboutToQuit.connect(StallWatchdog.instance().stop)
+    app.aboutToQuit.connect(JobScheduler.instance().shutdown)
 
     # Set app icon
     icon_path = os.path.join(os.path.dirname(__file__), 'icons', 'icon.png')
@@ -407,6 +898,7 @@ def main():
 
     window = PlaylistCreator()
     window.show()
+    window.restore_jobs()
     sys.exit(app.exec())
 
 if __name__ == "__main__":
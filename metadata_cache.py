@@ -0,0 +1,194 @@
+# metadata_cache.py
+import json
+import os
+import sqlite3
+import threading
+from audio_metadata import AudioMetadata
+from playlist_writer import PlaylistWriter
+from config import WatchSettings
+from tracing import Tracer
+
+class MetadataCache:
+    """SQLite store of per-track playlist metadata keyed by file identity
+    (path, size, mtime), so unchanged files are never probed twice, plus the
+    signature of every playlist last written from it. The library table
+    holds the fuller records smart playlists query, and when each track was
+    first seen; integrity and waveforms hold verifier results and peak
+    overviews."""
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tracks (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            duration INTEGER NOT NULL,
+            title TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS library (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            added REAL NOT NULL,
+            duration REAL NOT NULL,
+            bitrate INTEGER NOT NULL,
+            tags TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS integrity (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            result TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS waveforms (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            peaks BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS playlists (
+            path TEXT PRIMARY KEY,
+            signature TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, db_path=WatchSettings.METADATA_DB):
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.executescript(MetadataCache.SCHEMA)
+        self.probes = 0
+        self.hits = 0
+
+    def get(self, file_path, stats=None):
+        """Cached (duration, title), or None if missing or out of date"""
+        stats = stats or os.stat(file_path)
+        with self.lock:
+            row = self.db.execute("SELECT size, mtime_ns, duration, title FROM tracks WHERE path = ?",
+                                  (file_path,)).fetchone()
+        if row is None or row[0] != stats.st_size or row[1] != stats.st_mtime_ns:
+            return None
+        return row[2], row[3]
+
+    def put(self, file_path, stats, duration, title):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?)",
+                            (file_path, stats.st_size, stats.st_mtime_ns, duration, title))
+
+    def track_info(self, file_path):
+        """(duration, title) for PlaylistWriter, probing only new or changed
+        files. They come from the same header probe as library_record, so a
+        track a smart playlist already indexed isn't read again."""
+        try:
+            stats = os.stat(file_path)
+        except OSError:
+            return 0, os.path.basename(file_path)
+        cached = self.get(file_path, stats)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        record = self.library_record(file_path, stats.st_size, stats.st_mtime_ns)
+        duration, title = PlaylistWriter.track_info_from_probe(file_path, record)
+        self.put(file_path, stats, duration, title)
+        return duration, title
+
+    def library_record(self, file_path, size=None, mtime_ns=None):
+        """LibraryIndex record for a file, probing it only if new or changed.
+        Pass size and mtime_ns when already known to save a stat."""
+        if size is None or mtime_ns is None:
+            stats = os.stat(file_path)
+            size, mtime_ns = stats.st_size, stats.st_mtime_ns
+        with self.lock:
+            row = self.db.execute("SELECT size, mtime_ns, added, duration, bitrate, tags FROM library "
+                                  "WHERE path = ?", (file_path,)).fetchone()
+        if row is not None and row[0] == size and row[1] == mtime_ns:
+            self.hits += 1
+            added, duration, bitrate, tags = row[2], row[3], row[4], json.loads(row[5])
+        else:
+            self.probes += 1
+            Tracer.count("metadata.probes")
+            info = AudioMetadata.probe(file_path)
+            # A new file counts as added when it arrived on disk (its ctime),
+            # not when it was first indexed, so a first index of an existing
+            # library doesn't make every track new
+            added = row[2] if row is not None else os.stat(file_path).st_ctime
+            duration = info.get('duration', 0)
+            bitrate = int(info.get('bitrate', 0) / 1000)
+            tags = info.get('tags', {})
+            with self.lock:
+                self.db.execute("INSERT OR REPLACE INTO library VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                (file_path, size, mtime_ns, added, duration, bitrate, json.dumps(tags)))
+        return {
+            'size': size,
+            'mtime': mtime_ns / 1e9,
+            'added': added,
+            'duration': duration,
+            'bitrate': bitrate,
+            'tags': tags
+        }
+
+    def forget(self, file_paths):
+        with self.lock:
+            self.db.executemany("DELETE FROM tracks WHERE path = ?", [(path,) for path in file_paths])
+            self.db.executemany("DELETE FROM library WHERE path = ?", [(path,) for path in file_paths])
+            self.db.executemany("DELETE FROM integrity WHERE path = ?", [(path,) for path in file_paths])
+            self.db.executemany("DELETE FROM waveforms WHERE path = ?", [(path,) for path in file_paths])
+
+    def get_integrity(self, file_path, deep=False):
+        """Cached StreamVerifier result, or None if missing, out of date or
+        shallower than asked for"""
+        stats = os.stat(file_path)
+        with self.lock:
+            row = self.db.execute("SELECT size, mtime_ns, result FROM integrity WHERE path = ?",
+                                  (file_path,)).fetchone()
+        if row is None or row[0] != stats.st_size or row[1] != stats.st_mtime_ns:
+            return None
+        result = json.loads(row[2])
+        return None if deep and not result['deep'] else result
+
+    def put_integrity(self, file_path, result):
+        stats = os.stat(file_path)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO integrity VALUES (?, ?, ?, ?)",
+                            (file_path, stats.st_size, stats.st_mtime_ns, json.dumps(result)))
+
+    def get_waveform(self, file_path):
+        """Cached WaveformPeaks blob, or None if missing or out of date"""
+        stats = os.stat(file_path)
+        with self.lock:
+            row = self.db.execute("SELECT size, mtime_ns, peaks FROM waveforms WHERE path = ?",
+                                  (file_path,)).fetchone()
+        if row is None or row[0] != stats.st_size or row[1] != stats.st_mtime_ns:
+            return None
+        return row[2]
+
+    def put_waveform(self, file_path, peaks):
+        stats = os.stat(file_path)
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO waveforms VALUES (?, ?, ?, ?)",
+                            (file_path, stats.st_size, stats.st_mtime_ns, peaks))
+
+    def rename(self, moves):
+        """Move the records of renamed files ({old: new}) to their new paths"""
+        with self.lock:
+            for table in ("tracks", "library", "integrity", "waveforms"):
+                self.db.executemany(f"UPDATE OR REPLACE {table} SET path = ? WHERE path = ?",
+                                    [(new, old) for old, new in moves.items()])
+
+    def get_signature(self, playlist_path):
+        with self.lock:
+            row = self.db.execute("SELECT signature FROM playlists WHERE path = ?",
+                                  (playlist_path,)).fetchone()
+        return row[0] if row else None
+
+    def set_signature(self, playlist_path, signature):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO playlists VALUES (?, ?)", (playlist_path, signature))
+
+    def commit(self):
+        with self.lock:
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.commit()
+            self.db.close()
@@ -0,0 +1,202 @@
+# mp3_frames.py
+import struct
+import numpy as np
+
+class FrameHeader:
+    """Decoded MPEG audio Layer III frame header"""
+    def __init__(self, raw, version, protected, bitrate, sample_rate, padding, channel_mode):
+        self.raw = raw
+        self.version = version
+        self.protected = protected
+        self.bitrate = bitrate
+        self.sample_rate = sample_rate
+        self.padding = padding
+        self.channel_mode = channel_mode
+        self.channels = 1 if channel_mode == 3 else 2
+        if version == 1:
+            self.samples = 1152
+            self.length = 144000 * bitrate // sample_rate + padding
+            self.side_info_size = 17 if self.channels == 1 else 32
+        else:
+            self.samples = 576
+            self.length = 72000 * bitrate // sample_rate + padding
+            self.side_info_size = 9 if self.channels == 1 else 17
+
+    def matches(self, other):
+        """True if both frames belong to the same stream layout"""
+        return (self.version == other.version and self.sample_rate == other.sample_rate
+                and self.channels == other.channels)
+
+
+class Mp3Frames:
+    BITRATES = {
+        1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+    }
+    SAMPLE_RATES = {
+        1: [44100, 48000, 32000],
+        2: [22050, 24000, 16000],
+        2.5: [11025, 12000, 8000]
+    }
+    VERSIONS = {0: 2.5, 2: 2, 3: 1}
+    ENCODER_DELAY = 576  # LAME encoder delay in samples
+
+    @staticmethod
+    def parse_header(data, offset=0):
+        """Parse a Layer III frame header at offset, or return None"""
+        if offset + 4 > len(data):
+            return None
+        b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+        if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+            return None
+        version = Mp3Frames.VERSIONS.get((b1 >> 3) & 0x03)
+        if version is None or ((b1 >> 1) & 0x03) != 1:
+            return None
+        bitrate_index = b2 >> 4
+        rate_index = (b2 >> 2) & 0x03
+        if bitrate_index in (0, 15) or rate_index == 3:
+            return None
+        bitrate = Mp3Frames.BITRATES[1 if version == 1 else 2][bitrate_index]
+        sample_rate = Mp3Frames.SAMPLE_RATES[version][rate_index]
+        return FrameHeader(bytes(data[offset:offset + 4]), version, not (b1 & 0x01),
+                           bitrate, sample_rate, (b2 >> 1) & 0x01, b3 >> 6)
+
+    @staticmethod
+    def skip_id3v2(data, offset=0):
+        """Return the offset just past any ID3v2 tags at offset"""
+        while len(data) >= offset + 10 and data[offset:offset + 3] == b'ID3':
+            size = 0
+            for byte in data[offset + 6:offset + 10]:
+                size = (size << 7) | (byte & 0x7F)
+            footer = 10 if data[offset + 5] & 0x10 else 0
+            offset += 10 + size + footer
+        return offset
+
+    @staticmethod
+    def find_sync(data, offset=0):
+        """Find the next offset where two consecutive valid frames start"""
+        while True:
+            offset = data.find(b'\xff', offset)
+            if offset < 0:
+                return -1
+            header = Mp3Frames.parse_header(data, offset)
+            if header:
+                following = Mp3Frames.parse_header(data, offset + header.length)
+                if following and following.matches(header):
+                    return offset
+                if offset + header.length == len(data):
+                    return offset
+            offset += 1
+
+    @staticmethod
+    def iter_frames(data, offset=0):
+        """Yield (offset, header) for each frame, resyncing over garbage"""
+        offset = Mp3Frames.skip_id3v2(data, offset)
+        while offset < len(data):
+            header = Mp3Frames.parse_header(data, offset)
+            if header is None or offset + header.length > len(data):
+                offset = Mp3Frames.find_sync(data, offset + 1)
+                if offset < 0:
+                    return
+                continue
+            yield offset, header
+            offset += header.length
+
+    @staticmethod
+    def is_info_frame(data, offset, header):
+        """True if the frame carries a Xing/Info header instead of audio"""
+        start = offset + 4 + (2 if header.protected else 0) + header.side_info_size
+        return bytes(data[start:start + 4]) in (b'Xing', b'Info')
+
+    _crc_table = None
+
+    @staticmethod
+    def crc_table():
+        if Mp3Frames._crc_table is None:
+            table = []
+            for byte in range(256):
+                crc = byte
+                for _ in range(8):
+                    crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+                table.append(crc)
+            Mp3Frames._crc_table = np.array(table, dtype=np.uint16)
+        return Mp3Frames._crc_table
+
+    _word_table = None
+
+    @staticmethod
+    def word_table():
+        """CRC register after two bytes, indexed by the register XOR the two
+        bytes read as a little-endian word"""
+        if Mp3Frames._word_table is None:
+            table = Mp3Frames.crc_table()
+            crcs = np.arange(65536, dtype=np.uint32).astype(np.uint16)
+            for _ in range(2):
+                crcs = (crcs >> 8) ^ table[crcs & 0xFF]
+            Mp3Frames._word_table = crcs
+        return Mp3Frames._word_table
+
+    @staticmethod
+    def lame_crc16(data, crc=0):
+        """CRC-16 (polynomial 0x8005, reflected) as used by the LAME tag"""
+        table = Mp3Frames.crc_table()
+        data = np.frombuffer(data, dtype=np.uint8)
+        block = max(1024, int(len(data) ** 0.5)) & ~1
+        count = len(data) // block
+        if count > 1:
+            # The CRC is linear, so checksum all blocks side by side, two
+            # bytes a step, and fold them together with a precomputed
+            # "append block" shift
+            words = Mp3Frames.word_table()
+            columns = data[:count * block].view('<u2').reshape(count, block // 2).T.copy()
+            crcs = np.zeros(count, dtype=np.uint16)
+            crcs[0] = crc
+            for column in columns:
+                crcs = words[crcs ^ column]
+            shift = np.arange(256, dtype=np.uint16)
+            shift = np.concatenate([shift, shift << 8])
+            for _ in range(block // 2):
+                shift = words[shift]
+            low, high = shift[:256].tolist(), shift[256:].tolist()
+            crc = 0
+            for value in crcs.tolist():
+                crc = low[crc & 0xFF] ^ high[crc >> 8] ^ value
+            data = data[count * block:]
+        table = table.tolist()
+        for byte in data.tolist():
+            crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+        return crc
+
+    @staticmethod
+    def frame_length(version, bitrate, sample_rate):
+        """Length of an unpadded frame in bytes"""
+        return (144000 if version == 1 else 72000) * bitrate // sample_rate
+
+    @staticmethod
+    def build_info_frame(template, frame_count, stream_bytes, delay, padding, music_crc):
+        """Build a CBR Xing/Info + LAME tag frame matching the template header"""
+        raw = bytearray(template.raw)
+        raw[1] |= 0x01   # No CRC
+        raw[2] &= ~0x02  # No padding
+        header = Mp3Frames.parse_header(raw)
+        frame = bytearray(header.length)
+        frame[0:4] = raw
+        offset = 4 + header.side_info_size
+
+        toc = bytes(min(255, i * 256 // 100) for i in range(100))
+        frame[offset:offset + 120] = (b'Info' + struct.pack('>III', 0x0F, frame_count, stream_bytes)
+                                      + toc + struct.pack('>I', 0))
+        offset += 120
+
+        lame = bytearray(36)
+        lame[0:9] = b'LAME3.100'
+        lame[9] = 0x01  # Tag revision 0, CBR
+        lame[20] = min(255, header.bitrate)
+        delay = max(0, min(delay, 0xFFF))
+        padding = max(0, min(padding, 0xFFF))
+        lame[21:24] = bytes([delay >> 4, ((delay & 0x0F) << 4) | (padding >> 8), padding & 0xFF])
+        struct.pack_into('>IH', lame, 28, stream_bytes, music_crc)
+        frame[offset:offset + 34] = lame[:34]
+        crc = Mp3Frames.lame_crc16(frame[:offset + 34])
+        struct.pack_into('>H', frame, offset + 34, crc)
+        return bytes(frame)
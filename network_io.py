@@ -0,0 +1,153 @@
+# network_io.py
+import io
+import os
+import threading
+from collections import OrderedDict
+from config import ScanSettings
+
+class NetworkIO:
+    """Decides which paths get the high-latency I/O strategy. The mode comes
+    from ScanSettings.ENV_VAR or set_mode(); in auto mode a path is high
+    latency when its mount (from /proc/mounts) is a network filesystem."""
+    mode = os.environ.get(ScanSettings.ENV_VAR, ScanSettings.MODE_AUTO)
+    MOUNTS_PATH = '/proc/mounts'
+    mounts = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def set_mode(mode):
+        if mode not in ScanSettings.MODES.values():
+            raise ValueError(f"Unknown I/O mode: {mode}")
+        NetworkIO.mode = mode
+
+    @staticmethod
+    def load_mounts():
+        """[(mount point, filesystem type)], longest mount point first"""
+        mounts = []
+        try:
+            with open(NetworkIO.MOUNTS_PATH, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 3:
+                        # Spaces in mount points are escaped as \040
+                        mounts.append((fields[1].replace('\\040', ' '), fields[2]))
+        except OSError:
+            pass
+        mounts.sort(key=lambda mount: len(mount[0]), reverse=True)
+        return mounts
+
+    @staticmethod
+    def filesystem_type(path):
+        """Filesystem type of the mount holding path, or None if unknown"""
+        with NetworkIO.lock:
+            if NetworkIO.mounts is None:
+                NetworkIO.mounts = NetworkIO.load_mounts()
+        path = os.path.abspath(path)
+        for mount_point, fs_type in NetworkIO.mounts:
+            if path == mount_point or path.startswith(mount_point.rstrip('/') + '/'):
+                return fs_type
+        return None
+
+    @staticmethod
+    def is_high_latency(path):
+        if NetworkIO.mode == ScanSettings.MODE_NETWORK:
+            return True
+        if NetworkIO.mode == ScanSettings.MODE_LOCAL or not path:
+            return False
+        return NetworkIO.filesystem_type(path) in ScanSettings.NETWORK_FILESYSTEMS
+
+
+class BlockReader(io.RawIOBase):
+    """Read-only file that fetches whole aligned blocks and keeps the last
+    few, so a parser's many small reads and seeks become a handful of large
+    reads. Adjacent missing blocks are fetched with a single read."""
+    MAX_BLOCKS = 8
+
+    def __init__(self, path, block_size=ScanSettings.READ_BLOCK):
+        super().__init__()
+        self.file = open(path, 'rb', buffering=0)
+        self.block_size = block_size
+        self.blocks = OrderedDict()
+        self.position = 0
+        self.size = None
+
+    @property
+    def raw(self):
+        # Parsers that bypass buffering get the same block cache
+        return self
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            self.position = offset
+        elif whence == os.SEEK_CUR:
+            self.position += offset
+        else:
+            if self.size is None:
+                self.size = os.fstat(self.file.fileno()).st_size
+            self.position = self.size + offset
+        if self.position < 0:
+            raise OSError("Negative seek position")
+        return self.position
+
+    def fetch(self, first, last):
+        """Load blocks first..last that aren't cached, in as few reads as possible"""
+        index = first
+        while index <= last:
+            if index in self.blocks:
+                self.blocks.move_to_end(index)
+                index += 1
+                continue
+            end = index
+            while end + 1 <= last and end + 1 not in self.blocks:
+                end += 1
+            self.file.seek(index * self.block_size)
+            data = self.file.read((end - index + 1) * self.block_size) or b''
+            for block in range(index, end + 1):
+                start = (block - index) * self.block_size
+                self.blocks[block] = data[start:start + self.block_size]
+            index = end + 1
+        while len(self.blocks) > max(self.MAX_BLOCKS, last - first + 1):
+            self.blocks.popitem(last=False)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            if self.size is None:
+                self.size = os.fstat(self.file.fileno()).st_size
+            size = max(0, self.size - self.position)
+        if size == 0:
+            return b''
+        first = self.position // self.block_size
+        last = (self.position + size - 1) // self.block_size
+        self.fetch(first, last)
+        parts = []
+        for block in range(first, last + 1):
+            data = self.blocks.get(block, b'')
+            start = self.position - block * self.block_size if block == first else 0
+            parts.append(data[start:start + size - sum(len(part) for part in parts)])
+            if len(data) < self.block_size:
+                break  # end of file
+        data = b''.join(parts)
+        self.position += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        if not self.closed:
+            self.file.close()
+        super().close()
@@ -1,63 +1,209 @@
 # playlist_writer.py
+import html
 import os
-from mutagen.id3 import ID3
+import re
 from pydub import AudioSegment
+from tracing import Tracer
+from audio_metadata import AudioMetadata
+from config import PlaylistFormats
+from file_manager import FileManager
 
 class PlaylistWriter:
+    PLS_FIELD = re.compile(r'^(File|Title|Length)(\d+)=([^\r\n]*)', re.MULTILINE)
+
+    @staticmethod
+    def format_for_path(save_path):
+        """Name of the PlaylistFormats entry matching save_path's extension"""
+        ext = os.path.splitext(save_path)[1].lower()
+        for format_name, playlist_info in PlaylistFormats.FORMATS.items():
+            if playlist_info["ext"] == ext:
+                return format_name
+        return None
+
+    @staticmethod
+    def write_playlist(save_path, files, format_name, track_info=None):
+        """Write files as the playlist type named in PlaylistFormats.FORMATS.
+        The playlist is written to a temporary file and renamed over save_path,
+        so readers never see a partial playlist. track_info(file) returns
+        (duration, title) and defaults to get_track_info."""
+        playlist_info = PlaylistFormats.FORMATS[format_name]
+        temp_path = FileManager.temp_path(save_path)
+        try:
+            if playlist_info["ext"] in [".m3u", ".m3u8"]:
+                PlaylistWriter.create_m3u_playlist(temp_path, files, playlist_info["extended"], track_info)
+            elif playlist_info["ext"] == ".pls":
+                PlaylistWriter.create_pls_playlist(temp_path, files, track_info)
+            elif playlist_info["ext"] == ".wpl":
+                PlaylistWriter.create_wpl_playlist(temp_path, files)
+            os.replace(temp_path, save_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @staticmethod
+    def needs_track_info(format_name):
+        """True if the format stores durations and titles"""
+        playlist_info = PlaylistFormats.FORMATS[format_name]
+        return playlist_info.get("extended", False) or playlist_info["ext"] == ".pls"
+
+    @staticmethod
+    def relative_paths(files, base_dir):
+        """os.path.relpath of each file, without its cost for the common case
+        of normalized absolute paths under base_dir"""
+        prefix = os.path.abspath(base_dir).rstrip(os.sep) + os.sep
+        dot, double = os.sep + '.', os.sep * 2
+        return [file[len(prefix):] if file.startswith(prefix) and dot not in file and double not in file
+                else os.path.relpath(file, base_dir) for file in files]
+
+    @staticmethod
+    @Tracer.traced("playlist.sync")
+    def sync_playlist(save_path, files, format_name, track_info=None):
+        """Bring an existing playlist up to date with files. Durations and
+        titles already in it are reused for the tracks it lists, so only new
+        tracks are probed; nothing is written when it already lists exactly
+        files, otherwise it is replaced atomically as by write_playlist.
+        Returns (tracks added, tracks removed)."""
+        track_info = track_info or PlaylistWriter.get_track_info
+        existing = []
+        if os.path.exists(save_path):
+            try:
+                existing = PlaylistWriter.read_playlist(save_path, format_name)
+            except (OSError, ValueError) as e:
+                print(f"Error reading playlist {save_path}: {e}")
+        # Entries are compared as written, relative to the playlist
+        known = {entry: info for entry, info in existing if info is not None}
+        old_entries = [entry for entry, _ in existing]
+        new_entries = PlaylistWriter.relative_paths(files, os.path.dirname(save_path))
+
+        needs_info = PlaylistWriter.needs_track_info(format_name)
+        if old_entries == new_entries and existing and not (needs_info and len(known) < len(existing)):
+            return 0, 0
+
+        entry_for = dict(zip(files, new_entries))
+
+        def cached_track_info(file):
+            info = known.get(entry_for[file])
+            return info if info is not None else track_info(file)
+
+        PlaylistWriter.write_playlist(save_path, files, format_name, cached_track_info)
+        old_set, new_set = set(old_entries), set(new_entries)
+        return len(new_set - old_set), len(old_set - new_set)
+
     @staticmethod
-    def create_m3u_playlist(save_path, files, extended=False):
+    @Tracer.traced("playlist.read")
+    def read_playlist(save_path, format_name):
+        """[(entry, (duration, title) or None)] of a playlist written in the
+        PlaylistFormats type format_name. Entries are paths as written,
+        relative to the playlist's folder."""
+        ext = PlaylistFormats.FORMATS[format_name]["ext"]
+        with open(save_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        entries = []
+        if ext in [".m3u", ".m3u8"]:
+            info = None
+            for line in text.splitlines():
+                if line.startswith('#EXTINF:'):
+                    duration, _, title = line[len('#EXTINF:'):].partition(',')
+                    try:
+                        info = (int(float(duration)), title)
+                    except ValueError:
+                        info = None
+                elif line and not line.startswith('#'):
+                    entries.append((line, info))
+                    info = None
+        elif ext == ".pls":
+            fields = {'File': {}, 'Title': {}, 'Length': {}}
+            for key, number, value in PlaylistWriter.PLS_FIELD.findall(text):
+                fields[key][int(number)] = value
+            i = 1
+            while i in fields['File']:
+                info = None
+                if i in fields['Title'] and i in fields['Length']:
+                    try:
+                        info = (int(float(fields['Length'][i])), fields['Title'][i])
+                    except ValueError:
+                        pass
+                entries.append((fields['File'][i], info))
+                i += 1
+        elif ext == ".wpl":
+            for match in re.finditer(r'<media src="([^"]*)"', text):
+                entries.append((html.unescape(match.group(1)), None))
+        return entries
+
+    @staticmethod
+    def get_track_info(file):
+        """(duration in seconds, title) for playlist entries, from a header probe"""
+        return PlaylistWriter.track_info_from_probe(file, AudioMetadata.probe(file))
+
+    @staticmethod
+    def track_info_from_probe(file, info):
+        """(duration in seconds, title) from an AudioMetadata.probe result or
+        library record; the file is only decoded when its header gives no length"""
+        duration = info.get('duration') or 0
+        duration = int(duration) if duration else PlaylistWriter.get_audio_duration(file)
+        return duration, info.get('tags', {}).get('Title') or os.path.basename(file)
+
+    @staticmethod
+    @Tracer.traced("playlist.m3u")
+    def create_m3u_playlist(save_path, files, extended=False, track_info=None):
+        track_info = track_info or PlaylistWriter.get_track_info
+        base_dir = os.path.dirname(save_path)
         with open(save_path, 'w', encoding='utf-8') as f:
             f.write("#EXTM3U\n")
-            for file in files:
+            for file, entry in zip(files, PlaylistWriter.relative_paths(files, base_dir)):
                 if extended:
-                    duration = PlaylistWriter.get_audio_duration(file)
-                    title = os.path.basename(file)
-                    # Try to get title from ID3 tags
-                    try:
-                        tags = ID3(file)
-                        if 'TIT2' in tags:
-                            title = str(tags['TIT2'])
-                    except:
-                        pass
+                    duration, title = track_info(file)
                     f.write(f"#EXTINF:{duration},{title}\n")
-                f.write(os.path.relpath(file, os.path.dirname(save_path)) + "\n")
+                f.write(entry + "\n")
 
     @staticmethod
-    def create_pls_playlist(save_path, files):
+    @Tracer.traced("playlist.pls")
+    def create_pls_playlist(save_path, files, track_info=None):
+        track_info = track_info or PlaylistWriter.get_track_info
+        base_dir = os.path.dirname(save_path)
         with open(save_path, 'w', encoding='utf-8') as f:
             f.write("[playlist]\n")
             f.write(f"NumberOfEntries={len(files)}\n\n")
-            for i, file in enumerate(files, 1):
-                # Try to get title from ID3 tags
-                title = os.path.basename(file)
-                try:
-                    tags = ID3(file)
-                    if 'TIT2' in tags:
-                        title = str(tags['TIT2'])
-                except:
-                    pass
-                
-                f.write(f"File{i}={os.path.relpath(file, os.path.dirname(save_path))}\n")
+            entries = PlaylistWriter.relative_paths(files, base_dir)
+            for i, (file, entry) in enumerate(zip(files, entries), 1):
+                duration, title = track_info(file)
+                f.write(f"File{i}={entry}\n")
                 f.write(f"Title{i}={title}\n")
-                duration = PlaylistWriter.get_audio_duration(file)
                 f.write(f"Length{i}={duration}\n\n")
             f.write("Version=2\n")
 
     @staticmethod
+    @Tracer.traced("playlist.wpl")
     def create_wpl_playlist(save_path, files):
+        base_dir = os.path.dirname(save_path)
         with open(save_path, 'w', encoding='utf-8') as f:
             f.write('<?wpl version="1.0"?>\n<smil>\n<head>\n')
             f.write('<meta name="Generator" content="Playlist Creator"/>\n')
             f.write('<title>Playlist</title>\n</head>\n<body>\n<seq>\n')
-            for file in files:
-                rel_path = os.path.relpath(file, os.path.dirname(save_path))
+            for rel_path in PlaylistWriter.relative_paths(files, base_dir):
                 f.write(f'<media src="{rel_path}"/>\n')
             f.write('</seq>\n</body>\n</smil>')
 
     @staticmethod
+    @Tracer.traced("playlist.duration")
     def get_audio_duration(file_path):
         try:
             audio = AudioSegment.from_file(file_path)
             return int(len(audio) / 1000)  # Duration in seconds
         except:
             return 0
+
+    @staticmethod
+    @Tracer.traced("playlist.chapters")
+    def create_chapter_m3u_playlist(save_path, audio_path, chapters):
+        """Extended M3U with one entry per chapter of a single file, using
+        start/stop offsets that VLC and compatible players understand"""
+        rel_path = os.path.relpath(audio_path, os.path.dirname(save_path))
+        with open(save_path, 'w', encoding='utf-8') as f:
+            f.write("#EXTM3U\n")
+            for chapter in chapters:
+                duration = int((chapter['end_ms'] - chapter['start_ms']) / 1000)
+                f.write(f"#EXTINF:{duration},{chapter['title']}\n")
+                f.write(f"#EXTVLCOPT:start-time={chapter['start_ms'] / 1000:.3f}\n")
+                f.write(f"#EXTVLCOPT:stop-time={chapter['end_ms'] / 1000:.3f}\n")
+                f.write(rel_path + "\n")
@@ -0,0 +1,145 @@
+# rename_dialog.py
+import os
+from PyQt6.QtCore import Qt, QAbstractTableModel
+from PyQt6.QtGui import QColor
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QFormLayout, QComboBox, QLineEdit, QLabel,
+    QTableView, QHeaderView, QDialogButtonBox)
+from rename_engine import NamePattern, RenameEngine
+from tag_transfer import TagTransfer
+from config import RenameSettings
+
+class RenamePreviewModel(QAbstractTableModel):
+    """File and result of a rename for each file. Results are worked out
+    when a row is first painted, so only rows scrolled into view have their
+    tags read; conflicts between files show up when the rename runs."""
+    HEADERS = ("File", "Result")
+    ERROR_COLOR = QColor("#c0392b")
+
+    def __init__(self, files, parent=None):
+        super().__init__(parent)
+        self.files = files
+        self.pattern = None
+        self.mode = RenameEngine.TO_NAMES
+        self.results = {}
+        self.tags = {}
+
+    def set_pattern(self, pattern, mode):
+        self.beginResetModel()
+        self.pattern = pattern
+        self.mode = mode
+        self.results = {}
+        self.endResetModel()
+
+    def rowCount(self, parent=None):
+        return len(self.files)
+
+    def columnCount(self, parent=None):
+        return len(RenamePreviewModel.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return RenamePreviewModel.HEADERS[section]
+        return None
+
+    def result(self, file_path):
+        """(text, is error) for one file, cached until the pattern changes"""
+        if file_path not in self.results:
+            try:
+                if self.pattern is None:
+                    raise ValueError("")
+                if self.mode == RenameEngine.TO_TAGS:
+                    values = self.pattern.parse(file_path)
+                    if values is None:
+                        raise ValueError("Name doesn't match the pattern")
+                    TagTransfer.desired_tags(values, ".jsonl")
+                    text = "; ".join(f"{tag_name}: {value}" for tag_name, value in values.items())
+                else:
+                    if file_path not in self.tags:
+                        self.tags[file_path] = TagTransfer.read_values(file_path)[0]
+                    target = self.pattern.target(file_path, self.tags[file_path])
+                    text = (os.path.relpath(target, self.pattern.base_dir(file_path))
+                            if target != file_path else "(unchanged)")
+                self.results[file_path] = (text, False)
+            except (ValueError, OSError) as e:
+                self.results[file_path] = (str(e), True)
+        return self.results[file_path]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        file_path = self.files[index.row()]
+        if index.column() == 0:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return os.path.basename(file_path)
+            if role == Qt.ItemDataRole.ToolTipRole:
+                return file_path
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return self.result(file_path)[0]
+        if role == Qt.ItemDataRole.ForegroundRole and self.result(file_path)[1]:
+            return RenamePreviewModel.ERROR_COLOR
+        return None
+
+
+class RenameDialog(QDialog):
+    """Rename files from their tags or tag them from their names"""
+
+    def __init__(self, files, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Rename from Pattern")
+        self.setMinimumSize(760, 480)
+        self.files = files
+        self.setup_ui()
+        self.update_preview()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        form_layout = QFormLayout()
+
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(RenameSettings.MODES.keys())
+        self.mode_combo.currentTextChanged.connect(self.update_preview)
+        form_layout.addRow("Direction:", self.mode_combo)
+
+        self.pattern_edit = QLineEdit(RenameSettings.DEFAULT_PATTERN)
+        self.pattern_edit.setToolTip(NamePattern.__doc__)
+        self.pattern_edit.textChanged.connect(self.update_preview)
+        form_layout.addRow("Pattern:", self.pattern_edit)
+        layout.addLayout(form_layout)
+
+        self.model = RenamePreviewModel(self.files, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setWordWrap(False)
+        self.table.verticalHeader().hide()
+        # Fixed row heights and column widths keep the view from asking every row
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        self.message_label = QLabel()
+        self.message_label.setWordWrap(True)
+        layout.addWidget(self.message_label)
+
+        self.button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Apply |
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        self.button_box.button(QDialogButtonBox.StandardButton.Apply).clicked.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+
+    def update_preview(self):
+        mode = RenameSettings.MODES[self.mode_combo.currentText()]
+        try:
+            pattern = NamePattern(self.pattern_edit.text())
+            self.message_label.setText(f"{len(self.files)} files. An undo record is kept for every run.")
+        except ValueError as e:
+            pattern = None
+            self.message_label.setText(str(e))
+        self.model.set_pattern(pattern, mode)
+        self.button_box.button(QDialogButtonBox.StandardButton.Apply).setEnabled(pattern is not None)
+
+    def get_options(self):
+        return {
+            'pattern': self.pattern_edit.text(),
+            'mode': RenameSettings.MODES[self.mode_combo.currentText()]
+        }
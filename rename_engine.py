@@ -0,0 +1,449 @@
+# rename_engine.py
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QThread, pyqtSignal
+from art_export import ArtTemplate
+from metadata_cache import MetadataCache
+from tag_definitions import TagDefinitions
+from tag_transfer import TagTransfer
+from tag_writer import TagWriter
+from config import RenameSettings, WatchSettings
+from tracing import Tracer
+
+class NamePattern:
+    """A file name pattern such as "%track% - %artist% - %title%", compiled
+    once into a regex that reads tags from paths and a list of parts that
+    builds paths from tags.
+
+    Fields are tag names in lowercase with underscores (%album_artist%), and
+    %ignore% matches text that is read but not kept. A "/" in the pattern
+    spans folders: "%artist%/%album%/%track% - %title%" reads the last three
+    path components, and names files two folders above where they are.
+    """
+    FIELD = re.compile(r'%(\w+)%')
+    IGNORE = 'ignore'
+    NUMBER_TAGS = ('Track', 'Disc')
+
+    def __init__(self, pattern):
+        self.pattern = pattern.strip().replace('\\', '/').strip('/')
+        if not self.pattern:
+            raise ValueError("Empty pattern")
+        fields = {name.lower().replace(' ', '_'): name for name in TagDefinitions.TAG_FRAMES}
+        self.depth = self.pattern.count('/') + 1
+        self.parts = []
+        self.groups = {}
+        regex = []
+        position = 0
+        for match in NamePattern.FIELD.finditer(self.pattern):
+            literal = self.pattern[position:match.start()]
+            self.parts.append((literal, None))
+            regex.append(re.escape(literal))
+            position = match.end()
+            field = match.group(1).lower()
+            if field == NamePattern.IGNORE:
+                self.parts.append(('', NamePattern.IGNORE))
+                regex.append('[^/]*?')
+                continue
+            if field not in fields:
+                raise ValueError(f"Unknown field %{match.group(1)}%")
+            tag_name = fields[field]
+            if tag_name in self.groups.values():
+                raise ValueError(f"%{field}% appears more than once")
+            group = f"g{len(self.groups)}"
+            self.groups[group] = tag_name
+            self.parts.append(('', tag_name))
+            regex.append(f"(?P<{group}>\\d+)" if tag_name in NamePattern.NUMBER_TAGS else f"(?P<{group}>[^/]+?)")
+        literal = self.pattern[position:]
+        self.parts.append((literal, None))
+        regex.append(re.escape(literal))
+        if not self.groups:
+            raise ValueError("The pattern has no fields")
+        self.regex = re.compile('^' + ''.join(regex) + '$')
+
+    @property
+    def tag_names(self):
+        return list(self.groups.values())
+
+    def parse(self, file_path):
+        """{tag_name: value} read from a path, or None if it doesn't match"""
+        components = os.path.splitext(file_path)[0].replace('\\', '/').split('/')
+        if len(components) < self.depth:
+            return None
+        match = self.regex.match('/'.join(components[-self.depth:]))
+        if match is None:
+            return None
+        values = {}
+        for group, tag_name in self.groups.items():
+            value = match.group(group).strip()
+            values[tag_name] = str(int(value)) if tag_name in NamePattern.NUMBER_TAGS else value
+        return values
+
+    def format(self, tags):
+        """Relative path (without extension) for {tag_name: [values]};
+        raises ValueError if a tag the pattern needs is missing"""
+        text = []
+        for literal, tag_name in self.parts:
+            if tag_name is None:
+                text.append(literal)
+                continue
+            if tag_name == NamePattern.IGNORE:
+                raise ValueError("%ignore% can only be used to read tags")
+            values = [value for value in tags.get(tag_name, []) if value.strip()]
+            if not values:
+                raise ValueError(f"No {tag_name} tag")
+            if tag_name in NamePattern.NUMBER_TAGS:
+                number = values[0].split('/')[0].strip()
+                if not number.isdigit():
+                    raise ValueError(f"Invalid {tag_name}: {values[0]!r}")
+                value = f"{int(number):02d}" if tag_name == 'Track' else str(int(number))
+            else:
+                value = ", ".join(values)
+            # Separators in values never create folders
+            text.append(ArtTemplate.sanitize(value))
+        return os.path.join(*[part for part in ''.join(text).split('/') if part])
+
+    def base_dir(self, file_path):
+        """Folder new names start from: a pattern spanning n folders replaces
+        the file's last n - 1 folders"""
+        base = os.path.dirname(file_path)
+        for _ in range(self.depth - 1):
+            base = os.path.dirname(base)
+        return base
+
+    def target(self, file_path, tags):
+        """New path of a file named from its tags"""
+        return os.path.join(self.base_dir(file_path), self.format(tags) + os.path.splitext(file_path)[1])
+
+
+class RenameEngine:
+    """Plans, applies and undoes pattern renames and tag writes. Every run
+    writes an undo manifest (JSON) holding the completed renames and the
+    previous values of every tag it changed."""
+    TO_NAMES = "names"
+    TO_TAGS = "tags"
+
+    @staticmethod
+    def find_conflicts(moves):
+        """{source: reason} for moves ({source: target}) that can't be made:
+        two files given the same name, or a name that is already taken.
+        Targets held by other files of the selection count as taken too;
+        renames are never chained or swapped."""
+        conflicts = {}
+        by_target = {}
+        for source, target in moves.items():
+            by_target.setdefault(os.path.normcase(target), []).append(source)
+        for sources in by_target.values():
+            if len(sources) > 1:
+                for source in sources:
+                    others = ", ".join(os.path.basename(other) for other in sources if other != source)
+                    conflicts[source] = f"Same new name as {others}"
+        for source, target in moves.items():
+            if source in conflicts:
+                continue
+            # A change of case alone is a rename of the same file
+            if os.path.normcase(target) != os.path.normcase(source) and os.path.lexists(target):
+                conflicts[source] = f"{os.path.basename(target)} already exists"
+        return conflicts
+
+    @staticmethod
+    def plan(pattern, files, mode, read_tags, map_function=map):
+        """(moves {source: target}, tag changes {file: {tag: [values]}},
+        previous values {file: {tag: [values]}}, errors {file: reason}).
+        read_tags(file) returns {tag_name: [values]}; map_function lets the
+        reads run on a pool."""
+        moves = {}
+        changes = {}
+        previous = {}
+        errors = {}
+
+        def read(file_path):
+            try:
+                return read_tags(file_path), None
+            except Exception as e:
+                return None, str(e)
+
+        for file_path, (tags, error) in zip(files, map_function(read, files)):
+            if error is not None:
+                errors[file_path] = error
+                continue
+            try:
+                if mode == RenameEngine.TO_NAMES:
+                    target = pattern.target(file_path, tags)
+                    if target != file_path:
+                        moves[file_path] = target
+                    continue
+                values = pattern.parse(file_path)
+                if values is None:
+                    raise ValueError("Name doesn't match the pattern")
+                desired = TagTransfer.desired_tags(values, ".jsonl")
+                for tag_name in NamePattern.NUMBER_TAGS:
+                    # A name's "03" doesn't replace a tag's "3/12"
+                    current = tags.get(tag_name, [''])[0].split('/')[0].strip()
+                    if tag_name in desired and current.isdigit() and int(current) == int(values[tag_name]):
+                        desired[tag_name] = tags[tag_name]
+                diff = TagTransfer.diff(tags, desired)
+                if diff:
+                    changes[file_path] = diff
+                    previous[file_path] = {tag_name: tags.get(tag_name, []) for tag_name in diff}
+            except ValueError as e:
+                errors[file_path] = str(e)
+        errors.update(RenameEngine.find_conflicts(moves))
+        for file_path in errors:
+            moves.pop(file_path, None)
+        return moves, changes, previous, errors
+
+    @staticmethod
+    def rename(source, target):
+        """Rename a file without ever replacing another one"""
+        if os.path.normcase(target) != os.path.normcase(source) and os.path.lexists(target):
+            raise FileExistsError(f"{os.path.basename(target)} already exists")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.rename(source, target)
+
+    @staticmethod
+    def file_state(path):
+        """[size, mtime_ns] of a file, or None if it can't be read"""
+        try:
+            stats = os.stat(path)
+        except OSError:
+            return None
+        return [stats.st_size, stats.st_mtime_ns]
+
+    @staticmethod
+    def manifest_path(directory=RenameSettings.UNDO_DIR):
+        return os.path.join(directory, time.strftime("rename-%Y%m%d-%H%M%S") + f"-{os.getpid()}.json")
+
+    @staticmethod
+    def save_manifest(path, manifest):
+        """Write a manifest atomically, so an interrupted run leaves the old one"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def load_manifest(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if not isinstance(manifest, dict) or 'renames' not in manifest or 'tags' not in manifest:
+            raise ValueError(f"Not a rename manifest: {path}")
+        return manifest
+
+    @staticmethod
+    def latest_manifest(directory=RenameSettings.UNDO_DIR):
+        try:
+            names = [name for name in os.listdir(directory) if name.startswith("rename-") and name.endswith(".json")]
+        except OSError:
+            return None
+        if not names:
+            return None
+        return os.path.join(directory, max(names, key=lambda name: os.path.getmtime(os.path.join(directory, name))))
+
+
+class RenameThread(QThread):
+    """Rename files from their tags, or tag them from their names, following
+    a NamePattern. Tags are read and the work applied on a thread pool; the
+    undo manifest is written before anything changes and rewritten with
+    what actually completed. renamed ({old: new}) and retagged (paths) are
+    filled in for the caller to update its views without a rescan."""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, files, pattern, mode, dry_run=False, manifest_path=None,
+                 workers=RenameSettings.WORKERS, db_path=WatchSettings.METADATA_DB):
+        super().__init__()
+        self.files = files
+        self.pattern = pattern
+        self.mode = mode
+        self.dry_run = dry_run
+        self.manifest_path = manifest_path or RenameEngine.manifest_path()
+        self.workers = workers
+        self.db_path = db_path
+        self.renamed = {}
+        self.retagged = []
+        self.errors = {}
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    @staticmethod
+    def read_tags(file_path):
+        return TagTransfer.read_values(file_path)[0]
+
+    @Tracer.traced("rename.run")
+    def run(self):
+        try:
+            if self.mode not in (RenameEngine.TO_NAMES, RenameEngine.TO_TAGS):
+                raise ValueError(f"Unknown rename mode: {self.mode}")
+            pattern = NamePattern(self.pattern)
+            self.status.emit(f"Reading {len(self.files)} files...")
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                moves, changes, previous, self.errors = RenameEngine.plan(
+                    pattern, self.files, self.mode, RenameThread.read_tags, pool.map)
+                self.progress.emit(20)
+                if self.cancelled:
+                    self.finished.emit(False, "Cancelled")
+                    return
+                if self.dry_run:
+                    self.finish(moves, changes, dry_run=True)
+                    return
+                manifest = {'pattern': self.pattern, 'mode': self.mode, 'created': time.time(),
+                            'renames': sorted(moves.items()), 'tags': previous}
+                if moves or changes:
+                    RenameEngine.save_manifest(self.manifest_path, manifest)
+                self.apply(pool, moves, changes)
+            manifest['renames'] = sorted(self.renamed.items())
+            manifest['tags'] = {file_path: previous[file_path] for file_path in self.retagged}
+            # What each changed file looks like now, so undo can leave files
+            # edited since alone
+            manifest['states'] = {path: RenameEngine.file_state(path)
+                                  for path in list(self.renamed.values()) + self.retagged}
+            if moves or changes:
+                RenameEngine.save_manifest(self.manifest_path, manifest)
+            if self.renamed:
+                self.update_cache()
+        except Exception as e:
+            print(f"Error renaming files: {e}")
+            self.finished.emit(False, str(e))
+            return
+        self.finish(self.renamed, self.retagged)
+
+    def apply(self, pool, moves, changes):
+        def rename(item):
+            if self.cancelled:
+                return item, "Cancelled"
+            try:
+                RenameEngine.rename(*item)
+                return item, None
+            except OSError as e:
+                return item, str(e)
+
+        def write_tags(item):
+            if self.cancelled:
+                return item, "Cancelled"
+            try:
+                TagWriter.set_tag_values(*item)
+                return item, None
+            except Exception as e:
+                return item, str(e)
+
+        work = list(moves.items()) if moves else list(changes.items())
+        function = rename if moves else write_tags
+        self.status.emit(f"{'Renaming' if moves else 'Tagging'} {len(work)} files...")
+        for i, ((file_path, value), error) in enumerate(pool.map(function, work)):
+            if error == "Cancelled":
+                pass
+            elif error:
+                self.errors[file_path] = error
+            elif moves:
+                self.renamed[file_path] = value
+            else:
+                self.retagged.append(file_path)
+            self.progress.emit(20 + int((i + 1) / len(work) * 80))
+
+    def update_cache(self):
+        """Carry cached metadata over to the new paths; renames keep size and
+        mtime, so nothing needs probing again"""
+        try:
+            cache = MetadataCache(self.db_path)
+            try:
+                cache.rename(self.renamed)
+                cache.commit()
+            finally:
+                cache.close()
+        except Exception as e:
+            print(f"Error updating metadata cache: {e}")
+
+    def finish(self, renamed, retagged, dry_run=False):
+        count = len(renamed) if self.mode == RenameEngine.TO_NAMES else len(retagged)
+        verb = "renamed" if self.mode == RenameEngine.TO_NAMES else "tagged"
+        message = f"{count} files {'would be ' if dry_run else ''}{verb}"
+        if self.cancelled:
+            message = "Cancelled: " + message
+        if self.errors:
+            message += f", {len(self.errors)} skipped:\n" + "\n".join(
+                f"{os.path.basename(path)}: {error}" for path, error in sorted(self.errors.items()))
+        self.finished.emit(not self.errors and not self.cancelled, message)
+
+
+class RenameUndoThread(QThread):
+    """Reverse a RenameThread run from its manifest: files are renamed back
+    and changed tags restored. Files whose size or modification time changed
+    since the run are skipped."""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, manifest_path, workers=RenameSettings.WORKERS, db_path=WatchSettings.METADATA_DB):
+        super().__init__()
+        self.manifest_path = manifest_path
+        self.workers = workers
+        self.db_path = db_path
+        self.renamed = {}
+        self.retagged = []
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        errors = []
+        try:
+            manifest = RenameEngine.load_manifest(self.manifest_path)
+            moves = [(new, old) for old, new in manifest['renames']]
+            restores = list(manifest['tags'].items())
+            # Older manifests have no states; their files can't be checked
+            states = manifest.get('states', {})
+            self.status.emit(f"Undoing {len(moves) + len(restores)} changes...")
+
+            def undo(item):
+                path, value = item
+                if self.cancelled:
+                    return "Cancelled"
+                if not os.path.lexists(path):
+                    return f"{os.path.basename(path)} no longer exists"
+                if path in states and RenameEngine.file_state(path) != states[path]:
+                    return "changed since the run, left as it is"
+                try:
+                    if isinstance(value, dict):
+                        TagWriter.set_tag_values(path, value)
+                    else:
+                        RenameEngine.rename(path, value)
+                    return None
+                except Exception as e:
+                    return str(e)
+
+            work = moves + restores
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for i, ((path, value), error) in enumerate(zip(work, pool.map(undo, work))):
+                    if error:
+                        errors.append(f"{os.path.basename(path)}: {error}")
+                    elif isinstance(value, dict):
+                        self.retagged.append(path)
+                    else:
+                        self.renamed[path] = value
+                    self.progress.emit(int((i + 1) / len(work) * 100))
+            if self.renamed:
+                cache = MetadataCache(self.db_path)
+                try:
+                    cache.rename(self.renamed)
+                    cache.commit()
+                finally:
+                    cache.close()
+            if not errors and not self.cancelled:
+                os.remove(self.manifest_path)
+        except Exception as e:
+            print(f"Error undoing renames: {e}")
+            self.finished.emit(False, str(e))
+            return
+
+        message = f"Restored {len(self.renamed)} names and the tags of {len(self.retagged)} files"
+        if errors:
+            message += "\n\nErrors:\n" + "\n".join(errors)
+        self.finished.emit(not errors and not self.cancelled, message)
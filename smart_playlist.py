@@ -0,0 +1,311 @@
+# smart_playlist.py
+import re
+import time
+from datetime import datetime
+import numpy as np
+from tag_definitions import TagDefinitions
+
+class LibraryIndex:
+    """In-memory track metadata as numpy columns for SmartQuery. Records are
+    MetadataCache.library_record dicts: size, mtime, added, duration,
+    bitrate and tags. Full columns are built on first use and dropped when a
+    record changes; incremental updates build small columns for just the
+    changed tracks instead."""
+    NUMBER_FIELDS = ('duration', 'bitrate', 'mtime', 'added', 'size')
+    NUMBER_PATTERN = re.compile(r'\s*(-?\d+(?:\.\d+)?)')
+    # Text values are wrapped in (and multi-values split by) a separator so
+    # equality can match any one of them exactly. It can't be NUL, which
+    # numpy strips from the end of str arrays and needles.
+    SEPARATOR = '\x1f'
+
+    def __init__(self):
+        self.records = {}
+        self.columns = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, path):
+        return path in self.records
+
+    def put(self, path, record):
+        self.records[path] = record
+        self.columns = {}
+
+    def remove(self, path):
+        if self.records.pop(path, None) is not None:
+            self.columns = {}
+
+    def paths(self):
+        return list(self.records)
+
+    @staticmethod
+    def to_number(text):
+        match = LibraryIndex.NUMBER_PATTERN.match(text or '')
+        return float(match.group(1)) if match else np.nan
+
+    def values(self, field, kind, paths):
+        if field == 'path':
+            return [LibraryIndex.wrap(path) for path in paths]
+        if field in LibraryIndex.NUMBER_FIELDS:
+            return [self.records[path][field] for path in paths]
+        tags = [self.records[path]['tags'].get(field, '') for path in paths]
+        if kind == 'number':
+            # First value of multi-value tags; "3/12" and "2005-06-01" count as 3 and 2005
+            return [LibraryIndex.to_number(value) for value in tags]
+        return [LibraryIndex.wrap(value) for value in tags]
+
+    @staticmethod
+    def wrap(text):
+        """Lowercased text column value; multi-value tags are NUL-joined"""
+        separator = LibraryIndex.SEPARATOR
+        return separator + text.lower().replace('\0', separator) + separator
+
+    def column(self, field, kind, paths=None):
+        """numpy column of a field for paths (default: every track, cached).
+        kind is 'text' (lowercased) or 'number' (NaN when not numeric)."""
+        if paths is None:
+            key = (field, kind)
+            if key not in self.columns:
+                self.columns[key] = self.column(field, kind, self.paths())
+            return self.columns[key]
+        values = self.values(field, kind, paths)
+        if kind == 'number':
+            return np.array(values, dtype=np.float64)
+        return np.array(values, dtype=str) if values else np.array([], dtype=str)
+
+
+class SmartQuery:
+    """Query over tag fields (TagDefinitions.TAG_FRAMES names, lowercase with
+    underscores for spaces) and file attributes, compiled once to a function
+    that returns a boolean mask over LibraryIndex columns:
+
+        genre = House and bpm between 120 and 128 and added within 30d
+        (artist ~ "daft" or album_artist ~ daft) and not duration < 2m
+        genre in (house, techno) and bitrate >= 256 and path !~ /podcasts/
+
+    Operators: = != (any value equals), ~ !~ (contains), < <= > >=,
+    between A and B, in (A, B, ...) and, for mtime and added, within AGE.
+    Text matching ignores case. Numbers may carry a unit: s m h d w for
+    times, kb mb gb for sizes. mtime and added also take YYYY-MM-DD dates.
+    Durations are in seconds, bitrates in kbps. added is when the file
+    arrived on disk (its ctime when first indexed), not when it was indexed.
+    """
+    ATTRIBUTES = ('duration', 'bitrate', 'mtime', 'added', 'size', 'path')
+    TIME_FIELDS = ('mtime', 'added')
+    UNITS = {
+        's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800,
+        'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3
+    }
+    TOKEN_PATTERN = re.compile(r'\s*(?:"((?:[^"\\]|\\.)*)"|(!=|<=|>=|!~|[=~<>(),])|([^\s()=!<>~,"]+))')
+    VALUE_PATTERN = re.compile(r'(-?\d+(?:\.\d+)?)([a-z]*)$')
+    COMPARISONS = {
+        '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal
+    }
+
+    def __init__(self, text):
+        self.text = text
+        self.fields = {name.lower().replace(' ', '_'): name for name in TagDefinitions.TAG_FRAMES}
+        self.fields.update({name: name for name in SmartQuery.ATTRIBUTES})
+        # Queries using "within" change results as time passes
+        self.time_dependent = False
+        self.tokens = SmartQuery.tokenize(text)
+        self.position = 0
+        self.predicate = self.parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError(f"Unexpected '{self.tokens[self.position][1]}' in query")
+
+    def __call__(self, index, paths=None):
+        """Boolean mask over paths (default: every track in index order)"""
+        return self.predicate(index, paths)
+
+    @staticmethod
+    def tokenize(text):
+        """[(kind, value)] where kind is 'string' for quoted text, 'symbol' or 'word'"""
+        tokens = []
+        position = 0
+        text = text.strip()
+        while position < len(text):
+            match = SmartQuery.TOKEN_PATTERN.match(text, position)
+            if not match or match.end() == position:
+                raise ValueError(f"Can't read query at '{text[position:]}'")
+            quoted, symbol, word = match.groups()
+            if quoted is not None:
+                tokens.append(('string', re.sub(r'\\(.)', r'\1', quoted)))
+            elif symbol is not None:
+                tokens.append(('symbol', symbol))
+            else:
+                tokens.append(('word', word))
+            position = match.end()
+        return tokens
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self):
+        if self.position >= len(self.tokens):
+            raise ValueError("Query ends too early")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def accept(self, keyword):
+        kind, value = self.peek()
+        if kind in ('word', 'symbol') and value.lower() == keyword:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, keyword):
+        if not self.accept(keyword):
+            raise ValueError(f"Expected '{keyword}' in query")
+
+    def parse_or(self):
+        terms = [self.parse_and()]
+        while self.accept('or'):
+            terms.append(self.parse_and())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda index, paths: np.logical_or.reduce([term(index, paths) for term in terms])
+
+    def parse_and(self):
+        terms = [self.parse_not()]
+        while self.accept('and'):
+            terms.append(self.parse_not())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda index, paths: np.logical_and.reduce([term(index, paths) for term in terms])
+
+    def parse_not(self):
+        if self.accept('not'):
+            term = self.parse_not()
+            return lambda index, paths: np.logical_not(term(index, paths))
+        if self.accept('('):
+            term = self.parse_or()
+            self.expect(')')
+            return term
+        return self.parse_condition()
+
+    def parse_condition(self):
+        kind, name = self.take()
+        if kind != 'word' or name.lower() not in self.fields:
+            raise ValueError(f"Unknown field '{name}'")
+        field = self.fields[name.lower()]
+        kind, operator = self.take()
+        operator = operator.lower()
+
+        if operator == 'between':
+            low = self.parse_number(field)
+            self.expect('and')
+            high = self.parse_number(field)
+            return lambda index, paths: self.between(index.column(field, 'number', paths), low, high)
+        if operator == 'within':
+            if field not in SmartQuery.TIME_FIELDS:
+                raise ValueError(f"'within' needs mtime or added, not '{name}'")
+            age = self.parse_number(field, dates=False)
+            self.time_dependent = True
+            return lambda index, paths: index.column(field, 'number', paths) >= time.time() - age
+        if operator == 'in':
+            self.expect('(')
+            values = [self.take()[1]]
+            while self.accept(','):
+                values.append(self.take()[1])
+            self.expect(')')
+            return self.equality(field, values)
+        if operator in SmartQuery.COMPARISONS:
+            if field == 'path':
+                raise ValueError(f"'{operator}' needs a numeric field")
+            value = self.parse_number(field)
+            compare = SmartQuery.COMPARISONS[operator]
+            return lambda index, paths: compare(index.column(field, 'number', paths), value)
+        if operator in ('=', '!='):
+            term = self.equality(field, [self.take()[1]])
+        elif operator in ('~', '!~'):
+            needle = self.take()[1].lower()
+            term = lambda index, paths: np.char.find(index.column(field, 'text', paths), needle) >= 0
+        else:
+            raise ValueError(f"Unknown operator '{operator}'")
+        if operator.startswith('!'):
+            return lambda index, paths: np.logical_not(term(index, paths))
+        return term
+
+    def parse_number(self, field, dates=True):
+        text = self.take()[1]
+        value = SmartQuery.to_number(text, dates and field in SmartQuery.TIME_FIELDS)
+        if value is None:
+            raise ValueError(f"'{text}' is not a number")
+        return value
+
+    @staticmethod
+    def to_number(text, dates=False):
+        """Float value of a number with an optional unit, or of a YYYY-MM-DD
+        date as a timestamp when dates is set; None if it is neither"""
+        if dates:
+            try:
+                return datetime.fromisoformat(text).timestamp()
+            except ValueError:
+                pass
+        match = SmartQuery.VALUE_PATTERN.match(text.lower())
+        if not match or (match.group(2) and match.group(2) not in SmartQuery.UNITS):
+            return None
+        return float(match.group(1)) * SmartQuery.UNITS.get(match.group(2), 1)
+
+    @staticmethod
+    def between(column, low, high):
+        return (column >= min(low, high)) & (column <= max(low, high))
+
+    def equality(self, field, values):
+        """Match any of values: exact text (of any value of multi-value tags)
+        or, for numbers, the numeric value"""
+        needles = [LibraryIndex.wrap(value) for value in values]
+        numbers = [number for number in (SmartQuery.to_number(value, field in SmartQuery.TIME_FIELDS)
+                                         for value in values) if number is not None]
+        if field in LibraryIndex.NUMBER_FIELDS:
+            if len(numbers) != len(values):
+                raise ValueError(f"'{field}' needs numeric values")
+            return lambda index, paths: np.isin(index.column(field, 'number', paths), numbers)
+
+        def term(index, paths):
+            text = index.column(field, 'text', paths)
+            mask = np.logical_or.reduce([np.char.find(text, needle) >= 0 for needle in needles])
+            if numbers and field != 'path':
+                mask = mask | np.isin(index.column(field, 'number', paths), numbers)
+            return mask
+        return term
+
+
+class SmartPlaylist:
+    """Tracks matching a SmartQuery. evaluate() runs the query over the whole
+    index; update() re-tests only the tracks that changed."""
+
+    def __init__(self, query):
+        self.query = query if isinstance(query, SmartQuery) else SmartQuery(query)
+        self.members = set()
+
+    @property
+    def time_dependent(self):
+        return self.query.time_dependent
+
+    def evaluate(self, index):
+        """Rebuild membership from the whole index; returns True if it changed"""
+        paths = index.paths()
+        mask = self.query(index)
+        members = {path for path, matched in zip(paths, mask) if matched}
+        changed = members != self.members
+        self.members = members
+        return changed
+
+    def update(self, index, paths):
+        """Re-test paths after they were added, modified or removed from the
+        index; returns True if membership changed"""
+        present = [path for path in paths if path in index]
+        matches = dict(zip(present, self.query(index, present))) if present else {}
+        changed = False
+        for path in paths:
+            if matches.get(path, False):
+                changed |= path not in self.members
+                self.members.add(path)
+            elif path in self.members:
+                self.members.discard(path)
+                changed = True
+        return changed
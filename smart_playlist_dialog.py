@@ -0,0 +1,127 @@
+# smart_playlist_dialog.py
+from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QFormLayout, QLineEdit, QComboBox,
+    QLabel, QProgressBar, QDialogButtonBox)
+from metadata_cache import MetadataCache
+from smart_playlist import LibraryIndex, SmartQuery
+from config import PlaylistFormats, WatchSettings
+
+class LibraryIndexThread(QThread):
+    """Load index records for files, probing only those the metadata cache
+    hasn't seen in their current version"""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, files, db_path=WatchSettings.METADATA_DB):
+        super().__init__()
+        self.files = files
+        self.db_path = db_path
+        self.index = LibraryIndex()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            cache = MetadataCache(self.db_path)
+        except Exception as e:
+            print(f"Error opening metadata cache: {e}")
+            self.finished.emit(False, str(e))
+            return
+        try:
+            for i, file_path in enumerate(self.files):
+                if self.cancelled:
+                    self.finished.emit(False, "Cancelled")
+                    return
+                try:
+                    self.index.put(file_path, cache.library_record(file_path))
+                except OSError:
+                    pass
+                self.progress.emit(int((i + 1) / len(self.files) * 100))
+            self.finished.emit(True, f"Indexed {len(self.index)} tracks ({cache.probes} read)")
+        finally:
+            cache.close()
+
+
+class SmartPlaylistDialog(QDialog):
+    """Build a playlist from the tracks in the current folder matching a query"""
+
+    def __init__(self, files, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Smart Playlist")
+        self.setMinimumWidth(520)
+        self.files = files
+        self.matches = []
+        self.setup_ui()
+        self.thread = LibraryIndexThread(files)
+        self.thread.progress.connect(self.progress_bar.setValue)
+        self.thread.finished.connect(self.index_finished)
+        self.thread.start()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        form_layout = QFormLayout()
+
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("genre = House and bpm between 120 and 128 and added within 30d")
+        self.query_edit.setToolTip(SmartQuery.__doc__)
+        self.query_edit.textChanged.connect(self.update_matches)
+        form_layout.addRow("Query:", self.query_edit)
+
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(PlaylistFormats.FORMATS.keys())
+        form_layout.addRow("Format:", self.format_combo)
+        layout.addLayout(form_layout)
+
+        self.progress_bar = QProgressBar()
+        layout.addWidget(self.progress_bar)
+        self.result_label = QLabel(f"Reading tags of {len(self.files)} tracks...")
+        self.result_label.setWordWrap(True)
+        layout.addWidget(self.result_label)
+
+        self.button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Save |
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        self.button_box.button(QDialogButtonBox.StandardButton.Save).setEnabled(False)
+        self.button_box.accepted.connect(self.accept)
+        self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+
+    def index_finished(self, success, message):
+        self.thread.wait()
+        self.progress_bar.hide()
+        if not success:
+            self.result_label.setText(f"Error reading tags: {message}")
+            return
+        self.update_matches()
+
+    def update_matches(self):
+        if self.thread.isRunning():
+            return
+        index = self.thread.index
+        self.matches = []
+        text = self.query_edit.text().strip()
+        if text:
+            try:
+                mask = SmartQuery(text)(index)
+                matched = {path for path, hit in zip(index.paths(), mask) if hit}
+                # Keep the folder's sort order
+                self.matches = [path for path in self.files if path in matched]
+                self.result_label.setText(f"{len(self.matches)} of {len(index)} tracks match")
+            except ValueError as e:
+                self.result_label.setText(str(e))
+        else:
+            self.result_label.setText(f"{len(index)} tracks indexed")
+        self.button_box.button(QDialogButtonBox.StandardButton.Save).setEnabled(bool(self.matches))
+
+    def done(self, result):
+        self.thread.cancel()
+        self.thread.wait()
+        super().done(result)
+
+    def get_playlist(self):
+        """(matching files, playlist format name)"""
+        return self.matches, self.format_combo.currentText()
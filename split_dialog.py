@@ -0,0 +1,107 @@
+# split_dialog.py
+import os
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QGroupBox, QFormLayout, QComboBox,
+    QLineEdit, QPushButton, QLabel, QSpinBox, QFileDialog, QDialogButtonBox)
+from config import SplitSettings
+
+class SplitDialog(QDialog):
+    """Options for splitting one recording into tracks"""
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Split Recording")
+        self.setMinimumWidth(480)
+        self.file_path = file_path
+        self.setup_ui()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        label = QLabel(f"Split {os.path.basename(self.file_path)} into tracks. MP3s are cut without "
+                       "re-encoding; the tracks are tagged and listed in a playlist.")
+        label.setWordWrap(True)
+        layout.addWidget(label)
+
+        options_group = QGroupBox("Options")
+        form_layout = QFormLayout(options_group)
+
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItems(SplitSettings.MODES.keys())
+        form_layout.addRow("Find Tracks From:", self.mode_combo)
+
+        cue_layout = QHBoxLayout()
+        self.cue_edit = QLineEdit()
+        # A CUE sheet next to the recording is most likely the one to use
+        cue_path = os.path.splitext(self.file_path)[0] + ".cue"
+        if os.path.isfile(cue_path):
+            self.cue_edit.setText(cue_path)
+            self.mode_combo.setCurrentText(self.mode_name(SplitSettings.MODE_CUE))
+        self.cue_button = QPushButton("Browse")
+        self.cue_button.clicked.connect(self.browse_cue)
+        cue_layout.addWidget(self.cue_edit)
+        cue_layout.addWidget(self.cue_button)
+        form_layout.addRow("CUE Sheet:", cue_layout)
+
+        self.threshold_spin = QSpinBox()
+        self.threshold_spin.setRange(-90, -10)
+        self.threshold_spin.setValue(SplitSettings.THRESHOLD_DB)
+        self.threshold_spin.setSuffix(" dBFS")
+        form_layout.addRow("Silence Below:", self.threshold_spin)
+
+        self.min_silence_spin = QSpinBox()
+        self.min_silence_spin.setRange(100, 60000)
+        self.min_silence_spin.setSingleStep(250)
+        self.min_silence_spin.setValue(SplitSettings.MIN_SILENCE_MS)
+        self.min_silence_spin.setSuffix(" ms")
+        form_layout.addRow("Shortest Gap:", self.min_silence_spin)
+
+        output_layout = QHBoxLayout()
+        self.output_edit = QLineEdit()
+        self.output_edit.setPlaceholderText(os.path.splitext(self.file_path)[0])
+        browse_button = QPushButton("Browse")
+        browse_button.clicked.connect(self.browse_output)
+        output_layout.addWidget(self.output_edit)
+        output_layout.addWidget(browse_button)
+        form_layout.addRow("Save To:", output_layout)
+        layout.addWidget(options_group)
+        self.mode_combo.currentTextChanged.connect(self.update_fields)
+        self.update_fields()
+
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok |
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    @staticmethod
+    def mode_name(mode):
+        return next(name for name, value in SplitSettings.MODES.items() if value == mode)
+
+    def update_fields(self):
+        mode = SplitSettings.MODES[self.mode_combo.currentText()]
+        self.cue_edit.setEnabled(mode == SplitSettings.MODE_CUE)
+        self.cue_button.setEnabled(mode == SplitSettings.MODE_CUE)
+        self.threshold_spin.setEnabled(mode == SplitSettings.MODE_SILENCE)
+        self.min_silence_spin.setEnabled(mode == SplitSettings.MODE_SILENCE)
+
+    def browse_cue(self):
+        cue_path, _ = QFileDialog.getOpenFileName(self, "CUE Sheet", os.path.dirname(self.file_path),
+                                                  "CUE Sheets (*.cue)")
+        if cue_path:
+            self.cue_edit.setText(cue_path)
+
+    def browse_output(self):
+        directory = QFileDialog.getExistingDirectory(self, "Save Tracks To", os.path.dirname(self.file_path))
+        if directory:
+            self.output_edit.setText(directory)
+
+    def get_options(self):
+        mode = SplitSettings.MODES[self.mode_combo.currentText()]
+        return {
+            'mode': mode,
+            'cue_path': (self.cue_edit.text() or None) if mode == SplitSettings.MODE_CUE else None,
+            'output_dir': self.output_edit.text() or None,
+            'threshold_db': self.threshold_spin.value(),
+            'min_silence_ms': self.min_silence_spin.value()
+        }
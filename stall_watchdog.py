@@ -0,0 +1,145 @@
+# stall_watchdog.py
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+import numpy as np
+from PyQt6.QtCore import QObject, QTimer
+from config import DiagnosticsSettings
+from tracing import Tracer
+
+class StallWatchdog(QObject):
+    """Measures GUI event loop latency with a heartbeat timer. A monitor
+    thread notices when the heartbeat stops, samples the main thread's Python
+    stack while it is blocked, and records the stall once the loop is back."""
+    _instance = None
+
+    def __init__(self, stall_ms=DiagnosticsSettings.STALL_MS,
+                 heartbeat_ms=DiagnosticsSettings.HEARTBEAT_MS, parent=None):
+        super().__init__(parent)
+        self.stall_ms = stall_ms
+        self.heartbeat_ms = heartbeat_ms
+        self.main_thread_id = threading.main_thread().ident
+        self.lock = threading.Lock()
+        self.timer = QTimer(self)
+        self.timer.setInterval(heartbeat_ms)
+        self.timer.timeout.connect(self.beat)
+        self.monitor = None
+        self.running = False
+        self.reset()
+
+    @staticmethod
+    def instance():
+        if StallWatchdog._instance is None:
+            StallWatchdog._instance = StallWatchdog()
+        return StallWatchdog._instance
+
+    def reset(self):
+        with self.lock:
+            self.last_beat = time.perf_counter()
+            self.latencies = deque(maxlen=DiagnosticsSettings.LATENCY_SAMPLES)
+            self.stalls = deque(maxlen=DiagnosticsSettings.MAX_STALLS)
+            self.stall_count = 0
+            self.stall_total_ms = 0.0
+            self.stall_max_ms = 0.0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.last_beat = time.perf_counter()
+        self.timer.start()
+        self.monitor = threading.Thread(target=self.watch, name="StallWatchdog", daemon=True)
+        self.monitor.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.timer.stop()
+        self.monitor.join()
+        self.monitor = None
+
+    def beat(self):
+        now = time.perf_counter()
+        # How late this tick fired: time the event loop spent on other work
+        lateness = max(0.0, (now - self.last_beat) * 1000 - self.heartbeat_ms)
+        with self.lock:
+            self.latencies.append(lateness)
+        self.last_beat = now
+
+    def sample_stack(self):
+        frame = sys._current_frames().get(self.main_thread_id)
+        if frame is None:
+            return ()
+        return tuple(f"{summary.filename}:{summary.lineno} in {summary.name}"
+                     for summary in traceback.extract_stack(frame))
+
+    def watch(self):
+        poll = DiagnosticsSettings.POLL_MS / 1000
+        sample_interval = DiagnosticsSettings.STACK_SAMPLE_MS / 1000
+        stall_from = None
+        samples = []
+        next_sample = 0.0
+        while self.running:
+            time.sleep(poll)
+            now = time.perf_counter()
+            last_beat = self.last_beat
+            if stall_from is None:
+                if (now - last_beat) * 1000 - self.heartbeat_ms > self.stall_ms:
+                    stall_from = last_beat
+                    samples = [self.sample_stack()]
+                    next_sample = now + sample_interval
+            elif last_beat != stall_from:
+                self.record_stall(stall_from, last_beat, samples)
+                stall_from = None
+            elif now >= next_sample and len(samples) < DiagnosticsSettings.MAX_STACK_SAMPLES:
+                samples.append(self.sample_stack())
+                next_sample = now + sample_interval
+        if stall_from is not None:
+            # Stopped from inside a stall; it lasted until now
+            self.record_stall(stall_from, time.perf_counter(), samples)
+
+    def record_stall(self, start, end, samples):
+        duration_ms = max(0.0, (end - start) * 1000 - self.heartbeat_ms)
+        stacks = Counter(stack for stack in samples if stack)
+        stack = list(stacks.most_common(1)[0][0]) if stacks else []
+        stall = {
+            'time': time.time() - (time.perf_counter() - start),
+            'duration_ms': round(duration_ms, 1),
+            'samples': len(samples),
+            'stack': stack,
+            'location': stack[-1] if stack else "unknown"
+        }
+        with self.lock:
+            self.stalls.append(stall)
+            self.stall_count += 1
+            self.stall_total_ms += duration_ms
+            self.stall_max_ms = max(self.stall_max_ms, duration_ms)
+        if Tracer.enabled:
+            # perf_counter and perf_counter_ns share a clock, so this lines up with other spans
+            Tracer.record("gui.stall", int(start * 1e9), int(duration_ms * 1e6),
+                          {'location': stall['location']})
+
+    def get_stalls(self):
+        with self.lock:
+            return list(self.stalls)
+
+    def summary(self):
+        """Stall counts and event loop latency percentiles, in milliseconds"""
+        with self.lock:
+            latencies = np.array(self.latencies, dtype=np.float64)
+            result = {
+                'stall_threshold_ms': self.stall_ms,
+                'stall_count': self.stall_count,
+                'stall_total_ms': round(self.stall_total_ms, 1),
+                'stall_max_ms': round(self.stall_max_ms, 1),
+                'heartbeats': len(latencies)
+            }
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            result.update(latency_p50_ms=round(float(p50), 1), latency_p95_ms=round(float(p95), 1),
+                          latency_p99_ms=round(float(p99), 1),
+                          latency_max_ms=round(float(latencies.max()), 1))
+        return result
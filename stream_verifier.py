@@ -0,0 +1,530 @@
+# stream_verifier.py
+import mmap
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import numpy as np
+from mp3_frames import Mp3Frames
+from config import IntegritySettings
+from tracing import Tracer
+
+class StreamVerifier:
+    """Checks that audio files are intact without decoding them.
+
+    MP3 frames are walked header to header, checking sync, the CRC of
+    protected frames, the LAME tag CRC and, when the tag carries one, the
+    CRC of all audio data and the frame count. FLAC frames are found by
+    their CRC-8 protected headers and numbered sequence; since each frame
+    ends in the CRC-16 of its own bytes, the CRC-16 of all the frames
+    together is zero exactly when they are intact, so a single vectorized
+    pass checks them all (and only a damaged file is bisected to find the
+    bad frame). The STREAMINFO MD5 of the decoded audio is checked on
+    request, through ffmpeg. WAV, Ogg (page CRCs), MP4 and ASF files get a
+    container walk.
+
+    Files are memory-mapped and results are plain dicts, so verify() runs
+    in worker processes.
+    """
+    # Byte with its bits reversed: the MSB-first CRCs of FLAC, MPEG and Ogg
+    # are the LSB-first ones zlib and Mp3Frames.lame_crc16 compute, over
+    # reversed bytes and with the result reversed
+    REVERSED = bytes(int(f"{byte:08b}"[::-1], 2) for byte in range(256))
+    ASF_HEADER = bytes.fromhex("3026b2758e66cf11a6d900aa0062ce6c")
+    ASF_DATA = bytes.fromhex("3626b2758e66cf11a6d900aa0062ce6c")
+    MAX_PROBLEMS = 10
+    main_lock = threading.Lock()
+    _crc8_table = None
+
+    @staticmethod
+    def reverse_bits(value, width):
+        return int(f"{value:0{width}b}"[::-1], 2)
+
+    @staticmethod
+    def crc16(data, crc=0):
+        """CRC-16 with polynomial 0x8005, MSB first (FLAC frames; MPEG frames
+        start from 0xFFFF)"""
+        crc = StreamVerifier.reverse_bits(crc, 16)
+        crc = Mp3Frames.lame_crc16(bytes(data).translate(StreamVerifier.REVERSED), crc)
+        return StreamVerifier.reverse_bits(crc, 16)
+
+    @staticmethod
+    def crc8(data):
+        """CRC-8 with polynomial 0x07 (FLAC frame headers)"""
+        if StreamVerifier._crc8_table is None:
+            table = []
+            for byte in range(256):
+                crc = byte
+                for _ in range(8):
+                    crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+                table.append(crc)
+            StreamVerifier._crc8_table = table
+        crc = 0
+        for byte in data:
+            crc = StreamVerifier._crc8_table[crc ^ byte]
+        return crc
+
+    @staticmethod
+    def ogg_crc(data):
+        """CRC-32 with polynomial 0x04C11DB7, MSB first, no inversion (Ogg pages)"""
+        crc = zlib.crc32(bytes(data).translate(StreamVerifier.REVERSED), 0xFFFFFFFF) ^ 0xFFFFFFFF
+        return StreamVerifier.reverse_bits(crc, 32)
+
+    @staticmethod
+    def detect_format(data, file_path):
+        head = bytes(data[:16])
+        if head[:4] == b'fLaC':
+            return "flac"
+        if head[:3] == b'ID3':
+            start = Mp3Frames.skip_id3v2(data)
+            return "flac" if bytes(data[start:start + 4]) == b'fLaC' else "mp3"
+        if head[:4] in (b'RIFF', b'RF64') and head[8:12] == b'WAVE':
+            return "wav"
+        if head[:4] == b'OggS':
+            return "ogg"
+        if head[4:8] == b'ftyp':
+            return "mp4"
+        if head == StreamVerifier.ASF_HEADER:
+            return "asf"
+        if Mp3Frames.parse_header(head):
+            return "mp3"
+        return None
+
+    @staticmethod
+    def verify(file_path, check_md5=False):
+        """{'format', 'problems': [...], 'deep'} for a file; no problems
+        means it is intact, and deep records whether MD5s were checked"""
+        result = {'format': None, 'problems': [], 'deep': check_md5}
+        problems = result['problems']
+        try:
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    problems.append("Empty file")
+                    return result
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    result['format'] = StreamVerifier.detect_format(data, file_path)
+                    if result['format'] is None:
+                        problems.append("Unrecognized audio format")
+                    elif result['format'] == "flac":
+                        StreamVerifier.verify_flac(data, file_path, check_md5, problems)
+                    else:
+                        getattr(StreamVerifier, "verify_" + result['format'])(data, problems)
+        except (OSError, ValueError) as e:
+            problems.append(f"Unreadable: {e}")
+        if len(problems) > StreamVerifier.MAX_PROBLEMS:
+            extra = len(problems) - StreamVerifier.MAX_PROBLEMS
+            del problems[StreamVerifier.MAX_PROBLEMS:]
+            problems.append(f"... and {extra} more")
+        return result
+
+    @staticmethod
+    def audio_end(data):
+        """Offset where audio ends, before any ID3v1 or APEv2 tag at the end"""
+        end = len(data)
+        if end >= 128 and bytes(data[end - 128:end - 125]) == b'TAG':
+            end -= 128
+        if end >= 32 and bytes(data[end - 32:end - 24]) == b'APETAGEX':
+            size = int.from_bytes(data[end - 20:end - 16], 'little')
+            flags = int.from_bytes(data[end - 12:end - 8], 'little')
+            end -= size + (32 if flags & 0x80000000 else 0)
+        return max(0, end)
+
+    @staticmethod
+    def verify_mp3(data, problems):
+        end = StreamVerifier.audio_end(data)
+        start = Mp3Frames.skip_id3v2(data)
+        if start > end:
+            problems.append("ID3v2 tag runs past the end of the file")
+            return
+        offset = Mp3Frames.find_sync(data, start)
+        if offset < 0 or offset >= end:
+            problems.append("No MPEG audio frames")
+            return
+        if offset > start:
+            problems.append(f"{offset - start} bytes of junk before the first frame")
+
+        first = None
+        info = None
+        frames = 0
+        while offset < end:
+            header = Mp3Frames.parse_header(data, offset)
+            if header is None or (first is not None and not header.matches(first)):
+                resync = Mp3Frames.find_sync(data, offset + 1)
+                if resync < 0 or resync >= end:
+                    problems.append(f"{end - offset} bytes of junk at the end (byte {offset})")
+                    break
+                problems.append(f"Lost sync at byte {offset}, {resync - offset} bytes skipped")
+                offset = resync
+                continue
+            if offset + header.length > end:
+                problems.append(f"Truncated final frame: {end - offset} of {header.length} bytes")
+                break
+            if header.protected:
+                stored = int.from_bytes(data[offset + 4:offset + 6], 'big')
+                covered = bytes(data[offset + 2:offset + 4]) + bytes(data[offset + 6:offset + 6 + header.side_info_size])
+                if StreamVerifier.crc16(covered, 0xFFFF) != stored:
+                    problems.append(f"CRC error in frame {frames} at byte {offset}")
+            if first is None:
+                first = header
+                if Mp3Frames.is_info_frame(data, offset, header):
+                    info = (offset, header)
+                    offset += header.length
+                    continue
+            frames += 1
+            offset += header.length
+
+        if info is not None:
+            StreamVerifier.verify_info_frame(data, info[0], info[1], frames, end, problems)
+
+    @staticmethod
+    def verify_info_frame(data, offset, header, frames, end, problems):
+        """Check the Xing/Info frame count and the LAME tag CRCs"""
+        xing = offset + 4 + (2 if header.protected else 0) + header.side_info_size
+        flags = int.from_bytes(data[xing + 4:xing + 8], 'big')
+        position = xing + 8
+        if flags & 0x01:
+            # Encoders count the Info frame itself, or not
+            expected = int.from_bytes(data[position:position + 4], 'big')
+            if expected not in (frames, frames + 1):
+                problems.append(f"{frames} audio frames, the Xing header lists {expected}")
+            position += 4
+        position += (4 if flags & 0x02 else 0) + (100 if flags & 0x04 else 0) + (4 if flags & 0x08 else 0)
+        lame = position
+        if lame + 36 > offset + header.length or not bytes(data[lame:lame + 4]).isalpha():
+            return
+        stored = int.from_bytes(data[lame + 34:lame + 36], 'big')
+        if Mp3Frames.lame_crc16(bytes(data[offset:lame + 34])) != stored:
+            problems.append("LAME tag CRC mismatch")
+            return
+        music_length = int.from_bytes(data[lame + 28:lame + 32], 'big')
+        music_crc = int.from_bytes(data[lame + 32:lame + 34], 'big')
+        if not music_length:
+            return
+        if offset + music_length > end:
+            problems.append(f"Truncated: {end - offset} of {music_length} bytes of audio")
+            return
+        audio = np.frombuffer(data, dtype=np.uint8, count=music_length - header.length,
+                              offset=offset + header.length)
+        if music_crc and Mp3Frames.lame_crc16(audio) != music_crc:
+            problems.append("Audio data CRC mismatch (LAME tag)")
+
+    @staticmethod
+    def flac_frame_header(data, offset):
+        """(frame or sample number, block size) of a FLAC frame header at
+        offset whose CRC-8 checks out, or None"""
+        header = bytes(data[offset:offset + 16])
+        if len(header) < 6 or header[0] != 0xFF or (header[1] & 0xFE) != 0xF8:
+            return None
+        block_code, rate_code = header[2] >> 4, header[2] & 0x0F
+        if block_code == 0 or rate_code == 15 or (header[3] >> 4) > 10 or header[3] & 0x01:
+            return None
+        # UTF-8 style coded number
+        first = header[4]
+        length = 0
+        while length < 7 and first & (0x80 >> length):
+            length += 1
+        # Only sample numbers (variable block sizes) take 7 bytes
+        if length == 1 or length > 6 + (header[1] & 0x01):
+            return None
+        number = first & (0x7F >> length) if length else first
+        position = 5
+        for _ in range(max(0, length - 1)):
+            if position >= len(header) or header[position] & 0xC0 != 0x80:
+                return None
+            number = (number << 6) | (header[position] & 0x3F)
+            position += 1
+        if block_code == 1:
+            block_size = 192
+        elif block_code <= 5:
+            block_size = 576 << (block_code - 2)
+        elif block_code == 6:
+            block_size = header[position] + 1
+            position += 1
+        elif block_code == 7:
+            block_size = int.from_bytes(header[position:position + 2], 'big') + 1
+            position += 2
+        else:
+            block_size = 256 << (block_code - 8)
+        position += {12: 1, 13: 2, 14: 2}.get(rate_code, 0)
+        if position >= len(header) or StreamVerifier.crc8(header[:position]) != header[position]:
+            return None
+        return number, block_size
+
+    @staticmethod
+    def verify_flac(data, file_path, check_md5, problems):
+        offset = Mp3Frames.skip_id3v2(data) + 4
+        streaminfo = None
+        last = False
+        while not last:
+            if offset + 4 > len(data):
+                problems.append("Metadata truncated")
+                return
+            last = data[offset] & 0x80
+            block_type = data[offset] & 0x7F
+            length = int.from_bytes(data[offset + 1:offset + 4], 'big')
+            offset += 4
+            if block_type == 127 or offset + length > len(data):
+                problems.append(f"Metadata block at byte {offset - 4} is damaged or truncated")
+                return
+            if block_type == 0:
+                streaminfo = bytes(data[offset:offset + length])
+            offset += length
+        if streaminfo is None or len(streaminfo) < 34:
+            problems.append("No STREAMINFO block")
+            return
+        fields = int.from_bytes(streaminfo[10:18], 'big')
+        bits_per_sample = ((fields >> 36) & 0x1F) + 1
+        total_samples = fields & 0xFFFFFFFFF
+        md5 = streaminfo[18:34]
+
+        end = StreamVerifier.audio_end(data)
+        audio = np.frombuffer(data, dtype=np.uint8, count=end - offset, offset=offset)
+        candidates = np.flatnonzero((audio[:-1] == 0xFF) & ((audio[1:] & 0xFE) == 0xF8)) + offset
+        starts = []
+        samples = 0
+        variable = None
+        for candidate in candidates.tolist():
+            if starts and candidate < starts[-1] + 6:
+                continue
+            parsed = StreamVerifier.flac_frame_header(data, candidate)
+            if parsed is None:
+                continue
+            number, block_size = parsed
+            if variable is None:
+                variable = bool(data[candidate + 1] & 0x01)
+            # A false sync inside a frame would also need the next number
+            if number != (samples if variable else len(starts)):
+                continue
+            starts.append(candidate)
+            samples += block_size
+        if not starts:
+            problems.append("No FLAC frames")
+            return
+        if starts[0] != offset:
+            problems.append(f"{starts[0] - offset} bytes of junk before the first frame")
+        if total_samples and samples < total_samples:
+            problems.append(f"Truncated: {samples} of {total_samples} samples")
+
+        # Every intact frame has a CRC-16 of zero over its own bytes, so
+        # intact frames in sequence do too
+        boundaries = starts + [end]
+        if StreamVerifier.crc16(data[starts[0]:end]) != 0:
+            low, high = 1, len(boundaries) - 1
+            while low < high:
+                middle = (low + high) // 2
+                if StreamVerifier.crc16(data[starts[0]:boundaries[middle]]) != 0:
+                    high = middle
+                else:
+                    low = middle + 1
+            problems.append(f"CRC error in frame {low - 1} at byte {boundaries[low - 1]}")
+            return
+
+        if not check_md5 or not any(md5) or problems:
+            return
+        decoded = StreamVerifier.decoded_md5(file_path, bits_per_sample)
+        if decoded is not None and decoded != md5:
+            problems.append("Decoded audio doesn't match the STREAMINFO MD5")
+
+    @staticmethod
+    def decoded_md5(file_path, bits_per_sample):
+        """MD5 of the decoded samples in FLAC's layout (interleaved,
+        little-endian, whole bytes per sample), or None without ffmpeg"""
+        codec = {8: "pcm_s8", 16: "pcm_s16le", 24: "pcm_s24le", 32: "pcm_s32le"}.get(bits_per_sample)
+        if codec is None:
+            return None
+        from pydub import AudioSegment
+        command = [AudioSegment.converter, '-loglevel', 'error', '-i', file_path,
+                   '-map', '0:a:0', '-c:a', codec, '-f', 'md5', 'pipe:1']
+        try:
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                    timeout=IntegritySettings.MD5_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        output = result.stdout.decode('ascii', 'replace').strip()
+        if result.returncode != 0 or not output.startswith("MD5="):
+            return None
+        return bytes.fromhex(output[4:])
+
+    @staticmethod
+    def verify_wav(data, problems):
+        rf64 = bytes(data[0:4]) == b'RF64'
+        riff_end = len(data) if rf64 else int.from_bytes(data[4:8], 'little') + 8
+        if riff_end > len(data):
+            problems.append(f"Truncated: {len(data)} of {riff_end} bytes")
+        block_align = None
+        data_size = None
+        offset = 12
+        while offset + 8 <= min(riff_end, len(data)):
+            chunk_id = bytes(data[offset:offset + 4])
+            size = int.from_bytes(data[offset + 4:offset + 8], 'little')
+            body = offset + 8
+            if chunk_id == b'fmt ' and size >= 16:
+                block_align = int.from_bytes(data[body + 12:body + 14], 'little')
+            elif chunk_id == b'data':
+                if rf64 and size == 0xFFFFFFFF:
+                    size = len(data) - body
+                data_size = size
+                if body + size > len(data):
+                    problems.append(f"data chunk truncated: {len(data) - body} of {size} bytes")
+                    data_size = len(data) - body
+                    break
+            offset = body + size + (size & 1)
+        if block_align is None:
+            problems.append("No fmt chunk")
+        if data_size is None:
+            problems.append("No data chunk")
+        elif block_align and data_size % block_align:
+            problems.append("Audio data ends in the middle of a sample")
+
+    @staticmethod
+    def verify_ogg(data, problems):
+        offset = 0
+        pages = 0
+        flags = 0
+        while offset < len(data):
+            if bytes(data[offset:offset + 4]) != b'OggS':
+                resync = data.find(b'OggS', offset + 1)
+                problems.append(f"Lost page sync at byte {offset}")
+                if resync < 0:
+                    return
+                offset = resync
+                continue
+            if offset + 27 > len(data):
+                problems.append("Truncated final page")
+                return
+            flags = data[offset + 5]
+            segments = data[offset + 26]
+            page_length = 27 + segments + sum(data[offset + 27:offset + 27 + segments])
+            if offset + page_length > len(data):
+                problems.append(f"Truncated final page: {len(data) - offset} of {page_length} bytes")
+                return
+            page = bytearray(data[offset:offset + page_length])
+            stored = int.from_bytes(page[22:26], 'little')
+            page[22:26] = bytes(4)
+            if StreamVerifier.ogg_crc(page) != stored:
+                problems.append(f"CRC error in page {pages} at byte {offset}")
+            pages += 1
+            offset += page_length
+        if not flags & 0x04:
+            problems.append("No end-of-stream page (truncated?)")
+
+    @staticmethod
+    def verify_mp4(data, problems):
+        boxes = set()
+        offset = 0
+        while offset + 8 <= len(data):
+            size = int.from_bytes(data[offset:offset + 4], 'big')
+            box_type = bytes(data[offset + 4:offset + 8]).decode('latin-1')
+            if size == 1:
+                size = int.from_bytes(data[offset + 8:offset + 16], 'big')
+            elif size == 0:
+                size = len(data) - offset
+            if size < 8:
+                problems.append(f"Invalid box size at byte {offset}")
+                return
+            if offset + size > len(data):
+                problems.append(f"'{box_type}' box truncated: {len(data) - offset} of {size} bytes")
+            boxes.add(box_type)
+            offset += size
+        for required in ("moov", "mdat"):
+            if required not in boxes:
+                problems.append(f"No '{required}' box")
+
+    @staticmethod
+    def verify_asf(data, problems):
+        found_data = False
+        offset = 0
+        while offset + 24 <= len(data):
+            guid = bytes(data[offset:offset + 16])
+            size = int.from_bytes(data[offset + 16:offset + 24], 'little')
+            if size < 24:
+                problems.append(f"Invalid object size at byte {offset}")
+                return
+            if offset + size > len(data):
+                problems.append(f"Object at byte {offset} truncated: {len(data) - offset} of {size} bytes")
+            found_data = found_data or guid == StreamVerifier.ASF_DATA
+            offset += size
+        if not found_data:
+            problems.append("No data object")
+
+    @staticmethod
+    @contextmanager
+    def worker_main():
+        """Spawned workers re-import the parent's __main__, which for the app
+        is main.py and the whole GUI. Stand this module in for it while
+        workers start, so they import just the verifier."""
+        with StreamVerifier.main_lock:
+            main = sys.modules['__main__']
+            sys.modules['__main__'] = sys.modules[__name__]
+            try:
+                yield
+            finally:
+                sys.modules['__main__'] = main
+
+    @staticmethod
+    def verify_many(files, cache=None, check_md5=False, workers=IntegritySettings.WORKERS,
+                    progress=None, is_cancelled=None):
+        """{file: result} for files, taking unchanged files' results from a
+        MetadataCache and verifying the rest in worker processes.
+        progress(done, total) is called as files finish."""
+        results = {}
+        pending = []
+        for file_path in files:
+            cached = cache.get_integrity(file_path, check_md5) if cache else None
+            if cached is not None:
+                results[file_path] = cached
+            else:
+                pending.append(file_path)
+        Tracer.count("integrity.cached", len(results))
+        if progress:
+            progress(len(results), len(files))
+
+        def store(file_path, result):
+            results[file_path] = result
+            if cache:
+                try:
+                    cache.put_integrity(file_path, result)
+                except OSError:
+                    pass
+            if progress:
+                progress(len(results), len(files))
+
+        workers = min(workers or os.cpu_count() or 1, len(pending))
+        try:
+            pending_bytes = sum(os.path.getsize(file_path) for file_path in pending)
+        except OSError:
+            pending_bytes = IntegritySettings.POOL_MIN_BYTES
+        if pending_bytes < IntegritySettings.POOL_MIN_BYTES and not check_md5:
+            # Starting worker processes costs more than checking a few files
+            workers = 1
+        with Tracer.span("integrity.verify", files=len(pending)):
+            if workers <= 1:
+                for file_path in pending:
+                    if is_cancelled and is_cancelled():
+                        break
+                    store(file_path, StreamVerifier.verify(file_path, check_md5))
+            else:
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                    # Workers start on the first submit
+                    with StreamVerifier.worker_main():
+                        futures = [pool.submit(StreamVerifier.verify, file_path, check_md5)
+                                   for file_path in pending]
+                    for file_path, future in zip(pending, futures):
+                        if is_cancelled and is_cancelled():
+                            pool.shutdown(wait=True, cancel_futures=True)
+                            break
+                        store(file_path, future.result())
+        if cache:
+            cache.commit()
+        return results
+
+    @staticmethod
+    def summary(results):
+        """Lines describing the damaged files among results"""
+        return [f"{os.path.basename(file_path)}: {'; '.join(result['problems'])}"
+                for file_path, result in results.items() if result['problems']]
@@ -1,5 +1,5 @@
 # tag_definitions.py
-from mutagen.id3 import (ID3, TIT2, TPE1, TALB, TDRC, TRCK, APIC, 
+from mutagen.id3 import (ID3, TIT2, TPE1, TALB, TDRC, TRCK, TPOS, APIC,
                         TCON, COMM, TCOM, TPE2, TPUB, TBPM, TKEY)
 
 class TagDefinitions:
@@ -9,6 +9,7 @@ class TagDefinitions:
         'Album': ('TALB', TALB),
         'Year': ('TDRC', TDRC),
         'Track': ('TRCK', TRCK),
+        'Disc': ('TPOS', TPOS),
         'Genre': ('TCON', TCON),
         'Comment': ('COMM', COMM),
         'Composer': ('TCOM', TCOM),
@@ -18,6 +19,23 @@ class TagDefinitions:
         'Key': ('TKEY', TKEY)
     }
 
+    # Vorbis comment (FLAC/OGG) field names for the same tags
+    VORBIS_FIELDS = {
+        'Title': 'title',
+        'Artist': 'artist',
+        'Album': 'album',
+        'Year': 'date',
+        'Track': 'tracknumber',
+        'Disc': 'discnumber',
+        'Genre': 'genre',
+        'Comment': 'comment',
+        'Composer': 'composer',
+        'Album Artist': 'albumartist',
+        'Publisher': 'organization',
+        'BPM': 'bpm',
+        'Key': 'initialkey'
+    }
+
     # Tags that need special handling
     SPECIAL_TAGS = ['Album Art', 'Comment']
 
@@ -53,3 +71,23 @@ class TagDefinitions:
     def get_display_name(tag_name):
         """Get user-friendly display name for a tag"""
         return tag_name.replace('_', ' ').title()
+
+    @staticmethod
+    def get_all_values(audio):
+        """Read every tag in TAG_FRAMES from a loaded mutagen file"""
+        values = {}
+        tags = getattr(audio, 'tags', None)
+        if tags is None:
+            return values
+        for tag_name, field in TagDefinitions.VORBIS_FIELDS.items():
+            try:
+                if hasattr(tags, 'getall'):
+                    value = TagDefinitions.get_tag_value(tags, tag_name)
+                else:
+                    value = tags.get(field)
+                    value = str(value[0]) if value else ""
+            except Exception:
+                value = ""
+            if value:
+                values[tag_name] = value
+        return values
@@ -0,0 +1,389 @@
+# tag_reader.py
+import os
+import struct
+from tag_definitions import TagDefinitions
+from network_io import NetworkIO, BlockReader
+from tracing import Tracer
+
+class FastTagReader:
+    """Reads only the display tags (TagDefinitions.TAG_FRAMES) from an ID3v2
+    header or FLAC metadata blocks, seeking past pictures and every other
+    frame instead of reading them. Returns the same {tag_name: value} shape as
+    TagDefinitions.get_all_values, plus where the cover picture is stored.
+
+    Also handles WAV files with an "id3 " chunk and Ogg Vorbis/Opus comment
+    headers. Anything it can't read cheaply (other containers, ID3v1, ID3v2.3
+    whole-tag unsynchronisation) yields None so callers can fall back to
+    mutagen; compressed or encrypted frames are skipped."""
+    BUFFER_SIZE = 16 * 1024
+    # Text frames larger than this are lyrics-sized; they are skipped
+    MAX_TEXT_FRAME = 64 * 1024
+    # Enough of an APIC / PICTURE header to find where the image data starts
+    PICTURE_HEADER = 1024
+
+    FRAME_TAGS = {frame_id: tag_name for tag_name, (frame_id, _) in TagDefinitions.TAG_FRAMES.items()}
+    # ID3v2.3 keeps the year in TYER, which mutagen upgrades to TDRC
+    FRAME_TAGS['TYER'] = 'Year'
+    # ID3v2.2 three-character frame ids
+    V22_FRAMES = {
+        'TT2': 'TIT2', 'TP1': 'TPE1', 'TAL': 'TALB', 'TYE': 'TYER', 'TRK': 'TRCK', 'TPA': 'TPOS',
+        'TCO': 'TCON', 'COM': 'COMM', 'TCM': 'TCOM', 'TP2': 'TPE2', 'TPB': 'TPUB',
+        'TBP': 'TBPM', 'TKE': 'TKEY', 'PIC': 'APIC'
+    }
+    GENRE_FRAME = TagDefinitions.TAG_FRAMES['Genre'][1]
+    VORBIS_TAGS = {field: tag_name for tag_name, field in TagDefinitions.VORBIS_FIELDS.items()}
+    ENCODINGS = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}
+    FLAC_PICTURE = 6
+    FLAC_VORBIS_COMMENT = 4
+    OGG_COMMENT_HEADERS = (b'\x03vorbis', b'OpusTags')
+
+    @staticmethod
+    @Tracer.traced("tags.fast_read")
+    def read(file_path):
+        """{'tags': {tag_name: value}, 'has_art', 'art_offset', 'art_length',
+        'art_mime'} or None if the file needs a full parse. art_offset is the
+        file offset of the first picture's raw image bytes; it is None when
+        there is no picture or it can't be read in place (has_art tells which)."""
+        try:
+            if NetworkIO.is_high_latency(file_path):
+                # Coalesce the parser's small reads into whole-block round trips
+                f = BlockReader(file_path)
+            else:
+                f = open(file_path, 'rb', buffering=FastTagReader.BUFFER_SIZE)
+            with f:
+                magic = f.read(4)
+                f.seek(0)
+                if magic[:3] == b'ID3':
+                    return FastTagReader.read_id3(f)
+                if magic == b'fLaC':
+                    return FastTagReader.read_flac(f)
+                if magic == b'RIFF':
+                    return FastTagReader.read_wave(f)
+                if magic == b'OggS':
+                    return FastTagReader.read_ogg(f)
+                if len(magic) >= 2 and magic[0] == 0xFF and magic[1] & 0xE0 == 0xE0:
+                    # Bare MPEG audio: untagged unless there is an ID3v1 trailer,
+                    # which is left to mutagen
+                    f.seek(-128, os.SEEK_END)
+                    if f.read(3) != b'TAG':
+                        return FastTagReader.empty_result()
+        except (OSError, ValueError, struct.error, UnicodeDecodeError) as e:
+            print(f"Error reading tags from {file_path}: {e}")
+        return None
+
+    @staticmethod
+    def read_art(file_path, result=None):
+        """Raw bytes of the cover picture located by read(), or None"""
+        result = result or FastTagReader.read(file_path)
+        if not result or result['art_offset'] is None:
+            return None
+        with open(file_path, 'rb') as f:
+            f.seek(result['art_offset'])
+            data = f.read(result['art_length'])
+        return data if len(data) == result['art_length'] else None
+
+    @staticmethod
+    def empty_result():
+        return {'tags': {}, 'has_art': False, 'art_offset': None, 'art_length': 0, 'art_mime': None}
+
+    @staticmethod
+    def syncsafe(data):
+        return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+    @staticmethod
+    def decode_text(encoding, data):
+        """Decode an ID3 text payload into its list of values"""
+        codec = FastTagReader.ENCODINGS.get(encoding)
+        if codec is None:
+            raise ValueError(f"Unknown text encoding {encoding}")
+        values = []
+        while data:
+            raw, rest = FastTagReader.split_terminated(encoding, data)
+            if raw is None:
+                raw, rest = data, b''
+            values.append(raw.decode(codec, 'replace'))
+            data = rest
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    @staticmethod
+    def split_terminated(encoding, data):
+        """Split off one NUL-terminated string; returns (raw string, rest)"""
+        if encoding in (1, 2):
+            # Two-byte terminator, aligned to a character boundary
+            for i in range(0, len(data) - 1, 2):
+                if data[i:i + 2] == b'\x00\x00':
+                    return data[:i], data[i + 2:]
+            return None, b''
+        end = data.find(b'\x00')
+        if end < 0:
+            return None, b''
+        return data[:end], data[end + 1:]
+
+    @staticmethod
+    def read_id3(f):
+        """Parse the ID3v2 tag starting at the current position"""
+        base = f.tell()
+        header = f.read(10)
+        if len(header) < 10:
+            return None
+        version = header[3]
+        flags = header[5]
+        tag_size = FastTagReader.syncsafe(header[6:10])
+        if version not in (2, 3, 4) or (flags & 0x80 and version < 4):
+            # Unsynchronised v2.2/v2.3 tags must be decoded as a whole
+            return None
+        end = base + 10 + tag_size
+        if flags & 0x40 and version >= 3:
+            # Skip the extended header
+            size = f.read(4)
+            ext_size = FastTagReader.syncsafe(size) if version == 4 else struct.unpack('>I', size)[0] + 4
+            f.seek(base + 10 + ext_size)
+
+        result = FastTagReader.empty_result()
+        tags = result['tags']
+        id_size, header_size = (3, 6) if version == 2 else (4, 10)
+        while f.tell() + header_size <= end:
+            frame_header = f.read(header_size)
+            if frame_header[0] == 0:
+                break  # padding
+            frame_id = frame_header[:id_size].decode('latin-1')
+            if version == 2:
+                size = int.from_bytes(frame_header[3:6], 'big')
+                frame_flags = 0
+                frame_id = FastTagReader.V22_FRAMES.get(frame_id, frame_id)
+            else:
+                size_bytes = frame_header[4:8]
+                size = FastTagReader.syncsafe(size_bytes) if version == 4 else struct.unpack('>I', size_bytes)[0]
+                frame_flags = struct.unpack('>H', frame_header[8:10])[0]
+            payload_offset = f.tell()
+            if size <= 0 or payload_offset + size > end:
+                break
+
+            if version == 3:
+                packed = frame_flags & 0x00C0  # compressed or encrypted
+                prefix = 1 if frame_flags & 0x0020 else 0  # group id
+                unsync = False
+            else:
+                packed = frame_flags & 0x000C
+                prefix = (1 if frame_flags & 0x0040 else 0) + (4 if frame_flags & 0x0001 else 0)
+                unsync = bool(frame_flags & 0x0002)
+            tag_name = FastTagReader.FRAME_TAGS.get(frame_id)
+            if packed or size <= prefix:
+                result['has_art'] = result['has_art'] or frame_id == 'APIC'
+            elif frame_id == 'APIC':
+                result['has_art'] = True
+                if result['art_offset'] is None and not unsync:
+                    FastTagReader.locate_apic(f, version, payload_offset + prefix, size - prefix, result)
+            elif tag_name and tag_name not in tags and size <= FastTagReader.MAX_TEXT_FRAME:
+                payload = f.read(size)[prefix:]
+                if unsync:
+                    payload = payload.replace(b'\xff\x00', b'\xff')
+                value = FastTagReader.parse_text_frame(frame_id, payload)
+                if value:
+                    tags[tag_name] = value
+            f.seek(payload_offset + size)
+        return result
+
+    @staticmethod
+    def parse_text_frame(frame_id, payload):
+        """Frame text as mutagen's str(frame) gives it: values joined with
+        NUL, and TCON genre references such as "(17)" resolved"""
+        if not payload:
+            return ""
+        encoding = payload[0]
+        data = payload[1:]
+        if frame_id == 'COMM':
+            # Language, then a terminated description before the text
+            _, data = FastTagReader.split_terminated(encoding, data[3:])
+        values = FastTagReader.decode_text(encoding, data)
+        if frame_id == 'TCON' and values:
+            # mutagen normalises genres on load (ID3.update_to_v24)
+            genre = FastTagReader.GENRE_FRAME(encoding=3, text=values)
+            genre.genres = genre.genres
+            return str(genre)
+        return '\x00'.join(values)
+
+    @staticmethod
+    def locate_apic(f, version, payload_offset, size, result):
+        header = f.read(min(size, FastTagReader.PICTURE_HEADER))
+        encoding = header[0]
+        if version == 2:
+            # Three-character image format instead of a MIME type
+            mime = 'image/' + header[1:4].decode('latin-1').lower().replace('jpg', 'jpeg')
+            rest = header[4:]
+        else:
+            raw_mime, rest = FastTagReader.split_terminated(0, header[1:])
+            if raw_mime is None:
+                return
+            mime = raw_mime.decode('latin-1') or 'image/'
+        # Picture type, then the description
+        description, rest = FastTagReader.split_terminated(encoding, rest[1:])
+        if description is None:
+            return  # Description longer than the bounded header read
+        data_offset = payload_offset + (len(header) - len(rest))
+        result['art_offset'] = data_offset
+        result['art_length'] = payload_offset + size - data_offset
+        result['art_mime'] = mime
+
+    @staticmethod
+    def read_flac(f):
+        f.seek(4)
+        result = FastTagReader.empty_result()
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                break
+            block_type = header[0] & 0x7F
+            size = int.from_bytes(header[1:4], 'big')
+            block_offset = f.tell()
+            if block_type == FastTagReader.FLAC_VORBIS_COMMENT:
+                FastTagReader.parse_vorbis_comment(f.read(size), result['tags'])
+            elif block_type == FastTagReader.FLAC_PICTURE and not result['has_art']:
+                result['has_art'] = True
+                FastTagReader.locate_flac_picture(f, block_offset, size, result)
+            if header[0] & 0x80:
+                break  # last metadata block
+            f.seek(block_offset + size)
+        return result
+
+    @staticmethod
+    def parse_vorbis_comment(block, tags):
+        vendor_length = struct.unpack('<I', block[:4])[0]
+        position = 4 + vendor_length
+        count = struct.unpack('<I', block[position:position + 4])[0]
+        position += 4
+        for _ in range(count):
+            length = struct.unpack('<I', block[position:position + 4])[0]
+            position += 4
+            comment = block[position:position + length]
+            position += length
+            key, _, value = comment.partition(b'=')
+            tag_name = FastTagReader.VORBIS_TAGS.get(key.decode('ascii', 'replace').lower())
+            if tag_name and tag_name not in tags and value:
+                # First value only, as TagDefinitions.get_all_values does
+                tags[tag_name] = value.decode('utf-8', 'replace')
+
+    @staticmethod
+    def locate_flac_picture(f, block_offset, size, result):
+        header = f.read(min(size, FastTagReader.PICTURE_HEADER))
+        mime_length = struct.unpack('>I', header[4:8])[0]
+        mime = header[8:8 + mime_length].decode('ascii', 'replace')
+        position = 8 + mime_length
+        description_length = struct.unpack('>I', header[position:position + 4])[0]
+        # Width, height, depth and colours follow the description
+        position += 4 + description_length + 16
+        if position + 4 > len(header):
+            return
+        data_length = struct.unpack('>I', header[position:position + 4])[0]
+        result['art_offset'] = block_offset + position + 4
+        result['art_length'] = data_length
+        result['art_mime'] = mime
+
+    @staticmethod
+    def read_wave(f):
+        """Find the ID3 chunk of a RIFF/WAVE file by hopping chunk headers"""
+        header = f.read(12)
+        if header[8:12] != b'WAVE':
+            return None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return FastTagReader.empty_result()
+            size = struct.unpack('<I', chunk[4:8])[0]
+            if chunk[:4].lower() == b'id3 ':
+                return FastTagReader.read_id3(f)
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+    @staticmethod
+    def ogg_packet_runs(f, packet_index):
+        """(file offset, length) of the pieces of one logical packet of the
+        first Ogg stream, walking page headers and seeking past page bodies"""
+        serial = None
+        packet = 0
+        position = 0
+        while True:
+            f.seek(position)
+            header = f.read(27)
+            if len(header) < 27 or header[:4] != b'OggS':
+                return
+            table = f.read(header[26])
+            offset = f.tell()
+            position = offset + sum(table)
+            if serial is None:
+                serial = header[14:18]
+            elif header[14:18] != serial:
+                continue
+            if packet == packet_index and table.count(255) == len(table):
+                # The packet carries on through the whole page
+                yield offset, position - offset
+                continue
+            run_start = offset
+            run_length = 0
+            for lace in table:
+                run_length += lace
+                if lace < 255:
+                    if packet == packet_index:
+                        yield run_start, run_length
+                        return
+                    packet += 1
+                    run_start += run_length
+                    run_length = 0
+            if run_length and packet == packet_index:
+                yield run_start, run_length
+
+    @staticmethod
+    def read_ogg(f):
+        """Vorbis comments from the second packet of an Ogg Vorbis or Opus
+        stream; large comments (embedded pictures) are skipped by length"""
+        # Pages are small and mostly skipped, so read around the buffer
+        # rather than refilling it with picture data at every page
+        f = f.raw
+        runs = FastTagReader.ogg_packet_runs(f, 1)
+        current = [0, 0]
+
+        def take(count, keep=True):
+            data = []
+            while count > 0:
+                if current[1] == 0:
+                    run = next(runs, None)
+                    if run is None:
+                        break
+                    current[0], current[1] = run
+                length = min(count, current[1])
+                if keep:
+                    f.seek(current[0])
+                    data.append(f.read(length))
+                current[0] += length
+                current[1] -= length
+                count -= length
+            return b''.join(data)
+
+        magic = take(8)
+        if magic[:7] == FastTagReader.OGG_COMMENT_HEADERS[0]:
+            # Vorbis' header id is one byte shorter than Opus'
+            vendor_length = struct.unpack('<I', magic[7:8] + take(3))[0]
+        elif magic == FastTagReader.OGG_COMMENT_HEADERS[1]:
+            vendor_length = struct.unpack('<I', take(4))[0]
+        else:
+            return None
+        take(vendor_length, keep=False)
+        result = FastTagReader.empty_result()
+        tags = result['tags']
+        count = struct.unpack('<I', take(4))[0]
+        for _ in range(count):
+            length = struct.unpack('<I', take(4))[0]
+            head = take(min(length, 64))
+            key = head.partition(b'=')[0].decode('ascii', 'replace').lower()
+            tag_name = FastTagReader.VORBIS_TAGS.get(key)
+            if key == 'metadata_block_picture':
+                # Base64 inside the packet, so there is no raw offset to hand out
+                result['has_art'] = True
+            if tag_name and tag_name not in tags and length <= FastTagReader.MAX_TEXT_FRAME:
+                value = (head + take(length - len(head))).partition(b'=')[2]
+                if value:
+                    tags[tag_name] = value.decode('utf-8', 'replace')
+            else:
+                take(length - len(head), keep=False)
+        return result
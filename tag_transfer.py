@@ -0,0 +1,324 @@
+# tag_transfer.py
+import csv
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+import mutagen
+from PyQt6.QtCore import QThread, pyqtSignal
+from tag_definitions import TagDefinitions
+from tag_reader import FastTagReader
+from tag_writer import TagWriter
+from art_utils import ArtUtils
+from config import TransferSettings
+from tracing import Tracer
+
+class TagTransfer:
+    """Tags of many files as CSV or JSON Lines rows: one row per file, with
+    a Path column, a column per TagDefinitions tag and the SHA-1 of the
+    cover art (exported for reference, ignored on import).
+
+    Both directions stream: rows are read, diffed and written in chunks
+    handled by a thread pool, so memory stays flat however many rows there
+    are. Tags are read with FastTagReader, which seeks past pictures, and a
+    file is only rewritten when an imported row differs from its current
+    tags, and then only in the tags that differ.
+    """
+    PATH_COLUMN = "Path"
+    ART_COLUMN = "Art SHA1"
+    TAG_COLUMNS = list(TagDefinitions.TAG_FRAMES)
+    COLUMNS = [PATH_COLUMN] + TAG_COLUMNS + [ART_COLUMN]
+    VALIDATORS = {
+        'Year': re.compile(r'\d{4}(-\d{2}(-\d{2}([T ][\d:]+)?)?)?$'),
+        'Track': re.compile(r'\d+(/\d+)?$'),
+        'Disc': re.compile(r'\d+(/\d+)?$'),
+        'BPM': re.compile(r'\d+(\.\d+)?$')
+    }
+
+    @staticmethod
+    def format_for_path(path):
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in TransferSettings.FORMATS.values():
+            raise ValueError(f"Unknown tag file type: {ext or path}")
+        return ext
+
+    @staticmethod
+    def chunks(items, size=TransferSettings.CHUNK_SIZE):
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def read_values(file_path, with_art=False):
+        """({tag_name: [values]}, art SHA-1 or None) of a file"""
+        fast = FastTagReader.read(file_path)
+        if fast is not None:
+            tags = {tag_name: value.split('\0') for tag_name, value in fast['tags'].items()}
+            art_hash = None
+            if with_art and fast['has_art']:
+                data = FastTagReader.read_art(file_path, fast)
+                art_hash = ArtUtils.content_hash(data) if data else None
+            return tags, art_hash
+
+        with Tracer.span("tags.load"):
+            audio = mutagen.File(file_path)
+        if audio is None:
+            raise ValueError("Unsupported file type")
+        tags = {tag_name: value.split('\0')
+                for tag_name, value in TagDefinitions.get_all_values(audio).items()}
+        art_hash = None
+        if with_art:
+            pictures = TagWriter.get_pictures(audio)
+            art_hash = ArtUtils.content_hash(pictures[0][0]) if pictures else None
+        return tags, art_hash
+
+    @staticmethod
+    def to_row(file_path, tags, art_hash, ext):
+        """Export row of a file; CSV cells join multiple values, JSON keeps
+        single values as strings and multiple values as lists"""
+        row = {TagTransfer.PATH_COLUMN: file_path}
+        for tag_name in TagTransfer.TAG_COLUMNS:
+            values = tags.get(tag_name, [])
+            if ext == ".csv":
+                row[tag_name] = TransferSettings.CSV_SEPARATOR.join(values)
+            else:
+                row[tag_name] = values[0] if len(values) == 1 else (values or "")
+        row[TagTransfer.ART_COLUMN] = art_hash or ""
+        return row
+
+    @staticmethod
+    def parse_cell(value, ext):
+        """[values] of a cell as read from a tag file; empty means no tag"""
+        if value is None:
+            return []
+        if isinstance(value, list):
+            values = [str(item).strip() for item in value]
+        elif ext == ".csv":
+            values = [item.strip() for item in value.split(TransferSettings.CSV_SEPARATOR.strip())]
+        else:
+            values = [str(value).strip()]
+        return [item for item in values if item]
+
+    @staticmethod
+    def read_rows(f, ext):
+        """(row number, {column: cell}) of every row of an open tag file, as a
+        generator; raises ValueError for unknown columns before the first row"""
+        if ext == ".csv":
+            reader = csv.DictReader(f)
+            TagTransfer.check_columns(reader.fieldnames or [])
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, {'error': f"Invalid JSON: {e}"}
+                continue
+            if not isinstance(row, dict):
+                yield line_number, {'error': "Row is not a JSON object"}
+                continue
+            TagTransfer.check_columns(row.keys(), line_number)
+            yield line_number, row
+
+    @staticmethod
+    def check_columns(columns, line_number=None):
+        unknown = [column for column in columns if column not in TagTransfer.COLUMNS]
+        where = f" on line {line_number}" if line_number else ""
+        if unknown:
+            raise ValueError(f"Unknown columns{where}: {', '.join(unknown)}")
+        if TagTransfer.PATH_COLUMN not in columns:
+            raise ValueError(f"Missing {TagTransfer.PATH_COLUMN} column{where}")
+
+    @staticmethod
+    def desired_tags(row, ext):
+        """{tag_name: [values]} for the tag columns present in a row; raises
+        ValueError for values a tag can't hold"""
+        tags = {}
+        for tag_name in TagTransfer.TAG_COLUMNS:
+            if tag_name not in row:
+                continue
+            values = TagTransfer.parse_cell(row[tag_name], ext)
+            validator = TagTransfer.VALIDATORS.get(tag_name)
+            for value in values:
+                if validator and not validator.match(value):
+                    raise ValueError(f"Invalid {tag_name}: {value!r}")
+            tags[tag_name] = values
+        return tags
+
+    @staticmethod
+    def diff(current, desired):
+        """Tags in desired whose values differ from current"""
+        return {tag_name: values for tag_name, values in desired.items()
+                if values != current.get(tag_name, [])}
+
+
+class TagExportThread(QThread):
+    """Write the tags of files to a CSV or JSON Lines file"""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, files, save_path, workers=TransferSettings.WORKERS):
+        super().__init__()
+        self.files = files
+        self.save_path = save_path
+        self.workers = workers
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def read_row(self, file_path):
+        try:
+            tags, art_hash = TagTransfer.read_values(file_path, with_art=True)
+            return TagTransfer.to_row(file_path, tags, art_hash, self.ext), None
+        except Exception as e:
+            return None, f"{file_path}: {e}"
+
+    @Tracer.traced("tags.export")
+    def run(self):
+        errors = []
+        written = 0
+        try:
+            self.ext = TagTransfer.format_for_path(self.save_path)
+            self.status.emit(f"Exporting tags of {len(self.files)} files...")
+            with open(self.save_path, 'w', encoding='utf-8', newline='') as f, \
+                    ThreadPoolExecutor(max_workers=self.workers) as pool:
+                writer = None
+                if self.ext == ".csv":
+                    writer = csv.DictWriter(f, fieldnames=TagTransfer.COLUMNS)
+                    writer.writeheader()
+                for chunk in TagTransfer.chunks(self.files):
+                    if self.cancelled:
+                        self.finished.emit(False, "Cancelled")
+                        return
+                    for row, error in pool.map(self.read_row, chunk):
+                        if error:
+                            errors.append(error)
+                        elif writer:
+                            writer.writerow(row)
+                        else:
+                            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                    written += len(chunk)
+                    self.progress.emit(int(written / len(self.files) * 100))
+        except Exception as e:
+            print(f"Error exporting tags: {e}")
+            self.finished.emit(False, str(e))
+            return
+
+        exported = written - len(errors)
+        if errors:
+            self.finished.emit(False, f"Exported {exported} files.\n\nErrors:\n" + "\n".join(errors))
+        else:
+            self.finished.emit(True, f"Exported tags of {exported} files to {os.path.basename(self.save_path)}")
+
+
+class TagImportThread(QThread):
+    """Apply an edited tag file: every row is validated and compared with the
+    file's current tags, and only the tags that differ are written. Rows
+    that fail are listed in report_path (default: the tag file's name with
+    .errors.csv), as row number, path and error."""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, import_path, dry_run=False, report_path=None, workers=TransferSettings.WORKERS):
+        super().__init__()
+        self.import_path = import_path
+        self.dry_run = dry_run
+        self.report_path = report_path or os.path.splitext(import_path)[0] + ".errors.csv"
+        self.workers = workers
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def apply_row(self, item):
+        """(row number, path, changed tag names or None, error or None)"""
+        line_number, row, file_path = item
+        try:
+            if 'error' in row:
+                raise ValueError(row['error'])
+            desired = TagTransfer.desired_tags(row, self.ext)
+            current, _ = TagTransfer.read_values(file_path)
+            changes = TagTransfer.diff(current, desired)
+            if changes and not self.dry_run:
+                TagWriter.set_tag_values(file_path, changes)
+            return line_number, file_path, sorted(changes), None
+        except Exception as e:
+            return line_number, file_path, None, str(e)
+
+    def resolve_rows(self, f, errors):
+        """Rows with their absolute path; rows without a usable path go
+        straight to errors"""
+        base_dir = os.path.dirname(os.path.abspath(self.import_path))
+        seen = {}
+        for line_number, row in TagTransfer.read_rows(f, self.ext):
+            path = row.get(TagTransfer.PATH_COLUMN) or ""
+            if 'error' not in row:
+                if not path:
+                    errors.append((line_number, path, "Missing path"))
+                    continue
+                path = os.path.normpath(os.path.join(base_dir, os.path.expanduser(path)))
+                if path in seen:
+                    errors.append((line_number, path, f"Duplicate of line {seen[path]}"))
+                    continue
+                if not os.path.isfile(path):
+                    errors.append((line_number, path, "File not found"))
+                    continue
+                seen[path] = line_number
+            yield line_number, row, path
+
+    @Tracer.traced("tags.import")
+    def run(self):
+        errors = []
+        changed = unchanged = 0
+        try:
+            self.ext = TagTransfer.format_for_path(self.import_path)
+            total = max(1, os.path.getsize(self.import_path))
+            self.status.emit(f"{'Checking' if self.dry_run else 'Importing'} {os.path.basename(self.import_path)}...")
+            with open(self.import_path, 'r', encoding='utf-8-sig', newline='') as f, \
+                    ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for chunk in TagTransfer.chunks(self.resolve_rows(f, errors)):
+                    if self.cancelled:
+                        break
+                    for line_number, file_path, changes, error in pool.map(self.apply_row, chunk):
+                        if error:
+                            errors.append((line_number, file_path, error))
+                        elif changes:
+                            changed += 1
+                        else:
+                            unchanged += 1
+                    # The byte offset runs a read-ahead buffer in front of the rows
+                    self.progress.emit(min(100, int(f.buffer.tell() / total * 100)))
+        except Exception as e:
+            print(f"Error importing tags: {e}")
+            self.finished.emit(False, str(e))
+            return
+
+        verb = "would change" if self.dry_run else "changed"
+        message = f"{changed} files {verb}, {unchanged} already up to date"
+        if self.cancelled:
+            message = "Cancelled: " + message
+        if errors:
+            errors.sort()
+            self.write_report(errors)
+            message += f", {len(errors)} rows failed (see {os.path.basename(self.report_path)})"
+        self.finished.emit(not errors and not self.cancelled, message)
+
+    def write_report(self, errors):
+        try:
+            with open(self.report_path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(["Row", "Path", "Error"])
+                writer.writerows(errors)
+        except OSError as e:
+            print(f"Error writing import report: {e}")
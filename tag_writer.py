@@ -0,0 +1,174 @@
+# tag_writer.py
+import base64
+import os
+import mutagen
+from mutagen._vorbis import VComment
+from mutagen.id3 import ID3, APIC, ID3NoHeaderError
+from mutagen.flac import Picture
+from mutagen.mp4 import MP4Cover
+from art_utils import ArtUtils
+from tag_definitions import TagDefinitions
+from tracing import Tracer
+
+class TagWriter:
+    VORBIS_PICTURE = 'metadata_block_picture'
+    MP4_COVER_FORMATS = {
+        'image/jpeg': MP4Cover.FORMAT_JPEG,
+        'image/png': MP4Cover.FORMAT_PNG
+    }
+
+    @staticmethod
+    def get_pictures(audio):
+        """Return (data, mime) of every embedded picture in a mutagen file"""
+        pictures = []
+        if audio is None:
+            return pictures
+
+        # Handle MP3 (and other ID3 tagged files)
+        if isinstance(audio.tags, ID3):
+            pictures.extend((frame.data, frame.mime) for frame in audio.tags.getall('APIC'))
+
+        # Handle FLAC
+        elif hasattr(audio, 'pictures'):
+            pictures.extend((pic.data, pic.mime) for pic in audio.pictures)
+
+        # Handle Ogg Vorbis/Opus
+        elif audio.tags is not None and TagWriter.VORBIS_PICTURE in audio.tags:
+            for value in audio.tags[TagWriter.VORBIS_PICTURE]:
+                pic = Picture(base64.b64decode(value))
+                pictures.append((pic.data, pic.mime))
+
+        # Handle M4A
+        elif audio.tags is not None and 'covr' in audio.tags:
+            for cover in audio.tags['covr']:
+                mime = 'image/png' if cover.imageformat == MP4Cover.FORMAT_PNG else 'image/jpeg'
+                pictures.append((bytes(cover), mime))
+
+        return pictures
+
+    @staticmethod
+    def replace_pictures(audio, convert):
+        """Replace embedded pictures in place without saving. convert(data, mime)
+        returns (data, mime) for a replacement or None to keep the picture.
+        Returns the number of pictures replaced."""
+        replaced = 0
+        if audio is None:
+            return replaced
+
+        if isinstance(audio.tags, ID3):
+            for frame in audio.tags.getall('APIC'):
+                result = convert(frame.data, frame.mime)
+                if result:
+                    frame.data, frame.mime = result
+                    replaced += 1
+
+        elif hasattr(audio, 'pictures'):
+            for pic in audio.pictures:
+                if TagWriter.update_picture(pic, convert):
+                    replaced += 1
+
+        elif audio.tags is not None and TagWriter.VORBIS_PICTURE in audio.tags:
+            values = []
+            for value in audio.tags[TagWriter.VORBIS_PICTURE]:
+                pic = Picture(base64.b64decode(value))
+                if TagWriter.update_picture(pic, convert):
+                    value = base64.b64encode(pic.write()).decode('ascii')
+                    replaced += 1
+                values.append(value)
+            audio.tags[TagWriter.VORBIS_PICTURE] = values
+
+        elif audio.tags is not None and 'covr' in audio.tags:
+            covers = []
+            for cover in audio.tags['covr']:
+                mime = 'image/png' if cover.imageformat == MP4Cover.FORMAT_PNG else 'image/jpeg'
+                result = convert(bytes(cover), mime)
+                # MP4 covers can only hold JPEG or PNG
+                if result and result[1] in TagWriter.MP4_COVER_FORMATS:
+                    cover = MP4Cover(result[0], TagWriter.MP4_COVER_FORMATS[result[1]])
+                    replaced += 1
+                covers.append(cover)
+            audio.tags['covr'] = covers
+
+        return replaced
+
+    @staticmethod
+    def update_picture(pic, convert):
+        """Apply convert to a FLAC Picture block, keeping its dimensions current"""
+        result = convert(pic.data, pic.mime)
+        if not result:
+            return False
+        pic.data, pic.mime = result
+        pic.width, pic.height = ArtUtils.image_size(pic.data)
+        return True
+
+    @staticmethod
+    def prepare_id3_changes(updates, art_path=None, replace_art=False):
+        """(frames, art frame) for a batch edit. updates maps tag names from
+        TagDefinitions to their new text; empty values are left alone. The
+        art frame is only built when replacing art with art_path."""
+        frames = [TagDefinitions.create_tag(tag_name, value)
+                  for tag_name, value in updates.items() if value]
+        frames = [frame for frame in frames if frame]
+        art_frame = None
+        if replace_art and art_path:
+            with open(art_path, 'rb') as art:
+                art_frame = APIC(
+                    encoding=3,
+                    mime=f'image/{os.path.splitext(art_path)[1][1:]}',
+                    type=3,
+                    desc='Cover',
+                    data=art.read()
+                )
+        return frames, art_frame
+
+    @staticmethod
+    def apply_id3_changes(file_path, frames, replace_art=False, art_frame=None):
+        """Add frames to the file's ID3 tag and save it. With replace_art set,
+        existing art is removed and art_frame (if any) embedded instead."""
+        with Tracer.span("tags.load"):
+            try:
+                tags = ID3(file_path)
+            except ID3NoHeaderError:
+                tags = ID3()
+        for frame in frames:
+            tags.add(frame)
+        if replace_art:
+            tags.delall("APIC")
+            if art_frame is not None:
+                tags.add(art_frame)
+        with Tracer.span("tags.save"):
+            tags.save(file_path)
+
+    @staticmethod
+    def set_tag_values(file_path, changes):
+        """Set tags of an ID3 or Vorbis comment (FLAC, Ogg) file and save it.
+        changes maps tag names from TagDefinitions to lists of values; an
+        empty list removes the tag. Other tags are left alone."""
+        audio = mutagen.File(file_path)
+        if audio is None:
+            raise ValueError("Unsupported file type")
+        if audio.tags is None:
+            audio.add_tags()
+        if isinstance(audio.tags, ID3):
+            for tag_name, values in changes.items():
+                frame_id = TagDefinitions.TAG_FRAMES[tag_name][0]
+                if frame_id == 'COMM':
+                    # Only the plain comment; described ones belong to other apps
+                    for key in [key for key, frame in audio.tags.items()
+                                if key.startswith('COMM') and not frame.desc]:
+                        del audio.tags[key]
+                else:
+                    audio.tags.delall(frame_id)
+                if values:
+                    audio.tags.add(TagDefinitions.create_tag(tag_name, values))
+        elif isinstance(audio.tags, VComment):
+            for tag_name, values in changes.items():
+                field = TagDefinitions.VORBIS_FIELDS[tag_name]
+                if values:
+                    audio.tags[field] = values
+                elif field in audio.tags:
+                    del audio.tags[field]
+        else:
+            raise ValueError("Unsupported tag format")
+        with Tracer.span("tags.save"):
+            audio.save()
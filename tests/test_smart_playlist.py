@@ -0,0 +1,45 @@
+# test_smart_playlist.py
+from smart_playlist import LibraryIndex, SmartQuery, SmartPlaylist
+
+GENRES = ["House", "Deep House", "House Music", "Housey", "Tech\0House Music", "Rock\0House", ""]
+
+def make_index():
+    index = LibraryIndex()
+    for number, genre in enumerate(GENRES):
+        index.put(f"/music/{number}.mp3", {
+            'size': 1000, 'mtime': 0.0, 'added': 0.0, 'duration': 200.0, 'bitrate': 320,
+            'tags': {'Genre': genre} if genre else {}
+        })
+    return index
+
+def matches(text):
+    return SmartQuery(text)(make_index()).tolist()
+
+def test_equality_is_exact():
+    assert matches('genre = house') == [True, False, False, False, False, True, False]
+    assert matches('genre = "House Music"') == [False, False, True, False, True, False, False]
+
+def test_equality_matches_any_value():
+    assert matches('genre = tech') == [False, False, False, False, True, False, False]
+    assert matches('genre = rock') == [False, False, False, False, False, True, False]
+
+def test_in_is_exact():
+    assert matches('genre in (housey, "deep house")') == [False, True, False, True, False, False, False]
+
+def test_not_equal_is_exact():
+    assert matches('genre != house') == [False, True, True, True, True, False, True]
+
+def test_contains_still_matches_substrings():
+    assert matches('genre ~ house') == [True, True, True, True, True, True, False]
+
+def test_path_equality_is_exact():
+    assert matches('path = /music/1.mp3') == [False, True, False, False, False, False, False]
+
+def test_incremental_update_agrees():
+    index = make_index()
+    playlist = SmartPlaylist('genre = house')
+    playlist.evaluate(index)
+    assert playlist.members == {"/music/0.mp3", "/music/5.mp3"}
+    index.put("/music/2.mp3", dict(index.records["/music/2.mp3"], tags={'Genre': "house"}))
+    assert playlist.update(index, ["/music/2.mp3"])
+    assert playlist.members == {"/music/0.mp3", "/music/2.mp3", "/music/5.mp3"}
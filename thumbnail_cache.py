@@ -0,0 +1,136 @@
+# thumbnail_cache.py
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtGui import QPixmap
+from file_manager import FileManager
+from config import ThumbnailSettings
+
+class ThumbnailCache:
+    """Process-wide LRU of scaled art pixmaps, bounded by a memory budget.
+    Views keep only file paths and look pixmaps up here when they paint, so
+    memory stays bounded no matter how many rows they hold."""
+    MISSING = object()
+    ENTRY_COST = 256
+    entries = OrderedDict()
+    bytes_used = 0
+    budget = ThumbnailSettings.PIXMAP_BUDGET_MB * 1024 * 1024
+
+    @staticmethod
+    def cost(pixmap):
+        if pixmap is ThumbnailCache.MISSING:
+            return ThumbnailCache.ENTRY_COST
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8) + ThumbnailCache.ENTRY_COST
+
+    @staticmethod
+    def get(file_path, size):
+        """Cached pixmap, MISSING for files without art, or None if not loaded"""
+        key = (file_path, size)
+        pixmap = ThumbnailCache.entries.get(key)
+        if pixmap is not None:
+            ThumbnailCache.entries.move_to_end(key)
+        return pixmap
+
+    @staticmethod
+    def put(file_path, size, pixmap):
+        key = (file_path, size)
+        if pixmap is None or pixmap.isNull():
+            pixmap = ThumbnailCache.MISSING
+        if key in ThumbnailCache.entries:
+            ThumbnailCache.bytes_used -= ThumbnailCache.cost(ThumbnailCache.entries.pop(key))
+        ThumbnailCache.entries[key] = pixmap
+        ThumbnailCache.bytes_used += ThumbnailCache.cost(pixmap)
+        ThumbnailCache.evict()
+        return pixmap
+
+    @staticmethod
+    def evict():
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while ThumbnailCache.bytes_used > ThumbnailCache.budget and len(ThumbnailCache.entries) > 1:
+            _, pixmap = ThumbnailCache.entries.popitem(last=False)
+            ThumbnailCache.bytes_used -= ThumbnailCache.cost(pixmap)
+
+    @staticmethod
+    def set_budget(megabytes):
+        ThumbnailCache.budget = int(megabytes * 1024 * 1024)
+        ThumbnailCache.evict()
+
+    @staticmethod
+    def invalidate(file_path):
+        """Drop every cached size of a file, e.g. after its art changed"""
+        for key in [key for key in ThumbnailCache.entries if key[0] == file_path]:
+            ThumbnailCache.bytes_used -= ThumbnailCache.cost(ThumbnailCache.entries.pop(key))
+
+    @staticmethod
+    def rename(old_path, new_path):
+        """Keep a renamed file's pixmaps; its art is unchanged"""
+        for key in [key for key in ThumbnailCache.entries if key[0] == old_path]:
+            ThumbnailCache.entries[(new_path, key[1])] = ThumbnailCache.entries.pop(key)
+
+    @staticmethod
+    def load(file_path, size):
+        """Cached pixmap, decoding it on a miss; None for files without art.
+        Runs on the GUI thread, use ThumbnailLoader for long lists."""
+        pixmap = ThumbnailCache.get(file_path, size)
+        if pixmap is None:
+            image = FileManager.extract_thumbnail(file_path, size)
+            pixmap = ThumbnailCache.put(file_path, size, QPixmap.fromImage(image) if image else None)
+        return None if pixmap is ThumbnailCache.MISSING else pixmap
+
+
+class ThumbnailLoader(QThread):
+    """Decodes scaled art off the GUI thread, newest requests first so the
+    rows currently on screen are served before ones scrolled past. Up to
+    `workers` decodes run at once, which mostly hides per-file latency on
+    network libraries."""
+    loaded = pyqtSignal(str, int, object)
+
+    def __init__(self, workers=ThumbnailSettings.LOADER_WORKERS, parent=None):
+        super().__init__(parent)
+        self.workers = max(1, workers)
+        self.requests = queue.LifoQueue()
+        self.pending = set()
+        self.loaded.connect(self.store)
+
+    def request(self, file_path, size):
+        key = (file_path, size)
+        if key in self.pending:
+            return
+        self.pending.add(key)
+        self.requests.put(key)
+        if not self.isRunning():
+            self.start()
+
+    def store(self, file_path, size, image):
+        # Back on the GUI thread: QPixmap may only be created here
+        self.pending.discard((file_path, size))
+        ThumbnailCache.put(file_path, size, QPixmap.fromImage(image) if image else None)
+
+    def stop(self):
+        self.requests.put(None)
+        self.wait()
+
+    def load(self, key, slots):
+        file_path, size = key
+        try:
+            image = FileManager.extract_thumbnail(file_path, size)
+        except Exception as e:
+            print(f"Error loading thumbnail for {file_path}: {e}")
+            image = None
+        finally:
+            slots.release()
+        self.loaded.emit(file_path, size, image)
+
+    def run(self):
+        # Only take a request off the LIFO queue when a worker is free, so
+        # the newest requests still go first
+        slots = threading.Semaphore(self.workers)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                slots.acquire()
+                key = self.requests.get()
+                if key is None:
+                    break
+                pool.submit(self.load, key, slots)
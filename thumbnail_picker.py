@@ -0,0 +1,130 @@
+# thumbnail_picker.py
+import os
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QListWidget, QListWidgetItem,
+    QListView, QProgressBar, QDialogButtonBox, QStyle)
+from PyQt6.QtCore import Qt, QSize, QThread, pyqtSignal
+from PyQt6.QtGui import QIcon, QPixmap
+from file_manager import FileManager
+from art_utils import ArtUtils
+
+class ArtGroupingThread(QThread):
+    """Groups files by embedded art content hash, decoding each distinct
+    image once at the preview size"""
+    progress = pyqtSignal(int)
+    group_found = pyqtSignal(str, str, object)
+    group_counted = pyqtSignal(str, str)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, files, size):
+        super().__init__()
+        self.files = files
+        self.size = size
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        seen = set()
+        total = len(self.files) or 1
+        for index, file_path in enumerate(self.files):
+            if self.cancelled:
+                self.finished.emit(False, "Cancelled")
+                return
+            data, _ = FileManager.get_art_data(file_path)
+            if data:
+                art_hash = ArtUtils.content_hash(data)
+                if art_hash in seen:
+                    self.group_counted.emit(art_hash, file_path)
+                else:
+                    seen.add(art_hash)
+                    self.group_found.emit(art_hash, file_path, ArtUtils.decode_scaled(data, self.size))
+            self.progress.emit(int((index + 1) * 100 / total))
+        self.finished.emit(True, f"{len(seen)} distinct covers")
+
+
+class ThumbnailPickerDialog(QDialog):
+    ICON_SIZE = 128
+
+    def __init__(self, files, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Select Thumbnail Source")
+        self.setMinimumSize(560, 420)
+        self.files = files
+        # Content hash -> (list item, files sharing that cover)
+        self.groups = {}
+        self.setup_ui()
+
+        self.thread = ArtGroupingThread(files, self.ICON_SIZE)
+        self.thread.progress.connect(self.progress_bar.setValue)
+        self.thread.group_found.connect(self.add_group)
+        self.thread.group_counted.connect(self.count_file)
+        self.thread.finished.connect(self.grouping_finished)
+        self.thread.start()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        self.info_label = QLabel(f"Reading album art from {len(self.files)} files...")
+        layout.addWidget(self.info_label)
+
+        self.cover_list = QListWidget()
+        self.cover_list.setViewMode(QListView.ViewMode.IconMode)
+        self.cover_list.setIconSize(QSize(self.ICON_SIZE, self.ICON_SIZE))
+        self.cover_list.setResizeMode(QListView.ResizeMode.Adjust)
+        self.cover_list.setMovement(QListView.Movement.Static)
+        self.cover_list.setUniformItemSizes(True)
+        self.cover_list.setSpacing(8)
+        self.cover_list.itemDoubleClicked.connect(self.accept)
+        layout.addWidget(self.cover_list)
+
+        self.progress_bar = QProgressBar()
+        layout.addWidget(self.progress_bar)
+
+        button_box = QDialogButtonBox(
+            QDialogButtonBox.StandardButton.Ok |
+            QDialogButtonBox.StandardButton.Cancel
+        )
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def add_group(self, art_hash, file_path, image):
+        item = QListWidgetItem()
+        if image is not None:
+            item.setIcon(QIcon(QPixmap.fromImage(image)))
+        else:
+            item.setIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_MediaPlay))
+        item.setData(Qt.ItemDataRole.UserRole, file_path)
+        self.cover_list.addItem(item)
+        self.groups[art_hash] = (item, [file_path])
+        self.update_item(art_hash)
+        if self.cover_list.count() == 1:
+            self.cover_list.setCurrentItem(item)
+
+    def count_file(self, art_hash, file_path):
+        self.groups[art_hash][1].append(file_path)
+        self.update_item(art_hash)
+
+    def update_item(self, art_hash):
+        item, files = self.groups[art_hash]
+        item.setText(f"{len(files)} file{'s' if len(files) != 1 else ''}")
+        names = [os.path.basename(file) for file in files[:10]]
+        if len(files) > 10:
+            names.append(f"... and {len(files) - 10} more")
+        item.setToolTip("\n".join(names))
+
+    def grouping_finished(self, success, message):
+        self.progress_bar.setVisible(False)
+        if not self.groups:
+            self.info_label.setText("No album art found in the input files.")
+        else:
+            self.info_label.setText(f"Choose thumbnail source for combined file ({message}):")
+
+    def done(self, result):
+        self.thread.cancel()
+        self.thread.wait()
+        super().done(result)
+
+    def get_thumbnail_source(self):
+        item = self.cover_list.currentItem()
+        return item.data(Qt.ItemDataRole.UserRole) if item else None
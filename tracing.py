@@ -0,0 +1,205 @@
+# tracing.py
+import atexit
+import json
+import os
+import threading
+import time
+import numpy as np
+from config import TraceSettings
+
+class Span:
+    """A timed region; add() attaches counts such as bytes written"""
+    __slots__ = ('name', 'args', 'start', 'io_start')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def add(self, key, value):
+        self.args[key] = self.args.get(key, 0) + value
+
+    def __enter__(self):
+        self.io_start = Tracer.bytes_read()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        io_end = Tracer.bytes_read()
+        if io_end is not None and self.io_start is not None:
+            self.args['bytes_read'] = io_end - self.io_start
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        Tracer.record(self.name, self.start, end - self.start, self.args)
+        return False
+
+
+class NullSpan:
+    """Shared no-op span used while tracing is off"""
+    __slots__ = ()
+
+    def add(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class Tracer:
+    """Process-wide spans and counters. Off by default: set the environment
+    variable in TraceSettings.ENV_VAR to an output path, or pass --trace on
+    the command line. Writes a Chrome trace-event JSON (chrome://tracing,
+    Perfetto) and a .summary.json with per-operation percentiles."""
+    enabled = False
+    output_path = None
+    lock = threading.Lock()
+    events = []
+    dropped = 0
+    durations = {}
+    span_bytes = {}
+    counters = {}
+    thread_names = {}
+    origin = time.perf_counter_ns()
+    NULL_SPAN = NullSpan()
+    IO_PATH = '/proc/thread-self/io'
+    has_io = os.path.exists(IO_PATH)
+
+    @staticmethod
+    def enable(output_path=None):
+        Tracer.enabled = True
+        if output_path and Tracer.output_path is None:
+            atexit.register(Tracer.save)
+        Tracer.output_path = output_path or Tracer.output_path
+
+    @staticmethod
+    def enable_from_environment():
+        path = os.environ.get(TraceSettings.ENV_VAR)
+        if path:
+            Tracer.enable(path)
+
+    @staticmethod
+    def span(name, **args):
+        if not Tracer.enabled:
+            return Tracer.NULL_SPAN
+        return Span(name, args)
+
+    @staticmethod
+    def traced(name):
+        """Decorator form of span()"""
+        def decorate(func):
+            def wrapper(*args, **kwargs):
+                if not Tracer.enabled:
+                    return func(*args, **kwargs)
+                with Span(name, {}):
+                    return func(*args, **kwargs)
+            wrapper.__name__ = func.__name__
+            wrapper.__doc__ = func.__doc__
+            return wrapper
+        return decorate
+
+    @staticmethod
+    def count(name, value=1):
+        if not Tracer.enabled:
+            return
+        with Tracer.lock:
+            total = Tracer.counters.get(name, 0) + value
+            Tracer.counters[name] = total
+            Tracer.append_event({'name': name, 'ph': 'C', 'ts': Tracer.timestamp(time.perf_counter_ns()),
+                                 'pid': os.getpid(), 'args': {'value': total}})
+
+    @staticmethod
+    def bytes_read():
+        """Bytes read by the calling thread so far (Linux only), else None"""
+        if not Tracer.has_io:
+            return None
+        try:
+            with open(Tracer.IO_PATH, 'rb') as f:
+                for line in f:
+                    if line.startswith(b'rchar:'):
+                        return int(line.split()[1])
+        except OSError:
+            Tracer.has_io = False
+        return None
+
+    @staticmethod
+    def timestamp(ns):
+        return (ns - Tracer.origin) / 1000
+
+    @staticmethod
+    def append_event(event):
+        if len(Tracer.events) < TraceSettings.MAX_EVENTS:
+            Tracer.events.append(event)
+        else:
+            Tracer.dropped += 1
+
+    @staticmethod
+    def record(name, start, duration, args):
+        thread = threading.current_thread()
+        with Tracer.lock:
+            Tracer.thread_names.setdefault(thread.ident, thread.name)
+            Tracer.durations.setdefault(name, []).append(duration)
+            if 'bytes_read' in args:
+                Tracer.span_bytes[name] = Tracer.span_bytes.get(name, 0) + args['bytes_read']
+            Tracer.append_event({'name': name, 'cat': name.split('.')[0], 'ph': 'X',
+                                 'ts': Tracer.timestamp(start), 'dur': duration / 1000,
+                                 'pid': os.getpid(), 'tid': thread.ident, 'args': args})
+
+    @staticmethod
+    def reset():
+        with Tracer.lock:
+            Tracer.events = []
+            Tracer.dropped = 0
+            Tracer.durations = {}
+            Tracer.span_bytes = {}
+            Tracer.counters = {}
+            Tracer.origin = time.perf_counter_ns()
+
+    @staticmethod
+    def summary():
+        """Per-operation count, total and p50/p95/p99 in milliseconds"""
+        spans = {}
+        with Tracer.lock:
+            durations = {name: list(values) for name, values in Tracer.durations.items()}
+            span_bytes = dict(Tracer.span_bytes)
+            counters = dict(Tracer.counters)
+        for name, values in sorted(durations.items()):
+            values = np.array(values, dtype=np.float64) / 1e6
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            spans[name] = {
+                'count': len(values),
+                'total_ms': round(float(values.sum()), 3),
+                'p50_ms': round(float(p50), 3),
+                'p95_ms': round(float(p95), 3),
+                'p99_ms': round(float(p99), 3),
+                'max_ms': round(float(values.max()), 3)
+            }
+            if name in span_bytes:
+                spans[name]['bytes_read'] = span_bytes[name]
+                spans[name]['bytes_per_call'] = span_bytes[name] // len(values)
+        return {'spans': spans, 'counters': dict(sorted(counters.items()))}
+
+    @staticmethod
+    def save(output_path=None):
+        """Write the trace and its summary; returns the trace path"""
+        output_path = output_path or Tracer.output_path
+        if not output_path:
+            return None
+        try:
+            with Tracer.lock:
+                events = list(Tracer.events)
+                names = dict(Tracer.thread_names)
+                dropped = Tracer.dropped
+            events += [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': ident,
+                        'args': {'name': name}} for ident, name in names.items()]
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                           'otherData': {'dropped_events': dropped}}, f)
+            with open(os.path.splitext(output_path)[0] + '.summary.json', 'w', encoding='utf-8') as f:
+                json.dump(Tracer.summary(), f, indent=2, sort_keys=True)
+            return output_path
+        except Exception as e:
+            print(f"Error writing trace: {e}")
+        return None
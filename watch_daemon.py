@@ -0,0 +1,307 @@
+# watch_daemon.py
+import hashlib
+import json
+import os
+import time
+from PyQt6.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from playlist_writer import PlaylistWriter
+from smart_playlist import LibraryIndex, SmartPlaylist
+from config import AudioFormats, PlaylistFormats, WatchSettings
+from tracing import Tracer
+
+class WatchRule:
+    """Keep one playlist in sync with the audio files under a folder, or
+    with those of them matching a smart playlist query"""
+    SORT_KEYS = ("name", "date", "size")
+
+    def __init__(self, folder, playlist, format_name=None, recursive=True, sort_by="name", query=None):
+        self.folder = os.path.abspath(folder)
+        self.playlist = os.path.abspath(playlist)
+        self.format_name = format_name or PlaylistWriter.format_for_path(playlist) or WatchSettings.DEFAULT_FORMAT
+        if self.format_name not in PlaylistFormats.FORMATS:
+            raise ValueError(f"Unknown playlist format: {self.format_name}")
+        if sort_by not in WatchRule.SORT_KEYS:
+            raise ValueError(f"Unknown sort order: {sort_by}")
+        self.recursive = recursive
+        self.sort_by = sort_by
+        self.query = query
+        self.smart = SmartPlaylist(query) if query else None
+
+    @staticmethod
+    def from_dict(data, base_dir=""):
+        """Rule from its JSON form; relative paths are taken from base_dir"""
+        folder = os.path.join(base_dir, os.path.expanduser(data['folder']))
+        playlist = os.path.join(base_dir, os.path.expanduser(data['playlist']))
+        return WatchRule(folder, playlist,
+                         data.get('format'), data.get('recursive', True), data.get('sort_by', "name"),
+                         data.get('query'))
+
+    @staticmethod
+    def load(rules_path):
+        """Rules from a JSON file holding a list of rules or {"rules": [...]}"""
+        with open(rules_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('rules', [])
+        base_dir = os.path.dirname(os.path.abspath(rules_path))
+        return [WatchRule.from_dict(entry, base_dir) for entry in data]
+
+
+class WatchDaemon(QObject):
+    """Regenerates playlists as their folders change.
+
+    Every watched folder has an in-memory snapshot of its audio files (size
+    and mtime) and subfolders. A change notification rescans only that one
+    folder, non-recursively, after a debounce period; the playlists of the
+    rules covering it are rebuilt from the snapshots only when the file set
+    actually changed. Track metadata comes from the MetadataCache, so only
+    new or modified files are probed, and a playlist is rewritten (atomically)
+    only when its signature differs from the last one written.
+
+    Files under rules with a query are also kept in a LibraryIndex. Each
+    query runs over the whole index once at startup; after that only the
+    files a rescan found added, modified or removed are re-tested. Queries
+    on age ("added within 30d") are re-run in full periodically.
+    """
+    status = pyqtSignal(str)
+    playlist_written = pyqtSignal(str)
+
+    def __init__(self, rules, cache, debounce_ms=WatchSettings.DEBOUNCE_MS,
+                 settle_seconds=WatchSettings.SETTLE_SECONDS, parent=None):
+        super().__init__(parent)
+        self.rules = rules
+        self.cache = cache
+        self.settle_seconds = settle_seconds
+        self.rules_by_folder = {}
+        for rule in rules:
+            self.rules_by_folder.setdefault(rule.folder, []).append(rule)
+        self.dirs = {}
+        self.pending = set()
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.directory_changed)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(debounce_ms)
+        self.timer.timeout.connect(self.process_pending)
+        self.index = LibraryIndex()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(WatchSettings.SMART_REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh_smart)
+
+    @staticmethod
+    def is_audio(name):
+        return any(name.lower().endswith(ext) for ext in AudioFormats.SUPPORTED_FORMATS)
+
+    @staticmethod
+    def list_dir(directory):
+        """Snapshot of one folder: {name: (size, mtime_ns)} of audio files and
+        the names of subfolders, or None if it is gone"""
+        files = {}
+        subdirs = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.add(entry.name)
+                        elif entry.is_file() and WatchDaemon.is_audio(entry.name):
+                            stats = entry.stat()
+                            files[entry.name] = (stats.st_size, stats.st_mtime_ns)
+                    except OSError:
+                        pass
+        except OSError:
+            return None
+        return {'files': files, 'subdirs': subdirs}
+
+    def rules_for_dir(self, directory):
+        """Rules whose playlist includes the files directly in directory"""
+        rules = list(self.rules_by_folder.get(directory, []))
+        parent = os.path.dirname(directory)
+        while parent != directory:
+            rules.extend(rule for rule in self.rules_by_folder.get(parent, []) if rule.recursive)
+            directory, parent = parent, os.path.dirname(parent)
+        return rules
+
+    def is_recursive(self, directory):
+        """True if some rule needs the subfolders of directory"""
+        return any(rule.recursive for rule in self.rules_for_dir(directory))
+
+    def sync_index(self, directory, old_files, new_files, update=True):
+        """Apply one folder's file changes to the smart playlist index and,
+        with update set, re-test the changed files against the queries"""
+        playlists = [rule.smart for rule in self.rules_for_dir(directory) if rule.smart]
+        if not playlists:
+            return
+        touched = []
+        for name in old_files.keys() - new_files.keys():
+            path = os.path.join(directory, name)
+            self.index.remove(path)
+            touched.append(path)
+        for name, (size, mtime) in new_files.items():
+            if old_files.get(name) != (size, mtime):
+                path = os.path.join(directory, name)
+                self.index.put(path, self.cache.library_record(path, size, mtime))
+                touched.append(path)
+        if update and touched:
+            for playlist in playlists:
+                playlist.update(self.index, touched)
+
+    def scan_tree(self, root, update=True):
+        """Snapshot root and, where a recursive rule covers it, its subfolders"""
+        stack = [root]
+        added = []
+        while stack:
+            directory = stack.pop()
+            if directory in self.dirs:
+                continue
+            snapshot = WatchDaemon.list_dir(directory)
+            if snapshot is None:
+                continue
+            self.dirs[directory] = snapshot
+            self.sync_index(directory, {}, snapshot['files'], update)
+            added.append(directory)
+            if self.is_recursive(directory):
+                stack.extend(os.path.join(directory, name) for name in snapshot['subdirs'])
+        if added:
+            failed = self.watcher.addPaths(added)
+            if failed:
+                print(f"Error watching {len(failed)} folders (is the inotify watch limit too low?)")
+        Tracer.count("watch.scanned_dirs", len(added))
+
+    def drop_tree(self, root):
+        prefix = root + os.sep
+        removed = [directory for directory in self.dirs if directory == root or directory.startswith(prefix)]
+        for directory in removed:
+            files = self.dirs.pop(directory)['files']
+            self.sync_index(directory, files, {})
+            self.cache.forget([os.path.join(directory, name) for name in files])
+        if removed:
+            watched = set(self.watcher.directories())
+            self.watcher.removePaths([directory for directory in removed if directory in watched])
+
+    def start(self):
+        """Scan every rule folder once and bring all playlists up to date"""
+        for folder in self.rules_by_folder:
+            self.scan_tree(folder, update=False)
+        with Tracer.span("watch.smart", tracks=len(self.index)):
+            for rule in self.rules:
+                if rule.smart:
+                    rule.smart.evaluate(self.index)
+        for rule in self.rules:
+            self.update_rule(rule)
+        self.cache.commit()
+        if any(rule.smart and rule.smart.time_dependent for rule in self.rules):
+            self.refresh_timer.start()
+        self.status.emit(f"Watching {len(self.dirs)} folders for {len(self.rules)} playlists")
+
+    def refresh_smart(self):
+        """Re-run queries whose results depend on the current time"""
+        for rule in self.rules:
+            if rule.smart and rule.smart.time_dependent and rule.smart.evaluate(self.index):
+                self.update_rule(rule)
+        self.cache.commit()
+
+    def stop(self):
+        self.timer.stop()
+        self.refresh_timer.stop()
+        if self.pending:
+            self.process_pending()
+        self.cache.commit()
+
+    def directory_changed(self, directory):
+        self.pending.add(os.path.abspath(directory))
+        # Restarting the timer coalesces a burst of changes into one pass
+        self.timer.start()
+
+    def process_pending(self):
+        pending, self.pending = self.pending, set()
+        settled_before = time.time_ns() - int(self.settle_seconds * 1e9)
+        affected = {}
+        with Tracer.span("watch.rescan", dirs=len(pending)):
+            for directory in pending:
+                old = self.dirs.get(directory)
+                if old is None:
+                    continue
+                new = WatchDaemon.list_dir(directory)
+                if new is None:
+                    self.drop_tree(directory)
+                    for rule in self.rules_for_dir(directory):
+                        affected[id(rule)] = rule
+                    continue
+                if any(mtime > settled_before for _, mtime in new['files'].values()):
+                    # Still being written; look again once it settles
+                    self.pending.add(directory)
+                    continue
+                changed = new['files'] != old['files']
+                removed = old['files'].keys() - new['files'].keys()
+                self.sync_index(directory, old['files'], new['files'])
+                self.cache.forget([os.path.join(directory, name) for name in removed])
+                self.dirs[directory] = new
+                if self.is_recursive(directory):
+                    for name in old['subdirs'] - new['subdirs']:
+                        self.drop_tree(os.path.join(directory, name))
+                        changed = True
+                    for name in new['subdirs'] - old['subdirs']:
+                        self.scan_tree(os.path.join(directory, name))
+                        changed = True
+                if changed:
+                    for rule in self.rules_for_dir(directory):
+                        affected[id(rule)] = rule
+        for rule in affected.values():
+            self.update_rule(rule)
+        self.cache.commit()
+        if self.pending:
+            self.timer.start()
+
+    def collect_files(self, rule):
+        """[(path, size, mtime_ns)] under the rule's folder, from the snapshots"""
+        files = []
+        stack = [rule.folder]
+        while stack:
+            directory = stack.pop()
+            snapshot = self.dirs.get(directory)
+            if snapshot is None:
+                continue
+            files.extend((os.path.join(directory, name), size, mtime)
+                         for name, (size, mtime) in snapshot['files'].items())
+            if rule.recursive:
+                stack.extend(os.path.join(directory, name) for name in snapshot['subdirs'])
+        if rule.smart:
+            # The index covers every smart rule's folders, so members may
+            # include files of other rules
+            files = [entry for entry in files if entry[0] in rule.smart.members]
+        if rule.sort_by == "date":
+            files.sort(key=lambda entry: (entry[2], entry[0]))
+        elif rule.sort_by == "size":
+            files.sort(key=lambda entry: (entry[1], entry[0]))
+        else:
+            files.sort()
+        return files
+
+    @staticmethod
+    def signature(rule, files):
+        digest = hashlib.sha1(rule.format_name.encode('utf-8'))
+        if rule.query:
+            digest.update(rule.query.encode('utf-8'))
+        for path, size, mtime in files:
+            digest.update(f"{path}\t{size}\t{mtime}\n".encode('utf-8', 'surrogateescape'))
+        return digest.hexdigest()
+
+    def update_rule(self, rule):
+        """Rewrite the rule's playlist if its contents changed; returns True if written"""
+        files = self.collect_files(rule)
+        signature = WatchDaemon.signature(rule, files)
+        if signature == self.cache.get_signature(rule.playlist) and os.path.exists(rule.playlist):
+            return False
+        try:
+            with Tracer.span("watch.playlist", files=len(files)):
+                os.makedirs(os.path.dirname(rule.playlist), exist_ok=True)
+                PlaylistWriter.write_playlist(rule.playlist, [path for path, _, _ in files],
+                                              rule.format_name, self.cache.track_info)
+        except Exception as e:
+            print(f"Error writing playlist {rule.playlist}: {e}")
+            return False
+        self.cache.set_signature(rule.playlist, signature)
+        self.status.emit(f"Updated {rule.playlist} ({len(files)} tracks)")
+        self.playlist_written.emit(rule.playlist)
+        return True
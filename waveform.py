@@ -0,0 +1,264 @@
+# waveform.py
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import mutagen
+from PyQt6.QtCore import Qt, QThread, QCoreApplication, QLineF, QRect, pyqtSignal
+from PyQt6.QtGui import QColor, QPainter
+from PyQt6.QtWidgets import QWidget, QStyle, QStyledItemDelegate, QStyleOptionViewItem
+from audio_transitions import AudioTransitions
+from metadata_cache import MetadataCache
+from config import WaveformSettings, WatchSettings
+from tracing import Tracer
+
+class WaveformPeaks:
+    """Min/max envelope of a track: an int8 array of (min, max) pairs, one
+    per equal slice of the track, scaled from 16-bit samples. The PCM is
+    streamed from ffmpeg and reduced in blocks as it arrives, so a track is
+    never held in memory whole."""
+
+    @staticmethod
+    def duration(file_path):
+        try:
+            audio = mutagen.File(file_path)
+            if audio is not None and audio.info:
+                return audio.info.length
+        except Exception:
+            pass
+        return 0
+
+    @staticmethod
+    def compute(file_path, buckets=WaveformSettings.BUCKETS):
+        rate = WaveformSettings.SAMPLE_RATE
+        duration = WaveformPeaks.duration(file_path)
+        # Reduce to a few blocks per bucket while streaming, then fold the
+        # blocks into exactly `buckets` once the real length is known
+        if duration:
+            block = max(1, int(duration * rate) // (buckets * WaveformSettings.BLOCKS_PER_BUCKET))
+        else:
+            block = rate // 100
+        chunk_bytes = block * 2 * max(1, WaveformSettings.CHUNK_BYTES // (block * 2))
+        lows, highs = [], []
+        for data in AudioTransitions.stream_pcm(file_path, rate, 1, chunk_bytes):
+            # Chunks hold whole blocks until the last one
+            samples = np.frombuffer(data, dtype='<i2', count=len(data) // 2)
+            full = len(samples) - len(samples) % block
+            blocks = samples[:full].reshape(-1, block)
+            lows.append(blocks.min(axis=1))
+            highs.append(blocks.max(axis=1))
+            if full < len(samples):
+                lows.append(samples[full:].min(keepdims=True))
+                highs.append(samples[full:].max(keepdims=True))
+
+        if not lows:
+            return np.zeros((buckets, 2), dtype=np.int8)
+        lows, highs = np.concatenate(lows), np.concatenate(highs)
+        peaks = np.stack([WaveformPeaks.fold(lows, buckets, np.minimum),
+                          WaveformPeaks.fold(highs, buckets, np.maximum)], axis=1)
+        return (peaks >> 8).astype(np.int8)
+
+    @staticmethod
+    def fold(values, count, reduce):
+        """Reduce values into count equal slices; short inputs are stretched"""
+        edges = np.arange(count) * len(values) // count
+        return reduce.reduceat(values, edges)
+
+    @staticmethod
+    def to_blob(peaks):
+        return peaks.astype(np.int8).tobytes()
+
+    @staticmethod
+    def from_blob(blob):
+        return np.frombuffer(blob, dtype=np.int8).reshape(-1, 2)
+
+    @staticmethod
+    def paint(painter, rect, peaks, color):
+        """Draw peaks as one vertical line per pixel column of rect"""
+        width = rect.width()
+        if width <= 0 or not len(peaks):
+            return
+        lows = WaveformPeaks.fold(peaks[:, 0], width, np.minimum).astype(np.float64)
+        highs = WaveformPeaks.fold(peaks[:, 1], width, np.maximum).astype(np.float64)
+        middle = rect.top() + rect.height() / 2
+        scale = rect.height() / 256
+        xs = (rect.left() + np.arange(width) + 0.5).tolist()
+        tops = (middle - highs * scale - 0.5).tolist()
+        bottoms = (middle - lows * scale + 0.5).tolist()
+        painter.save()
+        painter.setPen(QColor(color))
+        painter.drawLines([QLineF(x, top, x, bottom) for x, top, bottom in zip(xs, tops, bottoms)])
+        painter.restore()
+
+
+class WaveformCache:
+    """Process-wide LRU of peak arrays. At about 2 KB a track the entry
+    limit, not memory, bounds it."""
+    MISSING = object()
+    entries = OrderedDict()
+
+    @staticmethod
+    def get(file_path):
+        """Peaks, MISSING for files that failed to decode, or None if not loaded"""
+        peaks = WaveformCache.entries.get(file_path)
+        if peaks is not None:
+            WaveformCache.entries.move_to_end(file_path)
+        return peaks
+
+    @staticmethod
+    def put(file_path, peaks):
+        WaveformCache.entries[file_path] = WaveformCache.MISSING if peaks is None else peaks
+        WaveformCache.entries.move_to_end(file_path)
+        while len(WaveformCache.entries) > WaveformSettings.MEMORY_ENTRIES:
+            WaveformCache.entries.popitem(last=False)
+
+    @staticmethod
+    def invalidate(file_path):
+        WaveformCache.entries.pop(file_path, None)
+
+    @staticmethod
+    def rename(old_path, new_path):
+        """Keep a renamed file's peaks; its audio is unchanged"""
+        if old_path in WaveformCache.entries:
+            WaveformCache.entries[new_path] = WaveformCache.entries.pop(old_path)
+
+
+class WaveformLoader(QThread):
+    """Computes peaks off the GUI thread, `workers` tracks at a time and the
+    newest requests first, like ThumbnailLoader. Peaks are kept in the
+    metadata cache, so each track is only decoded once until it changes."""
+    loaded = pyqtSignal(str, object)
+    _instance = None
+
+    def __init__(self, workers=WaveformSettings.LOADER_WORKERS, db_path=WatchSettings.METADATA_DB, parent=None):
+        super().__init__(parent)
+        self.workers = max(1, workers)
+        self.db_path = db_path
+        self.requests = queue.LifoQueue()
+        self.pending = set()
+        self.loaded.connect(self.store)
+
+    @staticmethod
+    def instance():
+        """Loader shared by every view, stopped when the application quits"""
+        if WaveformLoader._instance is None:
+            WaveformLoader._instance = WaveformLoader()
+            QCoreApplication.instance().aboutToQuit.connect(WaveformLoader._instance.stop)
+        return WaveformLoader._instance
+
+    def peaks(self, file_path):
+        """Peaks if loaded (MISSING if they can't be), else None after
+        requesting them"""
+        peaks = WaveformCache.get(file_path)
+        if peaks is None:
+            self.request(file_path)
+        return peaks
+
+    def request(self, file_path):
+        if file_path in self.pending:
+            return
+        self.pending.add(file_path)
+        self.requests.put(file_path)
+        if not self.isRunning():
+            self.start()
+
+    def prefetch(self, files):
+        """Queue files not yet loaded, first files first; rows painted later
+        still jump ahead of them"""
+        files = [file_path for file_path in files if WaveformCache.get(file_path) is None]
+        for file_path in reversed(files[:WaveformSettings.PREFETCH_LIMIT]):
+            self.request(file_path)
+
+    def store(self, file_path, peaks):
+        self.pending.discard(file_path)
+        WaveformCache.put(file_path, peaks)
+
+    def stop(self):
+        self.requests.put(None)
+        self.wait()
+
+    def load(self, file_path, cache, slots):
+        try:
+            blob = cache.get_waveform(file_path)
+            if blob is not None:
+                peaks = WaveformPeaks.from_blob(blob)
+            else:
+                with Tracer.span("waveform.compute"):
+                    peaks = WaveformPeaks.compute(file_path)
+                cache.put_waveform(file_path, WaveformPeaks.to_blob(peaks))
+                cache.commit()
+        except Exception as e:
+            print(f"Error computing waveform for {file_path}: {e}")
+            peaks = None
+        finally:
+            slots.release()
+        self.loaded.emit(file_path, peaks)
+
+    def run(self):
+        # Only take a request off the LIFO queue when a worker is free, so
+        # the newest requests still go first
+        slots = threading.Semaphore(self.workers)
+        cache = MetadataCache(self.db_path)
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                while True:
+                    slots.acquire()
+                    file_path = self.requests.get()
+                    if file_path is None:
+                        break
+                    pool.submit(self.load, file_path, cache, slots)
+        finally:
+            cache.close()
+
+
+class WaveformDelegate(QStyledItemDelegate):
+    """Draws each row's waveform at its right end. Only painted rows ask
+    for peaks, so scrolling a long list decodes just what comes into view."""
+
+    def paint(self, painter, option, index):
+        width = min(WaveformSettings.LIST_WIDTH, option.rect.width() // 3)
+        text_option = QStyleOptionViewItem(option)
+        text_option.rect = option.rect.adjusted(0, 0, -width, 0)
+        super().paint(painter, text_option, index)
+
+        rect = QRect(option.rect.right() - width + 1, option.rect.top() + 2, width - 2, option.rect.height() - 4)
+        color = WaveformSettings.COLOR
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.fillRect(option.rect.adjusted(option.rect.width() - width, 0, 0, 0), option.palette.highlight())
+            color = option.palette.highlightedText().color()
+        peaks = WaveformLoader.instance().peaks(index.data(Qt.ItemDataRole.UserRole))
+        if peaks is not None and peaks is not WaveformCache.MISSING:
+            WaveformPeaks.paint(painter, rect, peaks, color)
+
+
+class WaveformView(QWidget):
+    """Waveform overview of one file, drawn once its peaks are loaded"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.file_path = None
+        self.setFixedHeight(WaveformSettings.EDITOR_HEIGHT)
+        self.loader = WaveformLoader.instance()
+        self.loader.loaded.connect(self.peaks_loaded)
+
+    def set_file(self, file_path):
+        self.file_path = file_path
+        self.update()
+
+    def peaks_loaded(self, file_path, peaks):
+        if file_path == self.file_path:
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().base())
+        if self.file_path is None:
+            return
+        peaks = self.loader.peaks(self.file_path)
+        if peaks is WaveformCache.MISSING:
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "No waveform")
+        elif peaks is None:
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Computing waveform...")
+        else:
+            WaveformPeaks.paint(painter, self.rect().adjusted(2, 2, -2, -2), peaks, WaveformSettings.COLOR)